@@ -2,7 +2,9 @@ import streamlit as st
 import subprocess
 import os
 import pandas as pd
-from utils import load_all_datasets, setup_sidebar
+from utils import get_master_frame, setup_sidebar, query_gold, get_country_slice, gold_registry
+from run_ledger import load_recent_runs, load_stage_metrics
+from db_manager import pool_metrics
 
 # 1. SAYFA KONFİGÜRASYONU
 st.set_page_config(page_title="GECI | Komuta Merkezi", page_icon="⚡", layout="wide")
@@ -50,9 +52,12 @@ if st.sidebar.button(f"🔮 3. {selected_country} Modelini Eğit"):
 if st.sidebar.button("🌍 Tüm Dünyayı Eğit (Uzun Sürer)"):
     run_pipeline_script("train_models.py", "Küresel modeller güncellendi!")
 
+if st.sidebar.button("🛰️ NASA İklim Verisini Çek (Tüm Ülkeler)"):
+    run_pipeline_script("nasa_prefetch.py", "NASA iklim tablosu güncellendi!")
+
 # 3. ANA EKRAN: VERİ AMBARI ÖZETİ (GOLD LAYER)
 try:
-    df_co2, df_fossil, df_share, df_master = load_all_datasets()
+    df_master = get_master_frame()
     
     if df_master is not None:
         # --- ÜST KPI BÖLÜMÜ ---
@@ -75,8 +80,9 @@ try:
         
         with col_left:
             st.subheader("📍 Ülke Bazlı Kayıt Sayıları")
-            # Ülkelere göre veri sayılarını hesaplıyoruz
-            country_counts = df_master['Entity'].value_counts().reset_index()
+            # Ülkelere göre veri sayıları ETL sonrası materialized view'da hazır
+            country_counts = query_gold('mv_entity_record_counts', columns=['Entity', 'Records'],
+                                        order_by=[('Records', 'desc')])
             country_counts.columns = ['Ülke/Bölge', 'Kayıt Sayısı']
             
             # Etkileşimli Tablo
@@ -89,7 +95,7 @@ try:
 
         with col_right:
             st.subheader(f"📊 {selected_country} Detaylı Analizi")
-            country_data = df_master[df_master['Entity'] == selected_country]
+            country_data = get_country_slice('energy_master', selected_country)
             
             if not country_data.empty:
                 latest = country_data.iloc[-1]
@@ -116,4 +122,45 @@ try:
         st.warning("⚠️ Veri ambarı şu an boş. Lütfen sol taraftaki butonlarla Pipeline'ı başlatın.")
 
 except Exception as e:
-    st.error(f"Ana sayfa yüklenirken bir hata oluştu: {e}")
\ No newline at end of file
+    st.error(f"Ana sayfa yüklenirken bir hata oluştu: {e}")
+
+# 4. BORU HATTI ÇALIŞMA GEÇMİŞİ (RUN LEDGER)
+st.markdown("---")
+st.subheader("⏱️ Boru Hattı Çalışma Geçmişi")
+try:
+    runs = load_recent_runs(limit=30)
+    if runs.empty:
+        st.info("Henüz kayıtlı bir çalışma yok. Pipeline çalıştırıldığında burada görünecek.")
+    else:
+        st.dataframe(runs, use_container_width=True, hide_index=True)
+
+        # Trend: aynı aşama + veri setinin çalıştırmalar boyunca süresi/hacmi (hangi veri seti yavaşladı?)
+        stages = load_stage_metrics(runs["run_id"])
+        if not stages.empty:
+            c1, c2 = st.columns(2)
+            pipeline = c1.selectbox("Boru hattı", sorted(stages["pipeline"].unique()))
+            metric = c2.selectbox("Metrik", ["wall_seconds", "cpu_seconds", "rows_out", "bytes_read", "bytes_written"])
+            trend = stages[stages["pipeline"] == pipeline].merge(runs[["run_id", "started_at"]], on="run_id")
+            trend["Seri"] = trend["stage"] + ":" + trend["dataset"].fillna("-")
+            trend = trend.pivot_table(index="started_at", columns="Seri", values=metric, aggfunc="sum")
+            st.line_chart(trend, height=300)
+except Exception as e:
+    st.warning(f"Çalışma kaydı okunamadı: {e}")
+
+# Bu Streamlit sürecinin tüm oturumlarının paylaştığı bağlantı havuzu
+with st.expander("🔌 Veritabanı Bağlantı Havuzu"):
+    pool = pool_metrics()
+    p1, p2, p3, p4 = st.columns(4)
+    p1.metric("Kullanımda", f"{pool.get('checked_out', 0)} / {pool.get('pool_size', 0)}", f"taşma {pool.get('overflow', 0)}", delta_color="off")
+    p2.metric("Bağlantı Alımı", pool["checkouts"])
+    p3.metric("Ort. / En Uzun Bekleme", f"{pool['wait_seconds_avg'] * 1000:.1f} / {pool['wait_seconds_max'] * 1000:.0f} ms")
+    p4.metric("Zaman Aşımı", pool["timeouts"])
+
+# Tüm oturumların paylaştığı bayt bütçeli veri önbelleği (gold tabloları + master/indeksler)
+with st.expander("🗄️ Paylaşılan Veri Önbelleği"):
+    cache = gold_registry.cache_stats()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Bellek", f"{cache['bytes'] / 1024 / 1024:.1f} / {cache['max_bytes'] / 1024 / 1024:.0f} MB", f"{cache['entries']} girdi", delta_color="off")
+    c2.metric("İsabet", cache["hits"], f"%{cache['hit_ratio'] * 100:.0f}", delta_color="off")
+    c3.metric("Iska", cache["misses"])
+    c4.metric("Atılan", cache["evictions"])
\ No newline at end of file
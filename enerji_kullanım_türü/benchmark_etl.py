@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import pyarrow.dataset as ds
+from pyarrow import fs
+from config import logger
+from lake_utils import table_name_for
+from etl_pandas import read_csv_arrow, clean_table, write_silver_arrow
+
+# ---------------------------------------------------------
+# ETL MOTOR KARŞILAŞTIRMASI (Spark vs pandas/Arrow)
+# ---------------------------------------------------------
+# Veri_Setleri altındaki CSV'leri iki motorla da yerel diske silver Parquet
+# olarak yazar, süreleri ölçer ve iki çıktının şema + satır bazında aynı
+# olduğunu doğrular. Ardından Spark silver'ında tek ülke + yıl aralığı
+# okumasının tam okumaya göre ne kadar az bayt okuduğunu (budama) raporlar.
+# MinIO/Postgres gerektirmez.
+#   python benchmark_etl.py [tekrar_sayisi]
+PRUNE_ENTITY = "Turkey"
+PRUNE_YEARS = (2010, 2020)
+
+def run_pandas(files, out_dir):
+    local_fs = fs.LocalFileSystem()
+    started = time.perf_counter()
+    for path in files:
+        dataset = os.path.basename(path)[:-len(".csv")]
+        with open(path, "rb") as f:
+            table = clean_table(read_csv_arrow(f.read(), dataset))
+        write_silver_arrow(table, os.path.join(out_dir, f"{table_name_for(dataset)}.parquet"), local_fs)
+    return time.perf_counter() - started
+
+def run_spark(files, out_dir):
+    # SparkSession açılışı da ölçüme dahil: küçük girdilerde asıl maliyet budur
+    from pyspark.sql import SparkSession
+    from etl_spark_to_db import clean_columns, write_silver
+    from schema_registry import SCHEMA_REGISTRY
+
+    started = time.perf_counter()
+    spark = SparkSession.builder.appName("GECI_Engine_Benchmark").master("local[*]").getOrCreate()
+    for path in files:
+        dataset = os.path.basename(path)[:-len(".csv")]
+        reader = spark.read.option("header", "true")
+        reader = reader.schema(SCHEMA_REGISTRY[dataset]) if dataset in SCHEMA_REGISTRY else reader.option("inferSchema", "true")
+        df = clean_columns(reader.csv(os.path.abspath(path)))
+        write_silver(df, os.path.join(out_dir, f"{table_name_for(dataset)}.parquet"))
+    elapsed = time.perf_counter() - started
+    spark.stop()
+    return elapsed
+
+def run_pruned_reads(files, spark_dir, entity=PRUNE_ENTITY, year_range=PRUNE_YEARS):
+    """Her silver tablosunu bir kez tam, bir kez ülke + yıl filtresiyle okur; okunan baytları karşılaştırır."""
+    from pyspark.sql import SparkSession
+    from pyspark.sql import functions as F
+    from etl_spark_to_db import read_silver, read_silver_filtered, stage_bytes_read, format_bytes
+
+    spark = SparkSession.builder.appName("GECI_Engine_Benchmark").master("local[*]").getOrCreate()
+    sc = spark.sparkContext
+    results = {}
+    try:
+        for path in files:
+            name = table_name_for(os.path.basename(path)[:-len(".csv")])
+            silver_path = os.path.abspath(os.path.join(spark_dir, f"{name}.parquet"))
+            if not {"Entity", "Year"} <= set(read_silver(spark, silver_path).columns):
+                continue
+            # İki okuma da Entity kolonunu tarar; fark sadece budamadan gelir
+            sc.setJobGroup(f"{name}:full", "tam okuma")
+            total = read_silver(spark, silver_path).where(F.col("Entity").isNotNull()).count()
+            sc.setJobGroup(f"{name}:pruned", "filtreli okuma")
+            rows = read_silver_filtered(spark, silver_path, [entity], year_range).count()
+            full_bytes, pruned_bytes = stage_bytes_read(spark, f"{name}:full"), stage_bytes_read(spark, f"{name}:pruned")
+            results[name] = (rows, total, pruned_bytes, full_bytes)
+            logger.info(f"  {name}: {entity} {year_range[0]}-{year_range[1]} -> {rows}/{total} satır, "
+                        f"okunan {format_bytes(pruned_bytes)} / {format_bytes(full_bytes)}")
+    finally:
+        spark.stop()
+    return results
+
+def read_sorted(path):
+    table = ds.dataset(path, format="parquet", partitioning="hive").to_table()
+    table = table.select(sorted(table.column_names))
+    return table.sort_by([(c, "ascending") for c in table.column_names])
+
+def compare_outputs(files, pandas_dir, spark_dir):
+    mismatches = []
+    for path in files:
+        name = f"{table_name_for(os.path.basename(path)[:-len('.csv')])}.parquet"
+        left, right = read_sorted(os.path.join(pandas_dir, name)), read_sorted(os.path.join(spark_dir, name))
+        if left.schema.remove_metadata() != right.schema.remove_metadata() or not left.equals(right):
+            mismatches.append(name)
+    return mismatches
+
+def run_benchmark(repeat=3, data_folder="Veri_Setleri"):
+    files = sorted(os.path.join(data_folder, f) for f in os.listdir(data_folder) if f.endswith(".csv"))
+    total_mb = sum(os.path.getsize(f) for f in files) / 1024 / 1024
+    logger.info(f"Benchmark: {len(files)} dosya, {total_mb:.1f} MB, {repeat} tekrar")
+
+    work_dir = tempfile.mkdtemp(prefix="geci_bench_")
+    try:
+        results = {"pandas": [], "spark": []}
+        for i in range(repeat):
+            for engine, runner in (("pandas", run_pandas), ("spark", run_spark)):
+                out_dir = os.path.join(work_dir, engine)
+                shutil.rmtree(out_dir, ignore_errors=True)
+                results[engine].append(runner(files, out_dir))
+
+        for engine, timings in results.items():
+            logger.info(f"  {engine:<7} en iyi: {min(timings):.2f} sn | ortalama: {sum(timings) / len(timings):.2f} sn")
+
+        mismatches = compare_outputs(files, os.path.join(work_dir, "pandas"), os.path.join(work_dir, "spark"))
+        if mismatches:
+            logger.error(f"  Silver çıktıları farklı: {', '.join(mismatches)}")
+        else:
+            logger.info("  Silver çıktıları iki motorda da aynı (şema + satırlar).")
+        run_pruned_reads(files, os.path.join(work_dir, "spark"))
+        return results, mismatches
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,81 @@
+import sys
+import time
+import pandas as pd
+from sqlalchemy import text
+from config import DB_STATEMENT_TIMEOUT_MS, logger
+from db_manager import get_db_engine, get_batch_engine, create_pooled_engine, quote_ident
+from utils import list_gold_tables, read_gold_frames
+
+# ---------------------------------------------------------
+# GOLD OKUMA KARŞILAŞTIRMASI (read_sql sıralı vs COPY paralel)
+# ---------------------------------------------------------
+# public'teki gold tablolarını ayrı bir "bench" şemasında 1x/10x/100x
+# çoğaltır ve load_all_datasets'in okuma adımını ölçer: eski sıralı
+# pd.read_sql, sıralı COPY TO STDOUT ve thread havuzunda paralel COPY.
+# read_sql ile paralel COPY'nin ürettiği DataFrame'lerin aynı olduğu da
+# doğrulanır. Bitince bench şeması silinir. Postgres gerektirir.
+# Çoğaltma (CTAS) ve silme süre sınırsız batch engine'inde çalışır; ölçülen
+# okumalar dashboard'un statement_timeout'uyla, dashboard'un göreceği gibi yapılır.
+#   python benchmark_gold_reads.py [tekrar_sayisi] [olcek,olcek,...]
+BENCH_SCHEMA = "bench"
+
+def create_scaled_tables(engine, tables, scale):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+        for table in tables:
+            conn.execute(text(
+                f"CREATE TABLE {BENCH_SCHEMA}.{quote_ident(table)} AS "
+                f"SELECT t.* FROM public.{quote_ident(table)} t, generate_series(1, {int(scale)})"
+            ))
+        total = sum(conn.execute(text(f"SELECT count(*) FROM {BENCH_SCHEMA}.{quote_ident(t)}")).scalar()
+                    for t in tables)
+    return total
+
+def time_read(engine, tables, method, workers):
+    started = time.perf_counter()
+    frames = read_gold_frames(engine, tables, method=method, workers=workers)
+    return time.perf_counter() - started, frames
+
+def same_frames(left, right):
+    for table in left:
+        try:
+            pd.testing.assert_frame_equal(left[table], right[table], check_dtype=False)
+        except AssertionError:
+            return False
+    return True
+
+def run_benchmark(repeat=3, scales=(1, 10, 100)):
+    engine = get_db_engine()
+    batch_engine = get_batch_engine()
+    tables = list_gold_tables(engine)
+    # Okuyucular tabloyu şemasız adla istediği için bench bağlantılarında search_path bench şemasıdır
+    bench_url = engine.url.update_query_dict({"options": f"-c search_path={BENCH_SCHEMA}"})
+    bench_engine = create_pooled_engine(bench_url.render_as_string(hide_password=False),
+                                        statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS)
+    variants = (("read_sql sıralı", "read_sql", 1), ("copy sıralı", "copy", 1), ("copy paralel", "copy", 4))
+    results = {}
+    try:
+        for scale in scales:
+            rows = create_scaled_tables(batch_engine, tables, scale)
+            logger.info(f"Benchmark {scale}x: {len(tables)} tablo, {rows} satır, {repeat} tekrar")
+            frames = {}
+            for label, method, workers in variants:
+                timings = []
+                for _ in range(repeat):
+                    elapsed, frames[label] = time_read(bench_engine, tables, method, workers)
+                    timings.append(elapsed)
+                results[(scale, label)] = timings
+                logger.info(f"  {label:<16} en iyi: {min(timings):.2f} sn | ortalama: {sum(timings) / len(timings):.2f} sn")
+            if not same_frames(frames["read_sql sıralı"], frames["copy paralel"]):
+                logger.error(f"  {scale}x: read_sql ve COPY çıktıları farklı!")
+        return results
+    finally:
+        bench_engine.dispose()
+        with batch_engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    scales = tuple(int(s) for s in sys.argv[2].split(",")) if len(sys.argv) > 2 else (1, 10, 100)
+    run_benchmark(repeat, scales)
@@ -1,6 +1,10 @@
 import os
 from pyspark.sql import SparkSession
-from config import MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_ENDPOINT, DB_CONFIG, logger
+from config import MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_ENDPOINT, logger
+from lake_utils import BRONZE_PREFIX, bronze_glob, table_name_for
+from schema_registry import read_bronze_csv
+from etl_spark_to_db import stage_bytes_read, format_bytes, write_silver, read_silver, clean_columns
+from gold_master import MASTER_TABLE, publish_energy_master, refresh_materialized_views
 
 def get_spark_session():
     return SparkSession.builder \
@@ -16,45 +20,46 @@ def get_spark_session():
 def run_static_etl():
     spark = get_spark_session()
     
+    # Rol -> bronze veri seti; üçü tek bir conformed energy_master tablosunda birleşir
     datasets = {
-        "energy_co2": "co2-per-capita-vs-renewable-electricity",
-        "energy_fossil": "fossil-fuels-per-capita",
-        "energy_share": "share-electricity-renewables"
+        "fossil": "electricity-fossil-renewables-nuclear-line",
+        "co2": "co2-per-capita-vs-renewable-electricity",
+        "share": "share-electricity-renewables"
     }
 
-    logger.info(": bronze/latest -> silver/latest -> Gold")
+    logger.info(": bronze -> silver/latest -> Gold (energy_master)")
 
-    for table_name, file_name in datasets.items():
-        # 1. BRONZE'DAN OKU (SABİT YOL)
-        bronze_path = f"s3a://raw-data/bronze/latest/{file_name}.csv"
+    frames = {}
+    for role, file_name in datasets.items():
+        # 1. BRONZE'DAN OKU (Ingest'in yazdığı yer - .csv veya .csv.gz)
+        bronze_path = bronze_glob(BRONZE_PREFIX, file_name)
         
         try:
-            df = spark.read.option("header", "true").option("inferSchema", "true").csv(bronze_path)
+            df = read_bronze_csv(spark, bronze_path, file_name)
             logger.info(f"Bronze okundu: {bronze_path}")
         except Exception as e:
             logger.error(f"HATA: {bronze_path} bulunamadı! Ingest scriptini kontrol et.")
             continue
 
         # 2. SILVER'A YAZ (SABİT YOL - PARQUET)
-        for c in df.columns:
-            df = df.withColumnRenamed(c, c.replace(" ", "_").replace("(", "").replace(")", ""))
-        
+        df = clean_columns(df)
+        table_name = table_name_for(file_name)
         silver_path = f"s3a://raw-data/silver/latest/{table_name}.parquet"
-        df.write.mode("overwrite").parquet(silver_path)
-        logger.info(f"Silver güncellendi: {silver_path}")
-
-        # 3. GOLD'A YAZ (Postgres)
-        df.write \
-            .format("jdbc") \
-            .option("url", f"jdbc:postgresql://{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}") \
-            .option("dbtable", "energy_master") \
-            .option("user", DB_CONFIG['user']) \
-            .option("password", DB_CONFIG['password']) \
-            .option("driver", "org.postgresql.Driver") \
-            .mode("overwrite") \
-            .save()
-        
-        logger.info(f"Gold (Postgres) güncellendi: {table_name}")
+        spark.sparkContext.setJobGroup(f"static:{table_name}:silver", f"{file_name} -> silver")
+        write_silver(df, silver_path)
+        logger.info(f"Silver güncellendi: {silver_path} "
+                    f"(okunan: {format_bytes(stage_bytes_read(spark, f'static:{table_name}:silver'))})")
+        frames[role] = read_silver(spark, silver_path, columns=df.columns)
+
+    # 3. GOLD'A YAZ (Postgres) - birleştirme ve paylar burada bir kez hesaplanır
+    if len(frames) < len(datasets):
+        logger.error(f"HATA: {MASTER_TABLE} için eksik veri seti var, gold güncellenmedi.")
+    else:
+        spark.sparkContext.setJobGroup(f"static:{MASTER_TABLE}:gold", f"silver -> {MASTER_TABLE}")
+        publish_energy_master(spark, frames, f"s3a://raw-data/silver/latest/{MASTER_TABLE}.parquet")
+        logger.info(f"Gold (Postgres) güncellendi: {MASTER_TABLE} "
+                    f"(okunan: {format_bytes(stage_bytes_read(spark, f'static:{MASTER_TABLE}:gold'))})")
+        refresh_materialized_views()
 
     spark.stop()
 
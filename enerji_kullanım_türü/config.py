@@ -53,4 +53,106 @@ DB_CONFIG = {
     "database": DB_NAME,
     "user": DB_USER,
     "password": DB_PASS
-}
\ No newline at end of file
+}
+
+# ---------------------------------------------------------
+# 5. INGEST (BRONZE YÜKLEME) PERFORMANS AYARLARI
+# ---------------------------------------------------------
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "8"))
+# MinIO/S3 multipart parça boyutu (en az 5 MB olmalı)
+INGEST_PART_SIZE_MB = max(5, int(os.getenv("INGEST_PART_SIZE_MB", "16")))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "3"))
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "1.0"))
+# Bronze nesnelerinin sıkıştırılması: none | gzip
+INGEST_COMPRESSION = os.getenv("INGEST_COMPRESSION", "none").lower()
+
+# ---------------------------------------------------------
+# 6. SPARK ETL AYARLARI
+# ---------------------------------------------------------
+# Şema kayıt defterinde olmayan dosyalarda şema çıkarımı için örneklenen satır oranı
+SCHEMA_SAMPLING_RATIO = float(os.getenv("SCHEMA_SAMPLING_RATIO", "0.1"))
+# run_dynamic_etl içinde aynı anda işlenecek en fazla dosya sayısı (1 = sırayla)
+ETL_MAX_CONCURRENCY = int(os.getenv("ETL_MAX_CONCURRENCY", "4"))
+# full: her dosya silver ve gold'da baştan yazılır | incremental: (Entity, Year) bazında delta upsert
+ETL_WRITE_MODE = os.getenv("ETL_WRITE_MODE", "full").lower()
+# Silver yerleşimi: Year'a göre partition ve opsiyonel Entity hash kovaları (0 = kapalı)
+SILVER_PARTITION_BY_YEAR = os.getenv("SILVER_PARTITION_BY_YEAR", "false").lower() == "true"
+SILVER_ENTITY_BUCKETS = int(os.getenv("SILVER_ENTITY_BUCKETS", "0"))
+# ETL motoru: auto (girdi boyutuna göre) | spark | pandas. Eşiğin altı in-process Arrow ile işlenir.
+ETL_ENGINE = os.getenv("ETL_ENGINE", "auto").lower()
+ETL_ENGINE_THRESHOLD_MB = int(os.getenv("ETL_ENGINE_THRESHOLD_MB", "256"))
+
+# ---------------------------------------------------------
+# 7. GOLD (POSTGRES) YÜKLEME AYARLARI
+# ---------------------------------------------------------
+# jdbc: Spark JDBC (batch + reWriteBatchedInserts) | copy: partition başına COPY FROM STDIN
+GOLD_LOAD_METHOD = os.getenv("GOLD_LOAD_METHOD", "jdbc").lower()
+GOLD_JDBC_BATCHSIZE = int(os.getenv("GOLD_JDBC_BATCHSIZE", "10000"))
+GOLD_JDBC_PARTITIONS = int(os.getenv("GOLD_JDBC_PARTITIONS", "4"))
+
+# ---------------------------------------------------------
+# 8. ÇALIŞMA KAYDI (RUN LEDGER)
+# ---------------------------------------------------------
+# postgres: ops.pipeline_runs / ops.pipeline_stage_metrics | file: JSON lines (testler, DB'siz çalışma)
+RUN_LEDGER_BACKEND = os.getenv("RUN_LEDGER_BACKEND", "postgres").lower()
+RUN_LEDGER_FILE = os.getenv("RUN_LEDGER_FILE", "pipeline_runs.jsonl")
+
+# ---------------------------------------------------------
+# 9. DASHBOARD VERİ KATMANI
+# ---------------------------------------------------------
+# Gold tablolarının tablo sürümleriyle etiketli yerel Arrow IPC snapshot'ı
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "true").lower() == "true"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", ".snapshot_cache")
+# load_all_datasets gold tablo sürümlerine en fazla bu aralıkla bakar (sn)
+DATA_VERSION_CHECK_SECONDS = float(os.getenv("DATA_VERSION_CHECK_SECONDS", "30"))
+# Gold tablolarının okunma yolu: copy (COPY TO STDOUT + Arrow) | read_sql
+GOLD_READ_METHOD = os.getenv("GOLD_READ_METHOD", "copy").lower()
+# Tablolar aynı anda kaç bağlantıdan okunur (DB_POOL_SIZE'ı geçmemeli)
+GOLD_READ_WORKERS = int(os.getenv("GOLD_READ_WORKERS", "4"))
+# Süreç genelindeki veri önbelleğinin (gold tabloları + master/indeksler) bellek bütçesi
+DATASET_CACHE_MAX_MB = int(os.getenv("DATASET_CACHE_MAX_MB", "512"))
+
+# ---------------------------------------------------------
+# 10. VERİTABANI BAĞLANTI HAVUZU
+# ---------------------------------------------------------
+# Süreç başına amaç başına tek SQLAlchemy engine'i bu ayarlarla kurulur: get_db_engine
+# (dashboard, tüm oturumlar) ve get_batch_engine (gold_loader/gold_master yazmaları).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Havuz doluyken bağlantı için en fazla bekleme (sn); aşılırsa TimeoutError
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Bu süreden (sn) eski bağlantılar kapatılıp yenisi açılır (-1 = kapalı)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Postgres statement_timeout (ms, 0 = sınırsız); sadece dashboard engine'ine uygulanır,
+# batch engine'i (COPY, CREATE INDEX, REFRESH MATERIALIZED VIEW) süre sınırı olmadan çalışır
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "60000"))
+
+# ---------------------------------------------------------
+# 11. NASA POWER API
+# ---------------------------------------------------------
+NASA_POWER_URL = os.getenv("NASA_POWER_URL", "https://power.larc.nasa.gov/api/temporal/annual/point")
+NASA_PARAMETERS = os.getenv("NASA_PARAMETERS", "ALLSKY_SFC_SW_DWN,WS2M")
+NASA_TIMEOUT = float(os.getenv("NASA_TIMEOUT", "7"))
+# Yıllık veriler nadiren değişir: varsayılan 30 gün sonra arka planda yenilenir
+NASA_CACHE_DIR = os.getenv("NASA_CACHE_DIR", ".nasa_cache")
+NASA_CACHE_TTL_SECONDS = int(os.getenv("NASA_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+# true: ağa hiç çıkılmaz, sadece önbellekteki veriler kullanılır
+NASA_OFFLINE = os.getenv("NASA_OFFLINE", "false").lower() == "true"
+# Toplu ön yükleme (nasa_prefetch.py): eşzamanlı istek sınırı, saniyedeki istek
+# tavanı ve hata/429 durumunda üstel geri çekilme (1s, 2s, 4s, ...)
+NASA_COORDINATES_FILE = os.getenv("NASA_COORDINATES_FILE", "entity_coordinates.csv")
+NASA_PREFETCH_CONCURRENCY = int(os.getenv("NASA_PREFETCH_CONCURRENCY", "8"))
+NASA_PREFETCH_RATE_PER_SEC = float(os.getenv("NASA_PREFETCH_RATE_PER_SEC", "5"))
+NASA_PREFETCH_MAX_RETRIES = int(os.getenv("NASA_PREFETCH_MAX_RETRIES", "4"))
+NASA_PREFETCH_BACKOFF_SECONDS = float(os.getenv("NASA_PREFETCH_BACKOFF_SECONDS", "1.0"))
+NASA_START_YEAR = int(os.getenv("NASA_START_YEAR", "2000"))
+NASA_END_YEAR = int(os.getenv("NASA_END_YEAR", "2025"))
+
+# ---------------------------------------------------------
+# 12. MODEL EĞİTİMİ (train_models.py)
+# ---------------------------------------------------------
+# Ülke modelleri bu kadar süreçte paralel eğitilir (1 = tek süreçte sıralı)
+TRAIN_WORKERS = max(1, int(os.getenv("TRAIN_WORKERS", str(os.cpu_count() or 1))))
+# Her XGBoost modelinin thread sayısı; 0 = çekirdekler süreçlere bölünür (süreç x thread <= çekirdek)
+TRAIN_XGB_NTHREAD = int(os.getenv("TRAIN_XGB_NTHREAD", "0"))
@@ -0,0 +1,50 @@
+import threading
+from sqlalchemy import text
+from config import logger
+from run_ledger import OPS_SCHEMA
+
+# ---------------------------------------------------------
+# GOLD VERİ SÜRÜMÜ
+# ---------------------------------------------------------
+# Her gold yayını (swap ya da upsert) aynı transaction içinde tablonun sürümünü
+# tek bir sequence'ten alınan yeni değere çeker. Sürümler tablo bazında ve
+# monoton artandır; en büyüğü gold katmanının genel veri sürümüdür. Dashboard
+# bu küçük tabloyu okuyarak snapshot'ının güncel olup olmadığını anlar.
+VERSION_TABLE = f"{OPS_SCHEMA}.data_versions"
+VERSION_SEQUENCE = f"{OPS_SCHEMA}.data_version_seq"
+
+_ddl_lock = threading.Lock()
+_ddl_done = False
+
+def ensure_version_table(engine):
+    # Eşzamanlı ETL thread'leri aynı DDL'i yarıştırmasın diye süreç başına bir kez
+    global _ddl_done
+    with _ddl_lock:
+        if _ddl_done:
+            return
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {OPS_SCHEMA}"))
+            conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {VERSION_SEQUENCE}"))
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+                f"table_name TEXT PRIMARY KEY, version BIGINT NOT NULL, updated_at TIMESTAMP NOT NULL)"
+            ))
+        _ddl_done = True
+
+def bump_table_version(conn, table_name):
+    """Yayınla aynı transaction içinde çağrılır; commit'le birlikte görünür olur."""
+    return conn.execute(text(
+        f"INSERT INTO {VERSION_TABLE} (table_name, version, updated_at) "
+        f"VALUES (:t, nextval('{VERSION_SEQUENCE}'), now()) "
+        f"ON CONFLICT (table_name) DO UPDATE SET version = EXCLUDED.version, updated_at = EXCLUDED.updated_at "
+        f"RETURNING version"
+    ), {"t": table_name}).scalar()
+
+def fetch_table_versions(engine):
+    """{tablo: sürüm}; sürüm tablosu henüz yoksa (hiç ETL koşmamış) boş sözlük."""
+    try:
+        with engine.connect() as conn:
+            return dict(conn.execute(text(f"SELECT table_name, version FROM {VERSION_TABLE}")).all())
+    except Exception as e:
+        logger.info(f" Veri sürümleri okunamadı, sürüm takibi yapılmayacak: {str(e).splitlines()[0]}")
+        return {}
@@ -0,0 +1,89 @@
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+from config import logger
+
+# ---------------------------------------------------------
+# SÜREÇ GENELİ, BAYT BÜTÇELİ LRU VERİ ÖNBELLEĞİ
+# ---------------------------------------------------------
+# Dashboard'un gold tabloları ve onlardan türeyen frame'ler (master, ülke
+# indeksleri) Streamlit sürecinde tek kopya olarak burada durur; oturumlar
+# sadece referans alır. Toplam boyut bütçeyi aşınca en uzun süredir
+# kullanılmayan girdiler atılır. Değerler paylaşılır: okuyan kod yerinde
+# değiştirmemeli, gerekiyorsa .copy() almalıdır.
+
+def frame_nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    return sys.getsizeof(value)
+
+class ByteLRUCache:
+    def __init__(self, max_bytes, on_evict=None):
+        self.max_bytes = max_bytes
+        self._on_evict = on_evict
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value, nbytes=None):
+        """Girdiyi ekler ve bütçe aşılırsa eskilerden atar. Tek başına bütçeyi aşan girdi yine tutulur."""
+        nbytes = frame_nbytes(value) if nbytes is None else nbytes
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, (_, old_bytes) = self._entries.popitem(last=False)
+                self.bytes -= old_bytes
+                self.evictions += 1
+                evicted.append(old_key)
+        if evicted:
+            logger.info(f" Veri önbelleği bütçesi aşıldı, atılanlar: {', '.join(map(str, evicted))}")
+            if self._on_evict:
+                for old_key in evicted:
+                    self._on_evict(old_key)
+        if nbytes > self.max_bytes:
+            logger.warning(f" {key} tek başına veri önbelleği bütçesini aşıyor ({nbytes / 1024 / 1024:.1f} MB)")
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
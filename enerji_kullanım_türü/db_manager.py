@@ -1,26 +1,267 @@
-from sqlalchemy import create_engine, text
+import os
+import time
+import threading
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple, Union
+from sqlalchemy import create_engine, make_url, text, bindparam
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.elements import TextClause
 import pandas as pd
-from config import DB_USER, DB_PASS, DB_HOST, DB_NAME, logger
+from config import (DB_USER, DB_PASS, DB_HOST, DB_NAME, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS, logger)
+
+# ---------------------------------------------------------
+# SÜREÇ GENELİ BAĞLANTI HAVUZU
+# ---------------------------------------------------------
+# Her çağrıda create_engine yeni bir havuz (ve yeni bağlantılar) açıyordu; çok
+# oturumlu dashboard ve paralel eğitimde Postgres bağlantıları tükeniyordu.
+# Artık süreç başına amaç başına tek engine var: get_db_engine (dashboard
+# okumaları, statement_timeout'lu) ve get_batch_engine (gold yükleme, indeks,
+# view tazeleme; süre sınırı yok). fork edilen alt süreç ebeveynin soketlerini
+# paylaşmasın diye PID değişince engine yeniden kurulur.
+class MeteredQueuePool(QueuePool):
+    """Bağlantı alımlarını, havuz kuyruğunda bekleme süresini ve zaman aşımlarını sayar.
+
+    Sayaçlar havuz nesnesine aittir (dashboard ve batch ayrı ayrı). Sadece kuyruktaki
+    bekleme ölçülür; taşma için yeni bağlantı açmanın (connect) süresi beklemeye girmez.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = {"checkouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "timeouts": 0}
+        self._stats_lock = threading.Lock()
+        queue_get = self._pool.get
+
+        def metered_get(block=True, timeout=None):
+            started = time.perf_counter()
+            try:
+                return queue_get(block, timeout)
+            finally:
+                waited = time.perf_counter() - started
+                with self._stats_lock:
+                    self.stats["wait_seconds_total"] += waited
+                    self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], waited)
+        self._pool.get = metered_get
+
+    def connect(self):
+        with self._stats_lock:
+            self.stats["checkouts"] += 1
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.stats["timeouts"] += 1
+            raise
+
+def create_pooled_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT,
+                         pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=DB_POOL_PRE_PING,
+                         statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS):
+    connect_args = {}
+    # 0 da açıkça gönderilir: rol/veritabanı düzeyinde tanımlı bir timeout batch engine'ine sızmasın
+    if url.startswith("postgresql") and statement_timeout_ms is not None:
+        # connect_args URL'deki options'ı ezer; URL'de verilenler (search_path vb.) korunur
+        options = make_url(url).query.get("options")
+        connect_args["options"] = " ".join(filter(None, [options, f"-c statement_timeout={int(statement_timeout_ms)}"]))
+    return create_engine(url, poolclass=MeteredQueuePool, pool_size=pool_size, max_overflow=max_overflow,
+                         pool_timeout=pool_timeout, pool_recycle=pool_recycle, pool_pre_ping=pool_pre_ping,
+                         connect_args=connect_args)
+
+_engines = {}
+_engine_lock = threading.Lock()
+
+def _shared_engine(purpose, statement_timeout_ms):
+    with _engine_lock:
+        engine, pid = _engines.get(purpose, (None, None))
+        if engine is not None and pid == os.getpid():
+            return engine
+        try:
+            if engine is not None:
+                # fork sonrası: ebeveynin bağlantılarına dokunmadan havuzu bırak
+                engine.dispose(close=False)
+            engine = create_pooled_engine(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:5432/{DB_NAME}",
+                                          statement_timeout_ms=statement_timeout_ms)
+            _engines[purpose] = (engine, os.getpid())
+            return engine
+        except Exception as e:
+            logger.error(f"DB Engine Hatası: {str(e)}", exc_info=True)
+            return None
 
 def get_db_engine():
-    try:
-        engine = create_engine(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:5432/{DB_NAME}")
-        return engine
-    except Exception as e:
-        logger.error(f"DB Engine Hatası: {str(e)}", exc_info=True)
-        return None
+    """Dashboard ve kısa sorgular: DB_STATEMENT_TIMEOUT_MS ile sınırlı."""
+    return _shared_engine("dashboard", DB_STATEMENT_TIMEOUT_MS)
+
+def get_batch_engine():
+    """Gold yükleme/COPY, indeks kurma, view tazeleme ve sürüm artırma: statement_timeout yok."""
+    return _shared_engine("batch", 0)
+
+def pool_metrics(engine=None, purpose="dashboard"):
+    """Havuz doluluğu (anlık) ve havuz kurulduğundan beri bağlantı bekleme istatistikleri.
+    engine verilmezse bu süreçteki purpose ("dashboard" | "batch") engine'inin havuzu okunur.
+    """
+    engine = engine or _engines.get(purpose, (None, None))[0]
+    pool = getattr(engine, "pool", None)
+    if isinstance(pool, MeteredQueuePool):
+        with pool._stats_lock:
+            stats = dict(pool.stats)
+    else:
+        stats = {"checkouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "timeouts": 0}
+    stats["wait_seconds_avg"] = stats["wait_seconds_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    if isinstance(pool, QueuePool):
+        stats.update(pool_size=pool.size(), checked_out=pool.checkedout(), overflow=max(pool.overflow(), 0),
+                     idle=pool.checkedin())
+    return stats
+
+def quote_ident(name):
+    """SQL tanımlayıcısını (tablo/kolon) çift tırnakla güvenli şekilde sarar."""
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"Geçersiz tanımlayıcı: {name!r}")
+    return '"' + name.replace('"', '""') + '"'
+
+# ---------------------------------------------------------
+# FİLTRE / PROJEKSİYON / AGREGASYON PUSHDOWN
+# ---------------------------------------------------------
+# Sayfalar tüm tabloyu çekip pandas'ta filtrelemek yerine grafikte göstereceği
+# satırları Postgres'ten ister. Değerler her zaman bind parametresi, kolon ve
+# tablo adları her zaman quote_ident ile sorguya girer.
+AGGREGATE_FUNCTIONS = {"sum": "SUM", "avg": "AVG", "min": "MIN", "max": "MAX", "count": "COUNT"}
+SORT_DIRECTIONS = {"asc": "ASC", "desc": "DESC"}
+
+def _order_clause(spec):
+    column, direction = (spec, "asc") if isinstance(spec, str) else spec
+    if direction.lower() not in SORT_DIRECTIONS:
+        raise ValueError(f"Geçersiz sıralama yönü: {direction!r}")
+    return f"{quote_ident(column)} {SORT_DIRECTIONS[direction.lower()]}"
+
+def _aggregate_clause(alias, spec):
+    func, column = spec
+    if func.lower() not in AGGREGATE_FUNCTIONS:
+        raise ValueError(f"Desteklenmeyen agregasyon: {func!r}")
+    target = "*" if column == "*" and func.lower() == "count" else quote_ident(column)
+    return f"{AGGREGATE_FUNCTIONS[func.lower()]}({target}) AS {quote_ident(alias)}"
+
+def build_query(table: str,
+                columns: Optional[Sequence[str]] = None,
+                entities: Union[str, Sequence[str], None] = None,
+                year_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
+                order_by: Optional[Sequence[Union[str, Tuple[str, str]]]] = None,
+                limit: Optional[int] = None,
+                group_by: Optional[Sequence[str]] = None,
+                aggregates: Optional[Mapping[str, Tuple[str, str]]] = None,
+                not_null: Optional[Sequence[str]] = None,
+                schema: Optional[str] = None) -> Tuple[TextClause, Dict[str, Any]]:
+    """Tek tablo için parametrik SELECT üretir.
+
+    aggregates: {"takma_ad": ("sum" | "avg" | "min" | "max" | "count", "kolon" | "*")}
+    order_by: ["Year", ("Share_Renewables", "desc")]
+    not_null: ["Renewables_Share"] -> sadece bu kolonları dolu olan satırlar
+    """
+    params = {}
+    if group_by or aggregates:
+        select = [quote_ident(c) for c in group_by or []]
+        select += [_aggregate_clause(alias, spec) for alias, spec in (aggregates or {}).items()]
+    else:
+        select = [quote_ident(c) for c in columns] if columns else ["*"]
+
+    source = quote_ident(table) if schema is None else f"{quote_ident(schema)}.{quote_ident(table)}"
+    sql = f"SELECT {', '.join(select)} FROM {source}"
+
+    where = []
+    if entities is not None:
+        params["entities"] = [entities] if isinstance(entities, str) else list(entities)
+        where.append('"Entity" IN :entities')
+    if year_range is not None:
+        start, end = year_range
+        if start is not None:
+            params["year_start"] = int(start)
+            where.append('"Year" >= :year_start')
+        if end is not None:
+            params["year_end"] = int(end)
+            where.append('"Year" <= :year_end')
+    for c in not_null or []:
+        where.append(f"{quote_ident(c)} IS NOT NULL")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if group_by:
+        sql += " GROUP BY " + ", ".join(quote_ident(c) for c in group_by)
+    if order_by:
+        sql += " ORDER BY " + ", ".join(_order_clause(spec) for spec in order_by)
+    if limit is not None:
+        params["limit"] = int(limit)
+        sql += " LIMIT :limit"
+
+    query = text(sql)
+    if "entities" in params:
+        query = query.bindparams(bindparam("entities", expanding=True))
+    return query, params
+
+def query_table(table: str, engine=None, **options) -> pd.DataFrame:
+    """build_query ile üretilen sorguyu çalıştırır; seçenekler için build_query'ye bakın."""
+    query, params = build_query(table, **options)
+    logger.info(f"Pushdown sorgusu: Tablo={table}, Parametreler={params}")
+    return pd.read_sql(query, engine or get_db_engine(), params=params)
 
 def load_filtered_data(table_name, columns=None, entity=None):
     """SQL Filtreleme ile optimize ve GÜVENLİ veri çekme"""
-    engine = get_db_engine()
-    col_str = "*" if not columns else ", ".join([f'"{c}"' for c in columns])
-    
     # SENIOR DOKUNUŞU: SQL Injection'ı engellemek için parametrik sorgu (Bind Parameters)
-    if entity:
-        query = text(f"SELECT {col_str} FROM {table_name} WHERE \"Entity\" = :entity_param")
-        logger.info(f"Parametrik sorgu çalıştırılıyor: Tablo={table_name}, Filtre={entity}")
-        return pd.read_sql(query, engine, params={"entity_param": entity})
-    else:
-        query = text(f"SELECT {col_str} FROM {table_name}")
-        logger.info(f"Tüm veriler çekiliyor: Tablo={table_name}")
-        return pd.read_sql(query, engine)
\ No newline at end of file
+    return query_table(table_name, columns=columns, entities=entity)
+
+# ---------------------------------------------------------
+# COPY TO STDOUT İLE TABLO OKUMA
+# ---------------------------------------------------------
+# pd.read_sql satırları önce Python tuple'larına çevirir; büyük tablolarda asıl
+# maliyet budur. COPY ... TO STDOUT CSV'yi bellekteki bir tampona yazar (akış
+# değil: tablonun CSV hali bir kez bellekte tutulur), pyarrow bunu C++
+# tarafında kolon tiplerini Postgres'in bildirdiği tiplere göre ayrıştırır.
+# Tampon DataFrame'e çevrilmeden önce bırakılır; CSV ile DataFrame aynı anda tutulmaz.
+PG_OID_TO_ARROW = {
+    16: "bool", 20: "int64", 21: "int16", 23: "int32",
+    700: "float32", 701: "float64", 1700: "float64", 25: "string", 1043: "string",
+    1082: "date32", 1114: "timestamp[us]", 1184: "timestamptz"
+}
+
+def _arrow_type(oid):
+    import pyarrow as pa
+    alias = PG_OID_TO_ARROW.get(oid, "string")
+    # Oturum saat dilimi ne olursa olsun timestamptz ofsetiyle gelir; read_sql gibi UTC'ye çevrilir
+    return pa.timestamp("us", tz="UTC") if alias == "timestamptz" else pa.type_for_alias(alias)
+
+def parse_copy_csv(data, columns):
+    """COPY ... (FORMAT csv) çıktısını [(kolon, oid)] listesine göre Arrow tablosuna ayrıştırır."""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    names = [name for name, _ in columns]
+    if len(data) == 0:
+        return pa.schema([(name, _arrow_type(oid)) for name, oid in columns]).empty_table()
+    return pacsv.read_csv(
+        pa.BufferReader(data),
+        read_options=pacsv.ReadOptions(column_names=names),
+        # Postgres CSV'de NULL tırnaksız boş alan, boş metin ise "" olarak gelir; boolean t/f yazılır
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: _arrow_type(oid) for name, oid in columns},
+            true_values=["t"], false_values=["f"],
+            strings_can_be_null=True, quoted_strings_can_be_null=False
+        )
+    )
+
+def read_table_copy(table, engine=None, schema=None):
+    """Tabloyu COPY TO STDOUT (CSV) ile bellekteki bir tampona okur, pandas DataFrame döner.
+    Her çağrı havuzdan kendi bağlantısını alır.
+    """
+    import pyarrow as pa
+    source = quote_ident(table) if schema is None else f"{quote_ident(schema)}.{quote_ident(table)}"
+    raw_conn = (engine or get_db_engine()).raw_connection()
+    try:
+        # Arrow'un kendi tamponu: getvalue() kopyalamadan pyarrow'a verilir
+        buffer = pa.BufferOutputStream()
+        with raw_conn.cursor() as cur:
+            cur.execute(f"SELECT * FROM {source} LIMIT 0")
+            columns = [(d.name, d.type_code) for d in cur.description]
+            cur.copy_expert(f"COPY (SELECT * FROM {source}) TO STDOUT WITH (FORMAT csv)", buffer)
+        raw_conn.commit()
+    finally:
+        raw_conn.close()
+
+    table_arrow = parse_copy_csv(buffer.getvalue(), columns)
+    # CSV tamponu DataFrame'e çevirmeden önce bırakılır
+    del buffer
+    return table_arrow.to_pandas(coerce_temporal_nanoseconds=True)
@@ -0,0 +1,165 @@
+import io
+import csv
+import time
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+from config import SILVER_PARTITION_BY_YEAR, logger
+from lake_utils import (RAW_BUCKET, dataset_name, clean_column_name, table_name_for, decompress_bytes,
+                        get_arrow_s3_filesystem, SILVER_KEY_COLUMNS, can_run_incremental)
+from schema_registry import resolve_arrow_column_types, pin_and_persist_arrow_schema
+from gold_loader import load_gold_arrow, upsert_gold_arrow
+from gold_master import MASTER_TABLE, MASTER_SOURCES, publish_energy_master_arrow
+
+# ---------------------------------------------------------
+# pandas/ARROW MOTORU (Küçük girdiler için SparkSession'sız ETL)
+# ---------------------------------------------------------
+# Spark motoruyla aynı kuralları uygular: aynı şema kayıt defteri, aynı kolon
+# temizliği, aynı silver yerleşimi (Entity/Year sıralı, opsiyonel Year partition'ı)
+# ve aynı staging + swap gold yüklemesi.
+KEY_COLUMNS = SILVER_KEY_COLUMNS
+BATCH_COLUMN = "_batch_id"
+
+def read_csv_arrow(data, dataset, client=None):
+    """CSV baytlarını kayıtlı şema ile Arrow tablosuna okur (Spark'taki gibi boş hücre = null)."""
+    header = next(csv.reader(io.StringIO(data.split(b"\n", 1)[0].decode("utf-8-sig"))))
+    column_types = resolve_arrow_column_types(dataset, header, client)
+    convert_options = pacsv.ConvertOptions(column_types=column_types or {}, strings_can_be_null=True)
+    table = pacsv.read_csv(io.BytesIO(data), convert_options=convert_options)
+    if column_types is None:
+        logger.info(f" {dataset} için kayıtlı şema yok, Arrow çıkarımı saklanıyor.")
+        table = pin_and_persist_arrow_schema(dataset, table, client)
+    return table
+
+def clean_table(table):
+    return table.rename_columns([clean_column_name(c) for c in table.column_names])
+
+def sort_for_silver(table):
+    keys = [c for c in ["Entity", "Year"] if c in table.column_names]
+    return table.sort_by([(k, "ascending") for k in keys]) if keys else table
+
+def write_silver_arrow(table, silver_path, filesystem, basename="part-{i}-local.parquet", overwrite=True):
+    """Silver'ı Spark motoruyla aynı yerleşimde yazar (opsiyonel Year partition'ı); yazılan baytı döner."""
+    if overwrite:
+        filesystem.delete_dir_contents(silver_path, missing_dir_ok=True)
+    partitioning = None
+    if SILVER_PARTITION_BY_YEAR and "Year" in table.column_names:
+        partitioning = ds.partitioning(pa.schema([table.schema.field("Year")]), flavor="hive")
+    written = []
+    ds.write_dataset(sort_for_silver(table), silver_path, filesystem=filesystem, format="parquet",
+                     partitioning=partitioning, basename_template=basename,
+                     existing_data_behavior="overwrite_or_ignore", file_visitor=lambda f: written.append(f.size))
+    return sum(written)
+
+def silver_schema_arrow(silver_path, filesystem):
+    """Tüm silver dosyalarının birleşik şeması; sadece Parquet footer'ları okunur (delta dosyalarında _batch_id var)."""
+    dataset = ds.dataset(silver_path, filesystem=filesystem, format="parquet", partitioning="hive")
+    return pa.unify_schemas([dataset.schema] + [f.physical_schema for f in dataset.get_fragments()])
+
+def read_silver_arrow(silver_path, filesystem):
+    """Tüm silver dosyalarını şemaları birleştirerek okur."""
+    schema = silver_schema_arrow(silver_path, filesystem)
+    return ds.dataset(silver_path, filesystem=filesystem, format="parquet", partitioning="hive",
+                      schema=schema).to_table()
+
+def latest_silver_frame(silver_path, filesystem):
+    """Silver'daki her (Entity, Year) anahtarının en son batch'teki halini pandas olarak döner."""
+    existing = read_silver_arrow(silver_path, filesystem).to_pandas()
+    if BATCH_COLUMN in existing.columns:
+        existing = existing.assign(_order=existing[BATCH_COLUMN].fillna(0)) \
+            .sort_values("_order", ascending=False, kind="stable").drop_duplicates(KEY_COLUMNS) \
+            .drop(columns=["_order", BATCH_COLUMN])
+    return existing
+
+def silver_delta_arrow(table, silver_path, filesystem):
+    """Silver'daki en son hali ile birebir aynı olmayan (yeni/değişmiş) satırları döner."""
+    existing = latest_silver_frame(silver_path, filesystem)[table.column_names]
+
+    incoming = table.to_pandas()
+    # pandas merge NaN'ları eşit sayar -> boş Code'lu satırlar değişmemişse eşleşir
+    merged = incoming.merge(existing.drop_duplicates(), how="left", on=table.column_names, indicator=True)
+    delta = merged[merged["_merge"] == "left_only"].drop(columns="_merge")
+    return pa.Table.from_pandas(delta, schema=table.schema, preserve_index=False)
+
+def _close_stage(status, stage, wall_started, cpu_started, **metrics):
+    status["stages"][stage] = dict(metrics, wall_seconds=time.perf_counter() - wall_started,
+                                   cpu_seconds=time.thread_time() - cpu_started)
+
+def process_bronze_file_local(file_path, minio_client, write_mode="full", batch_id=0, object_size=None):
+    """process_bronze_file'ın SparkSession'sız karşılığı; aynı durum sözlüğünü döner."""
+    started = time.perf_counter()
+    base_name = dataset_name(file_path)
+    table_name = table_name_for(base_name)
+    status = {"file": file_path, "table": table_name, "stage": "read", "status": "OK", "error": None,
+              "bytes_read": {}, "mode": "full", "stages": {}}
+    stage_started, cpu_started = started, time.thread_time()
+
+    try:
+        response = minio_client.get_object(RAW_BUCKET, file_path)
+        try:
+            raw = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+        status["bytes_read"]["silver"] = object_size if object_size is not None else len(raw)
+
+        table = clean_table(read_csv_arrow(decompress_bytes(file_path, raw), base_name, minio_client))
+        logger.info(f" Okundu (Arrow): {file_path.split('/')[-1]} ({table.num_rows} satır)")
+        _close_stage(status, "read", stage_started, cpu_started, rows_out=table.num_rows,
+                     bytes_read=status["bytes_read"]["silver"])
+
+        filesystem = get_arrow_s3_filesystem()
+        silver_path = f"{RAW_BUCKET}/silver/{table_name}.parquet"
+        # Spark motoruyla aynı şartlar: yerleşim ya da kolonlar değiştiyse tam yenileme
+        if write_mode == "incremental" and can_run_incremental(
+                minio_client, table_name, table.column_names,
+                lambda: silver_schema_arrow(silver_path, filesystem).names):
+            status["mode"] = "incremental"
+
+        # SILVER
+        status["stage"] = "silver"
+        stage_started, cpu_started = time.perf_counter(), time.thread_time()
+        written = 0
+        if status["mode"] == "incremental":
+            delta = silver_delta_arrow(table, silver_path, filesystem)
+            status["rows"] = delta.num_rows
+            if delta.num_rows:
+                batch = delta.append_column(BATCH_COLUMN, pa.array([batch_id] * delta.num_rows, pa.int64()))
+                written = write_silver_arrow(batch, silver_path, filesystem,
+                                             basename=f"part-{{i}}-{batch_id}.parquet", overwrite=False)
+            logger.info(f" Silver (Parquet) Delta Eklendi: {table_name}.parquet ({delta.num_rows} satır)")
+        else:
+            written = write_silver_arrow(table, silver_path, filesystem)
+            logger.info(f" Silver (Parquet) Yazıldı: {table_name}.parquet")
+        _close_stage(status, "silver", stage_started, cpu_started, rows_in=table.num_rows,
+                     rows_out=status.get("rows", table.num_rows), bytes_written=written)
+
+        # GOLD: tablo zaten bellekte, tekrar okumaya gerek yok
+        status["stage"] = "gold"
+        stage_started, cpu_started = time.perf_counter(), time.thread_time()
+        status["bytes_read"]["gold"] = 0
+        if status["mode"] == "incremental":
+            if status["rows"]:
+                upsert_gold_arrow(delta, table_name, KEY_COLUMNS)
+        else:
+            load_gold_arrow(sort_for_silver(table), table_name)
+        logger.info(f" Gold (Postgres) Güncellendi: Tablo Adı -> {table_name}")
+        _close_stage(status, "gold", stage_started, cpu_started, bytes_read=0,
+                     rows_out=status.get("rows", table.num_rows))
+        status["stage"] = "done"
+    except Exception as e:
+        status["status"] = "HATA"
+        status["error"] = str(e).splitlines()[0] if str(e) else repr(e)
+        logger.error(f" {file_path} işlenemedi ({status['stage']} aşaması): {e}")
+        _close_stage(status, status["stage"], stage_started, cpu_started)
+    finally:
+        status["seconds"] = round(time.perf_counter() - started, 2)
+
+    return status
+
+def refresh_energy_master_local():
+    """Kaynak silver tablolarının son halinden energy_master'ı yeniden üretir (Spark'sız)."""
+    filesystem = get_arrow_s3_filesystem()
+    frames = {role: latest_silver_frame(f"{RAW_BUCKET}/silver/{table}.parquet", filesystem)
+              for role, table in MASTER_SOURCES.items()}
+    publish_energy_master_arrow(frames, f"{RAW_BUCKET}/silver/{MASTER_TABLE}.parquet", filesystem)
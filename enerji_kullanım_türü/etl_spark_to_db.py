@@ -1,7 +1,24 @@
 import os
-from pyspark.sql import SparkSession
-from minio import Minio
-from config import MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_ENDPOINT, DB_CONFIG, logger
+import sys
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pyspark.sql import SparkSession, Window
+from pyspark.sql import functions as F
+from config import (MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_ENDPOINT, ETL_MAX_CONCURRENCY, ETL_WRITE_MODE,
+                    SILVER_PARTITION_BY_YEAR, SILVER_ENTITY_BUCKETS, ETL_ENGINE, ETL_ENGINE_THRESHOLD_MB, logger)
+from lake_utils import (RAW_BUCKET, BRONZE_PREFIX, get_minio_client, is_bronze_object, dataset_name,
+                        clean_column_name, table_name_for, load_manifest, load_etl_state, save_etl_state,
+                        select_pending_objects, SILVER_KEY_COLUMNS, ENTITY_BUCKET_COLUMN, silver_exists,
+                        can_run_incremental)
+from schema_registry import read_bronze_csv
+from gold_loader import load_gold_table, upsert_gold_table
+from gold_master import MASTER_TABLE, MASTER_SOURCES, publish_energy_master, refresh_materialized_views
+from etl_pandas import process_bronze_file_local, refresh_energy_master_local
+from run_ledger import RunLedger
+
+KEY_COLUMNS = SILVER_KEY_COLUMNS
+BATCH_COLUMN = "_batch_id"
 
 def get_spark_session():
     return SparkSession.builder \
@@ -12,72 +29,346 @@ def get_spark_session():
         .config("spark.hadoop.fs.s3a.secret.key", MINIO_SECRET_KEY) \
         .config("spark.hadoop.fs.s3a.path.style.access", "true") \
         .config("spark.hadoop.fs.s3a.impl", "org.apache.hadoop.fs.s3a.S3AFileSystem") \
+        .config("spark.scheduler.mode", "FAIR") \
         .getOrCreate()
 
-def run_dynamic_etl():
+# Spark stage metriği -> çalışma kaydı alanı
+STAGE_METRIC_FIELDS = {"inputBytes": "bytes_read", "outputBytes": "bytes_written",
+                       "inputRecords": "rows_in", "outputRecords": "rows_out"}
+
+def stage_metrics(spark, job_group):
+    """Bir job grubunun okuduğu/yazdığı bayt ve satırları ve executor CPU süresini
+    Spark UI REST API'sinden okur.
+
+    Job grupları thread'e özeldir, bu yüzden eşzamanlı dosyalarda da her
+    aşamanın okuması ayrı ölçülür. UI kapalıysa boş sözlük döner.
+    """
+    sc = spark.sparkContext
+    if not sc.uiWebUrl:
+        return {}
+    base = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}"
+    try:
+        jobs = requests.get(f"{base}/jobs", timeout=5).json()
+        stage_ids = {sid for job in jobs if job.get("jobGroup") == job_group for sid in job["stageIds"]}
+        totals = dict.fromkeys(STAGE_METRIC_FIELDS.values(), 0)
+        cpu_ns = 0
+        for stage_id in stage_ids:
+            for attempt in requests.get(f"{base}/stages/{stage_id}", timeout=5).json():
+                for source, target in STAGE_METRIC_FIELDS.items():
+                    totals[target] += attempt.get(source, 0)
+                cpu_ns += attempt.get("executorCpuTime", 0)
+        totals["cpu_seconds"] = cpu_ns / 1e9
+        return totals
+    except Exception as e:
+        logger.warning(f" Spark metrikleri okunamadı ({job_group}): {e}")
+        return {}
+
+def stage_bytes_read(spark, job_group):
+    return stage_metrics(spark, job_group).get("bytes_read")
+
+def format_bytes(value):
+    return "n/a" if value is None else f"{value / 1024 / 1024:.2f} MB"
+
+# ---------------------------------------------------------
+# SILVER YERLEŞİMİ (Year / Entity kovası partition'ları)
+# ---------------------------------------------------------
+def silver_partition_columns(columns):
+    partition_cols = []
+    if SILVER_PARTITION_BY_YEAR and "Year" in columns:
+        partition_cols.append("Year")
+    if SILVER_ENTITY_BUCKETS > 0 and "Entity" in columns:
+        partition_cols.append(ENTITY_BUCKET_COLUMN)
+    return partition_cols
+
+def entity_bucket(entity_col):
+    return F.pmod(F.xxhash64(entity_col), F.lit(SILVER_ENTITY_BUCKETS))
+
+def write_silver(df, silver_path, mode="overwrite"):
+    """Silver'ı Year ve/veya Entity kovasına göre partition'lı, Entity'ye göre sıralı yazar.
+
+    Partition'lar dosya budamayı, Entity sıralaması da row group min/max
+    istatistikleri ile ülke filtrelerinde row group budamayı sağlar.
+    """
+    partition_cols = silver_partition_columns(df.columns)
+    if ENTITY_BUCKET_COLUMN in partition_cols:
+        df = df.withColumn(ENTITY_BUCKET_COLUMN, entity_bucket(F.col("Entity")))
+    if partition_cols:
+        df = df.repartition(*partition_cols)
+    if "Entity" in df.columns:
+        df = df.sortWithinPartitions(*[c for c in ["Entity", "Year"] if c in df.columns and c not in partition_cols])
+
+    writer = df.write.mode(mode)
+    if partition_cols:
+        writer = writer.partitionBy(*partition_cols)
+    writer.parquet(silver_path)
+
+def read_silver(spark, silver_path, columns=None, merge_schema=False):
+    """Silver'ı okur; kova kolonunu atar, partition'a dönüşen kolonları orijinal sıraya koyar."""
+    df = spark.read.option("mergeSchema", str(merge_schema).lower()).parquet(silver_path)
+    df = df.drop(ENTITY_BUCKET_COLUMN)
+    return df.select(*columns) if columns else df
+
+def read_silver_filtered(spark, silver_path, entities=None, year_range=None):
+    """Ülke ve yıl filtreli silver okuması: partition ve row group budaması yapılır."""
+    df = spark.read.parquet(silver_path)
+    if entities:
+        if ENTITY_BUCKET_COLUMN in df.columns:
+            # Literal'in hash'i plan aşamasında sabitlenir -> sadece ilgili kova klasörleri okunur
+            df = df.where(F.col(ENTITY_BUCKET_COLUMN).isin([entity_bucket(F.lit(e)) for e in entities]))
+        df = df.where(F.col("Entity").isin(list(entities)))
+    if year_range:
+        df = df.where(F.col("Year").between(year_range[0], year_range[1]))
+    return df.drop(ENTITY_BUCKET_COLUMN)
+
+def clean_columns(df):
+    # Kolon isimlerindeki boşluk ve parantezleri temizle (Parquet ve Postgres kuralları)
+    for c in df.columns:
+        df = df.withColumnRenamed(c, clean_column_name(c))
+    return df
+
+def latest_silver_rows(spark, silver_path):
+    """Silver'daki her (Entity, Year) anahtarının en son batch'teki halini döner."""
+    existing = read_silver(spark, silver_path, merge_schema=True)
+    if BATCH_COLUMN not in existing.columns:
+        return existing
+    # Tam yüklemeden gelen satırların batch kolonu yok (null) -> en eski sayılır
+    w = Window.partitionBy(*KEY_COLUMNS).orderBy(F.coalesce(F.col(BATCH_COLUMN), F.lit(0)).desc())
+    return existing.withColumn("_rn", F.row_number().over(w)).where(F.col("_rn") == 1).drop("_rn", BATCH_COLUMN)
+
+def write_silver_delta(spark, df, silver_path, batch_id):
+    """Gelen satırlardan silver'da birebir aynısı olmayanları (yeni/değişmiş) silver'a ekler."""
+    existing = latest_silver_rows(spark, silver_path).select(df.columns)
+    # subtract null'ları eşit kabul eder (Code kolonu çoğu bölgede boş)
+    delta = df.subtract(existing).withColumn(BATCH_COLUMN, F.lit(batch_id))
+    write_silver(delta, silver_path, mode="append")
+    return read_silver(spark, silver_path, merge_schema=True) \
+        .where(F.col(BATCH_COLUMN) == batch_id).select(*df.columns)
+
+def refresh_energy_master(spark):
+    """Kaynak silver tablolarının son halinden conformed energy_master gold tablosunu üretir."""
+    spark.sparkContext.setJobGroup(f"{MASTER_TABLE}:gold", "silver -> energy_master")
+    frames = {role: latest_silver_rows(spark, f"s3a://raw-data/silver/{table}.parquet")
+              for role, table in MASTER_SOURCES.items()}
+    publish_energy_master(spark, frames, f"s3a://raw-data/silver/{MASTER_TABLE}.parquet")
+
+def master_needs_refresh(report, minio_client):
+    """Kaynaklardan biri bu çalıştırmada güncellendiyse ve hepsi silver'da varsa True."""
+    changed = {r["table"] for r in report if r["status"] == "OK"}
+    if not changed & set(MASTER_SOURCES.values()):
+        return False
+    missing = [t for t in MASTER_SOURCES.values() if not silver_exists(minio_client, t)]
+    if missing:
+        logger.warning(f" {MASTER_TABLE} üretilemedi, eksik silver tablolar: {', '.join(missing)}")
+        return False
+    return True
+
+def choose_engine(total_bytes, engine=ETL_ENGINE):
+    """Çalıştırma başına motor seçimi: küçük toplam girdi -> pandas/Arrow, büyük -> Spark."""
+    if engine in ("spark", "pandas"):
+        selected = engine
+    else:
+        selected = "pandas" if total_bytes <= ETL_ENGINE_THRESHOLD_MB * 1024 * 1024 else "spark"
+    # Entity hash kovaları Spark'ın xxhash64'üne bağlı; aynı yerleşim için Spark şart
+    if selected == "pandas" and SILVER_ENTITY_BUCKETS > 0:
+        logger.info(" SILVER_ENTITY_BUCKETS açık, Spark motoru kullanılacak.")
+        selected = "spark"
+    return selected
+
+def run_dynamic_etl(full_refresh=False, write_mode=ETL_WRITE_MODE, engine=ETL_ENGINE):
     logger.info("🚀 Dinamik Boru Hattı Başlatıldı: Bronze -> Silver -> Gold")
+    # --full her zaman tam yenileme demektir
+    write_mode = "full" if full_refresh else write_mode
+    batch_id = int(time.time() * 1000)
 
     # 1. MinIO'ya bağlanıp Bronze içindeki TÜM dosyaları listele
     try:
-        minio_client = Minio(MINIO_ENDPOINT.replace("http://", ""), 
-                             access_key=MINIO_ACCESS_KEY, 
-                             secret_key=MINIO_SECRET_KEY, 
-                             secure=False)
-        
-        objects = minio_client.list_objects("raw-data", prefix="bronze/", recursive=True)
-        csv_files = [obj.object_name for obj in objects if obj.object_name.endswith('.csv')]
+        minio_client = get_minio_client()
+
+        objects = minio_client.list_objects(RAW_BUCKET, prefix=BRONZE_PREFIX, recursive=True)
+        # .csv ve .csv.gz nesneleri: Spark sıkıştırmayı uzantıdan tanıyıp kendisi açar
+        object_sizes = {obj.object_name: obj.size for obj in objects if is_bronze_object(obj.object_name)}
+        all_csv_files = list(object_sizes)
+
+        # Ingest manifest'i ile ETL durumunu karşılaştır: sadece değişen dosyalar işlenir
+        manifest_entries = load_manifest(minio_client)
+        etl_state = {} if full_refresh else load_etl_state(minio_client)
+        csv_files, sha_by_object = select_pending_objects(all_csv_files, manifest_entries, etl_state)
     except Exception as e:
         logger.error(f" MinIO bağlantı hatası: {e}")
         return
 
-    if not csv_files:
+    if not all_csv_files:
         logger.warning(" Bronze klasöründe işlenecek CSV bulunamadı. Lütfen Ingest işlemini çalıştırın.")
         return
 
-    spark = get_spark_session()
-    logger.info(f" MinIO'da {len(csv_files)} adet dosya bulundu. İşlem başlıyor...")
-
-    # 2. Bulunan her bir dosyayı sırayla işle
-    for file_path in csv_files:
-        # Dosya adını temizleyip tablo adı üretiyoruz (örn: "bronze/veri.csv" -> "veri")
-        base_name = file_path.split('/')[-1].replace('.csv', '')
-        table_name = base_name.replace('-', '_').replace(' ', '_').lower()
-        
-        bronze_s3_path = f"s3a://raw-data/{file_path}"
-        
+    if not csv_files:
+        logger.info(f" {len(all_csv_files)} dosyanın hiçbiri son ETL'den beri değişmedi. İşlenecek veri yok.")
+        return
+
+    total_bytes = sum(object_sizes[f] for f in csv_files)
+    engine = choose_engine(total_bytes, engine)
+    logger.info(f" MinIO'da {len(all_csv_files)} adet dosya bulundu, {len(csv_files)} tanesi değişmiş "
+                f"({total_bytes / 1024 / 1024:.1f} MB). Motor: {engine}. İşlem başlıyor...")
+
+    # SparkSession (ve jar çözümlemesi) sadece büyük girdilerde başlatılır
+    spark = get_spark_session() if engine == "spark" else None
+    ledger = RunLedger(f"etl:{engine}")
+
+    # 2. Dosyaları eşzamanlı işle (Spark'ta FAIR havuzlarında; ETL_MAX_CONCURRENCY=1 ise sırayla)
+    workers = max(1, min(ETL_MAX_CONCURRENCY, len(csv_files)))
+    report = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if spark is not None:
+            futures = {
+                executor.submit(process_bronze_file, spark, file_path, minio_client, f"etl_pool_{i % workers}",
+                                write_mode, batch_id): file_path
+                for i, file_path in enumerate(csv_files)
+            }
+        else:
+            futures = {
+                executor.submit(process_bronze_file_local, file_path, minio_client, write_mode, batch_id,
+                                object_sizes[file_path]): file_path
+                for file_path in csv_files
+            }
+        for future in as_completed(futures):
+            file_path = futures[future]
+            status = future.result()
+            report.append(status)
+            record_file_stages(ledger, status)
+
+            # Başarıyla işlenen dosyanın içerik hash'ini ETL durumuna kaydet
+            if status["status"] == "OK" and file_path in sha_by_object:
+                etl_state[file_path] = sha_by_object[file_path]
+                save_etl_state(minio_client, etl_state)
+
+    # 3. Conformed gold: energy_master kaynakları değiştiyse bir kez yeniden üretilir
+    if master_needs_refresh(report, minio_client):
         try:
-            df = spark.read.option("header", "true").option("inferSchema", "true").csv(bronze_s3_path)
-            logger.info(f" Okundu: {base_name}.csv")
+            with ledger.stage("gold_master", MASTER_TABLE):
+                if spark is not None:
+                    refresh_energy_master(spark)
+                else:
+                    refresh_energy_master_local()
         except Exception as e:
-            logger.error(f" Spark okuma hatası ({bronze_s3_path}): {e}")
-            continue
-
-        # Kolon isimlerindeki boşluk ve parantezleri temizle (Parquet ve Postgres kuralları)
-        for c in df.columns:
-            clean_col = c.replace(" ", "_").replace("(", "").replace(")", "").replace("-", "_").replace("%", "pct")
-            df = df.withColumnRenamed(c, clean_col)
-        
-        # 3. SILVER'A YAZ (Parquet formatında)
+            logger.error(f" {MASTER_TABLE} üretilemedi: {e}")
+
+    # 4. Dashboard'un materialized view'ları her ETL çalıştırmasından sonra tazelenir
+    try:
+        with ledger.stage("gold_views", MASTER_TABLE):
+            refresh_materialized_views()
+    except Exception as e:
+        logger.error(f" Materialized view'lar tazelenemedi: {e}")
+
+    if spark is not None:
+        spark.stop()
+    log_status_report(report)
+    ledger.finish()
+    return report
+
+def process_bronze_file(spark, file_path, minio_client, pool_name, write_mode="full", batch_id=0):
+    """Tek bir bronze dosyası için Bronze -> Silver -> Gold akışı.
+
+    Hatalar dosya bazında yakalanır; bir dosyanın hatası diğerlerini durdurmaz.
+    """
+    # Bu thread'in gönderdiği Spark job'ları kendi FAIR havuzunda koşar
+    spark.sparkContext.setLocalProperty("spark.scheduler.pool", pool_name)
+    started = time.perf_counter()
+
+    # Dosya adını temizleyip tablo adı üretiyoruz (örn: "bronze/veri.csv.gz" -> "veri")
+    base_name = dataset_name(file_path)
+    table_name = table_name_for(base_name)
+    status = {"file": file_path, "table": table_name, "stage": "read", "status": "OK", "error": None,
+              "bytes_read": {}, "mode": "full", "stages": {}}
+    stage_started = started
+
+    bronze_s3_path = f"s3a://raw-data/{file_path}"
+
+    try:
+        # Şema kayıt defterinden okunur; inferSchema'nın ekstra tam taraması yapılmaz
+        df = read_bronze_csv(spark, bronze_s3_path, base_name, minio_client)
+        logger.info(f" Okundu: {file_path.split('/')[-1]}")
+
+        df = clean_columns(df)
+
         silver_path = f"s3a://raw-data/silver/{table_name}.parquet"
-        df.write.mode("overwrite").parquet(silver_path) 
-        logger.info(f" Silver (Parquet) Yazıldı: {table_name}.parquet")
+        if write_mode == "incremental" and can_run_incremental(
+                minio_client, table_name, df.columns,
+                lambda: read_silver(spark, silver_path, merge_schema=True).columns):
+            status["mode"] = "incremental"
+
+        # 3. SILVER'A YAZ (Parquet formatında) - CSV sadece burada bir kez taranır
+        status["stage"] = "silver"
+        stage_started = time.perf_counter()
+        spark.sparkContext.setJobGroup(f"{table_name}:silver", f"{file_path} -> silver")
+        if status["mode"] == "incremental":
+            # Sadece yeni/değişmiş (Entity, Year) satırları silver'a eklenir
+            df = write_silver_delta(spark, df, silver_path, batch_id)
+            status["rows"] = df.count()
+            logger.info(f" Silver (Parquet) Delta Eklendi: {table_name}.parquet ({status['rows']} satır)")
+        else:
+            write_silver(df, silver_path)
+            logger.info(f" Silver (Parquet) Yazıldı: {table_name}.parquet")
+        status["stages"]["silver"] = dict(stage_metrics(spark, f"{table_name}:silver"),
+                                          wall_seconds=time.perf_counter() - stage_started)
+        status["bytes_read"]["silver"] = status["stages"]["silver"].get("bytes_read")
 
         # 4. GOLD'A YAZ (Postgres) - Her CSV kendi adıyla tablo olur
-        df.write \
-            .format("jdbc") \
-            .option("url", f"jdbc:postgresql://{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}") \
-            .option("dbtable", table_name) \
-            .option("user", DB_CONFIG['user']) \
-            .option("password", DB_CONFIG['password']) \
-            .option("driver", "org.postgresql.Driver") \
-            .mode("overwrite") \
-            .save() 
-        
+        # Gold, CSV'yi tekrar parse etmek yerine az önce yazılan kolonlu Parquet'ten beslenir
+        status["stage"] = "gold"
+        stage_started = time.perf_counter()
+        spark.sparkContext.setJobGroup(f"{table_name}:gold", f"{silver_path} -> gold")
+        if status["mode"] == "incremental":
+            # Delta, INSERT ... ON CONFLICT (Entity, Year) ile gold'a işlenir
+            if status["rows"]:
+                upsert_gold_table(df, table_name, KEY_COLUMNS)
+        else:
+            # Staging tabloya toplu yüklenip atomik swap ile yayınlanır; okuyucular yarım tablo görmez
+            df = read_silver(spark, silver_path, columns=df.columns)
+            load_gold_table(df, table_name)
+
+        status["stages"]["gold"] = dict(stage_metrics(spark, f"{table_name}:gold"),
+                                        wall_seconds=time.perf_counter() - stage_started)
+        status["bytes_read"]["gold"] = status["stages"]["gold"].get("bytes_read")
         logger.info(f" Gold (Postgres) Güncellendi: Tablo Adı -> {table_name}")
+        status["stage"] = "done"
+    except Exception as e:
+        status["status"] = "HATA"
+        status["error"] = str(e).splitlines()[0] if str(e) else repr(e)
+        logger.error(f" {file_path} işlenemedi ({status['stage']} aşaması): {e}")
+        status["stages"][status["stage"]] = {"wall_seconds": time.perf_counter() - stage_started}
+    finally:
+        status["seconds"] = round(time.perf_counter() - started, 2)
 
-    spark.stop()
-    logger.info("Tüm veriler başarıyla işlendi ve veri ambarına aktarıldı!")
+    return status
 
-if __name__ == "__main__":
+def record_file_stages(ledger, status):
+    """Dosya durumundaki aşama metriklerini çalışma kaydına yazar (hatalı aşama HATA olarak)."""
+    for stage, metrics in status["stages"].items():
+        failed = status["status"] != "OK" and stage == status["stage"]
+        ledger.record(stage, dataset=status["table"], status="HATA" if failed else "OK", **metrics)
 
-    run_dynamic_etl()
+def log_status_report(report):
+    ok = [r for r in report if r["status"] == "OK"]
+    logger.info(f" ETL Raporu: {len(ok)}/{len(report)} dosya başarılı.")
+    for r in sorted(report, key=lambda r: r["file"]):
+        line = f"   [{r['status']}] {r['file']} -> {r['table']} [{r['mode']}] ({r['seconds']} sn)"
+        if "rows" in r:
+            line += f" | delta: {r['rows']} satır"
+        for stage, value in r["bytes_read"].items():
+            line += f" | {stage} okunan: {format_bytes(value)}"
+        if r["error"]:
+            line += f" | {r['stage']}: {r['error']}"
+        logger.info(line)
+
+    if len(ok) == len(report):
+        logger.info("Tüm veriler başarıyla işlendi ve veri ambarına aktarıldı!")
+    else:
+        logger.error(f" {len(report) - len(ok)} dosya işlenemedi, bir sonraki çalıştırmada tekrar denenecek.")
+
+if __name__ == "__main__":
+    # --full: ETL durumunu yok sayıp bronze'daki tüm dosyaları yeniden işler
+    # --incremental: sadece yeni/değişmiş (Entity, Year) satırlarını silver ve gold'a işler
+    # --engine=spark|pandas: motor seçimini zorlar (varsayılan: girdi boyutuna göre otomatik)
+    mode = "incremental" if "--incremental" in sys.argv else ETL_WRITE_MODE
+    engine_arg = next((a.split("=", 1)[1] for a in sys.argv if a.startswith("--engine=")), ETL_ENGINE)
+    run_dynamic_etl(full_refresh="--full" in sys.argv, write_mode=mode, engine=engine_arg)
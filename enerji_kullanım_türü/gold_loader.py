@@ -0,0 +1,228 @@
+import io
+import csv
+from sqlalchemy import text
+from config import DB_CONFIG, GOLD_LOAD_METHOD, GOLD_JDBC_BATCHSIZE, GOLD_JDBC_PARTITIONS, logger
+from db_manager import get_batch_engine, quote_ident
+from data_version import ensure_version_table, bump_table_version
+
+# ---------------------------------------------------------
+# 1. STAGING + ATOMİK SWAP İLE GOLD YÜKLEME
+# ---------------------------------------------------------
+# Yükleme önce "staging" şemasındaki aynı adlı tabloya yapılır, sonra tek bir
+# transaction içinde public şemaya taşınır. Dashboard yükleme sırasında eski
+# tabloyu, commit sonrasında yeni tabloyu görür; yarım tablo görmez.
+STAGING_SCHEMA = "staging"
+
+SPARK_TO_PG_TYPES = {
+    "string": "TEXT", "int": "INTEGER", "bigint": "BIGINT", "smallint": "SMALLINT",
+    "double": "DOUBLE PRECISION", "float": "REAL", "boolean": "BOOLEAN",
+    "date": "DATE", "timestamp": "TIMESTAMP"
+}
+
+def jdbc_url():
+    # reWriteBatchedInserts: sürücü batch'leri çok satırlı INSERT'e çevirir
+    return (f"jdbc:postgresql://{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+            f"?reWriteBatchedInserts=true")
+
+def _prepare_staging(engine, table_name):
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {STAGING_SCHEMA}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {STAGING_SCHEMA}.{quote_ident(table_name)}"))
+        # Yarıda kalmış önceki bir COPY yüklemesinden artan partition tabloları
+        leftovers = conn.execute(text(
+            "SELECT tablename FROM pg_tables WHERE schemaname = :s AND left(tablename, :n) = :p"
+        ), {"s": STAGING_SCHEMA, "n": len(_partition_prefix(table_name)), "p": _partition_prefix(table_name)}).scalars().all()
+        for leftover in leftovers:
+            conn.execute(text(f"DROP TABLE {STAGING_SCHEMA}.{quote_ident(leftover)}"))
+
+def index_staging_table(engine, table_name, column_names):
+    """Swap'tan önce staging tablosuna (Entity, Year) indeksi kurar; indeks tabloyla birlikte public'e taşınır."""
+    keys = [c for c in ("Entity", "Year") if c in column_names]
+    if not keys:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE INDEX {quote_ident(table_name + '_' + '_'.join(k.lower() for k in keys))} "
+            f"ON {STAGING_SCHEMA}.{quote_ident(table_name)} ({', '.join(quote_ident(k) for k in keys)})"
+        ))
+
+def gold_table_exists(table_name):
+    engine = get_batch_engine()
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = :t"
+        ), {"t": table_name}).first() is not None
+
+def swap_staging_table(engine, table_name):
+    """Staging tablosunu tek transaction içinde public'e alır (eskisinin yerine) ve sürümünü artırır."""
+    target = quote_ident(table_name)
+    ensure_version_table(engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS public.{target} CASCADE"))
+        conn.execute(text(f"ALTER TABLE {STAGING_SCHEMA}.{target} SET SCHEMA public"))
+        if table_name == "energy_master":
+            # CASCADE master'a bağlı view'ları da düşürdü; commit'ten önce yeni tablo üzerine yeniden kurulur
+            from gold_master import create_materialized_views
+            create_materialized_views(conn)
+        version = bump_table_version(conn, table_name)
+    logger.info(f" Gold swap tamam: {STAGING_SCHEMA}.{table_name} -> public.{table_name} (sürüm {version})")
+
+# ---------------------------------------------------------
+# 2. STAGING'E YAZMA YÖNTEMLERİ
+# ---------------------------------------------------------
+def write_staging_jdbc(df, table_name):
+    df.write \
+        .format("jdbc") \
+        .option("url", jdbc_url()) \
+        .option("dbtable", f"{STAGING_SCHEMA}.{table_name}") \
+        .option("user", DB_CONFIG['user']) \
+        .option("password", DB_CONFIG['password']) \
+        .option("driver", "org.postgresql.Driver") \
+        .option("batchsize", GOLD_JDBC_BATCHSIZE) \
+        .option("numPartitions", GOLD_JDBC_PARTITIONS) \
+        .mode("overwrite") \
+        .save()
+
+def _create_staging_from_spark_schema(engine, df, table_name):
+    columns = ", ".join(
+        f"{quote_ident(f.name)} {SPARK_TO_PG_TYPES.get(f.dataType.simpleString(), 'TEXT')}"
+        for f in df.schema.fields
+    )
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE {STAGING_SCHEMA}.{quote_ident(table_name)} ({columns})"))
+
+# Her Spark partition'ı kendi staging tablosuna yazar (<tablo>__part_<no>). Tekrar denenen ya da
+# spekülatif çalışan görev tabloyu aynı transaction'da yeniden yaratır; satırlar iki kez eklenmez.
+# Driver tüm partition tablolarını tek transaction'da staging tablosuna toplar.
+def _partition_prefix(table_name):
+    return f"{table_name}__part_"
+
+def _partition_table(table_name, partition_id):
+    return f"{STAGING_SCHEMA}.{quote_ident(_partition_prefix(table_name) + str(partition_id))}"
+
+def _copy_rows(rows, columns, table_name, partition_id):
+    """Partition'ın satırlarını CSV olarak tamponlayıp kendi partition tablosuna COPY FROM STDIN ile yükler."""
+    import psycopg2
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    count = 0
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+        count += 1
+    buffer.seek(0)
+    part = _partition_table(table_name, partition_id)
+    conn = psycopg2.connect(host=DB_CONFIG['host'], port=DB_CONFIG['port'], dbname=DB_CONFIG['database'],
+                            user=DB_CONFIG['user'], password=DB_CONFIG['password'])
+    try:
+        with conn.cursor() as cur:
+            # Boş partition'ın tablosu da yaratılır: driver her partition'ın bittiğini böyle doğrular
+            cur.execute(f"DROP TABLE IF EXISTS {part}")
+            cur.execute(f"CREATE TABLE {part} (LIKE {STAGING_SCHEMA}.{quote_ident(table_name)})")
+            if count:
+                cur.copy_expert(
+                    f"COPY {part} ({', '.join(quote_ident(c) for c in columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        conn.commit()
+    finally:
+        conn.close()
+
+def merge_partition_tables(engine, table_name, partitions):
+    """Partition tablolarını tek transaction'da staging tablosuna ekleyip düşürür; eksik partition yüklemeyi durdurur."""
+    target = f"{STAGING_SCHEMA}.{quote_ident(table_name)}"
+    with engine.begin() as conn:
+        for partition_id in range(partitions):
+            part = _partition_table(table_name, partition_id)
+            conn.execute(text(f"INSERT INTO {target} SELECT * FROM {part}"))
+            conn.execute(text(f"DROP TABLE {part}"))
+
+def write_staging_copy(engine, df, table_name):
+    """Spark DataFrame'i her partition'dan paralel COPY ile staging'e yükler."""
+    _create_staging_from_spark_schema(engine, df, table_name)
+    columns = df.columns
+
+    def copy_partition(rows):
+        from pyspark import TaskContext
+        _copy_rows(rows, columns, table_name, TaskContext.get().partitionId())
+
+    df.foreachPartition(copy_partition)
+    # df.rdd önbellekli: foreachPartition ile aynı RDD, partition sayısı aynı
+    merge_partition_tables(engine, table_name, df.rdd.getNumPartitions())
+
+# ---------------------------------------------------------
+# 3. DIŞA AÇIK GİRİŞ NOKTASI
+# ---------------------------------------------------------
+def load_gold_table(df, table_name, method=GOLD_LOAD_METHOD):
+    """Spark DataFrame'i staging'e toplu yükler ve public tabloyla atomik olarak değiştirir."""
+    engine = get_batch_engine()
+    _prepare_staging(engine, table_name)
+    if method == "copy":
+        write_staging_copy(engine, df, table_name)
+    else:
+        write_staging_jdbc(df, table_name)
+    index_staging_table(engine, table_name, df.columns)
+    swap_staging_table(engine, table_name)
+
+def upsert_gold_table(df, table_name, key_columns):
+    """Delta satırlarını staging'e yükler, gold'a INSERT ... ON CONFLICT ile işler."""
+    engine = get_batch_engine()
+    _prepare_staging(engine, table_name)
+    write_staging_jdbc(df, table_name)
+    merge_staging_into_gold(engine, table_name, df.columns, key_columns)
+
+def merge_staging_into_gold(engine, table_name, column_names, key_columns):
+    target = quote_ident(table_name)
+    columns = ", ".join(quote_ident(c) for c in column_names)
+    keys = ", ".join(quote_ident(c) for c in key_columns)
+    updates = ", ".join(f"{quote_ident(c)} = EXCLUDED.{quote_ident(c)}" for c in column_names if c not in key_columns)
+    conflict_action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    ensure_version_table(engine)
+    with engine.begin() as conn:
+        # ON CONFLICT hedefi için benzersiz indeks şart
+        conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {quote_ident(table_name + '_key')} ON public.{target} ({keys})"))
+        result = conn.execute(text(
+            f"INSERT INTO public.{target} ({columns}) SELECT {columns} FROM {STAGING_SCHEMA}.{target} "
+            f"ON CONFLICT ({keys}) {conflict_action}"
+        ))
+        conn.execute(text(f"DROP TABLE {STAGING_SCHEMA}.{target}"))
+        version = bump_table_version(conn, table_name) if result.rowcount else None
+    logger.info(f" Gold upsert tamam: {table_name} ({result.rowcount} satır eklendi/güncellendi, sürüm {version or 'aynı'})")
+
+# ---------------------------------------------------------
+# 4. pandas/ARROW MOTORU İÇİN COPY YÜKLEMESİ
+# ---------------------------------------------------------
+ARROW_TO_PG_TYPES = {
+    "string": "TEXT", "int32": "INTEGER", "int64": "BIGINT", "int16": "SMALLINT",
+    "double": "DOUBLE PRECISION", "float": "REAL", "bool": "BOOLEAN"
+}
+
+def copy_arrow_to_staging(engine, table, table_name):
+    """Arrow tablosunu Spark JDBC ile aynı kolon tipleriyle staging'e COPY eder."""
+    import pyarrow.csv as pacsv
+    columns = ", ".join(
+        f"{quote_ident(f.name)} {ARROW_TO_PG_TYPES.get(str(f.type), 'TEXT')}" for f in table.schema
+    )
+    buffer = io.BytesIO()
+    pacsv.write_csv(table, buffer, write_options=pacsv.WriteOptions(include_header=False))
+    buffer.seek(0)
+
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            cur.execute(f"CREATE TABLE {STAGING_SCHEMA}.{quote_ident(table_name)} ({columns})")
+            cur.copy_expert(
+                f"COPY {STAGING_SCHEMA}.{quote_ident(table_name)} FROM STDIN WITH (FORMAT csv)", buffer)
+        raw_conn.commit()
+    finally:
+        raw_conn.close()
+
+def load_gold_arrow(table, table_name):
+    engine = get_batch_engine()
+    _prepare_staging(engine, table_name)
+    copy_arrow_to_staging(engine, table, table_name)
+    index_staging_table(engine, table_name, table.column_names)
+    swap_staging_table(engine, table_name)
+
+def upsert_gold_arrow(table, table_name, key_columns):
+    engine = get_batch_engine()
+    _prepare_staging(engine, table_name)
+    copy_arrow_to_staging(engine, table, table_name)
+    merge_staging_into_gold(engine, table_name, table.column_names, key_columns)
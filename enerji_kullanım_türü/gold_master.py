@@ -0,0 +1,167 @@
+import hashlib
+from sqlalchemy import text
+from config import logger
+from db_manager import get_batch_engine, quote_ident
+from gold_loader import load_gold_table, load_gold_arrow, gold_table_exists
+
+# ---------------------------------------------------------
+# 1. CONFORMED ENERGY_MASTER TANIMI
+# ---------------------------------------------------------
+# Fosil/nükleer/yenilenebilir üretimi, kişi başı CO2 ve yenilenebilir payı
+# (Entity, Year) üzerinden bir kez birleştirilir; Total_Gen ve Share_* kolonları
+# burada hesaplanır. Dashboard bu tabloyu hazır okur, oturum başına merge yapmaz.
+MASTER_TABLE = "energy_master"
+KEY_COLUMNS = ["Entity", "Year"]
+
+# Rol -> silver tablo adı (etl_spark_to_db'nin CSV adından ürettiği isimler)
+MASTER_SOURCES = {
+    "fossil": "electricity_fossil_renewables_nuclear_line",
+    "co2": "co2_per_capita_vs_renewable_electricity",
+    "share": "share_electricity_renewables"
+}
+
+GENERATION_COLUMNS = ["Fossil_fuels", "Nuclear", "Renewables"]
+MASTER_COLUMNS = [
+    "Entity", "Code", "Year", "Fossil_fuels", "Nuclear", "Renewables", "Per_capita_emissions",
+    "Renewables_Share", "Total_Gen", "Share_Fossil", "Share_Renewables", "Share_Nuclear"
+]
+
+# ---------------------------------------------------------
+# 2. SPARK GOLD AŞAMASI
+# ---------------------------------------------------------
+def build_energy_master(fossil, co2, share):
+    """Üç silver DataFrame'den conformed master DataFrame'i üretir."""
+    from pyspark.sql import functions as F
+
+    base = fossil.select("Entity", "Code", "Year", *GENERATION_COLUMNS)
+    for c in GENERATION_COLUMNS:
+        base = base.withColumn(c, F.coalesce(F.col(c).cast("double"), F.lit(0.0)))
+
+    df = base \
+        .join(co2.select(*KEY_COLUMNS, F.col("Per_capita_emissions").cast("double")), KEY_COLUMNS, "left") \
+        .join(share.select(*KEY_COLUMNS, F.col("Renewables").cast("double").alias("Renewables_Share")), KEY_COLUMNS, "left")
+
+    total = F.col("Fossil_fuels") + F.col("Renewables") + F.col("Nuclear")
+    df = df.withColumn("Total_Gen", F.when(total == 0, F.lit(1.0)).otherwise(total)) \
+        .withColumn("Share_Fossil", F.col("Fossil_fuels") / F.col("Total_Gen") * 100) \
+        .withColumn("Share_Renewables", F.col("Renewables") / F.col("Total_Gen") * 100) \
+        .withColumn("Share_Nuclear", F.col("Nuclear") / F.col("Total_Gen") * 100)
+    return df.select(*MASTER_COLUMNS).orderBy(*KEY_COLUMNS)
+
+def publish_energy_master(spark, frames, silver_path):
+    """frames: rol -> silver DataFrame. Master'ı silver'a yazar, gold'a atomik yükler."""
+    master = build_energy_master(frames["fossil"], frames["co2"], frames["share"])
+    master.write.mode("overwrite").parquet(silver_path)
+    load_gold_table(spark.read.parquet(silver_path), MASTER_TABLE)
+    logger.info(f" Gold master yayınlandı: {MASTER_TABLE} ({silver_path})")
+
+# ---------------------------------------------------------
+# 3. pandas/ARROW MOTORU İÇİN AYNI KURALLAR
+# ---------------------------------------------------------
+def build_energy_master_frame(fossil, co2, share):
+    base = fossil[["Entity", "Code", "Year"] + GENERATION_COLUMNS].copy()
+    base[GENERATION_COLUMNS] = base[GENERATION_COLUMNS].astype("float64").fillna(0.0)
+
+    df = base \
+        .merge(co2[KEY_COLUMNS + ["Per_capita_emissions"]], on=KEY_COLUMNS, how="left") \
+        .merge(share[KEY_COLUMNS + ["Renewables"]].rename(columns={"Renewables": "Renewables_Share"}),
+               on=KEY_COLUMNS, how="left")
+
+    total = df["Fossil_fuels"] + df["Renewables"] + df["Nuclear"]
+    df["Total_Gen"] = total.where(total != 0, 1.0)
+    df["Share_Fossil"] = df["Fossil_fuels"] / df["Total_Gen"] * 100
+    df["Share_Renewables"] = df["Renewables"] / df["Total_Gen"] * 100
+    df["Share_Nuclear"] = df["Nuclear"] / df["Total_Gen"] * 100
+    return df[MASTER_COLUMNS].sort_values(KEY_COLUMNS, kind="stable").reset_index(drop=True)
+
+def publish_energy_master_arrow(frames, silver_path, filesystem):
+    """frames: rol -> silver pandas DataFrame. Spark sürümüyle aynı silver/gold çıktısı."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    master = build_energy_master_frame(frames["fossil"], frames["co2"], frames["share"])
+    table = pa.Table.from_pandas(master, preserve_index=False)
+    filesystem.delete_dir_contents(silver_path, missing_dir_ok=True)
+    ds.write_dataset(table, silver_path, filesystem=filesystem, format="parquet",
+                     basename_template="part-{i}-local.parquet", existing_data_behavior="overwrite_or_ignore")
+    load_gold_arrow(table, MASTER_TABLE)
+    logger.info(f" Gold master yayınlandı: {MASTER_TABLE} ({silver_path})")
+
+# ---------------------------------------------------------
+# 4. DASHBOARD'UN SICAK SORGULARI İÇİN MATERIALIZED VIEW'LAR
+# ---------------------------------------------------------
+# Sayfa 6'nın yıllık liderlik tabloları, ülke başına son yıl özeti ve ülke
+# başına kayıt sayıları her ETL'den sonra bir kez hesaplanır. Her view'da
+# benzersiz indeks var ki REFRESH ... CONCURRENTLY okuyucuları bloklamasın.
+# Master swap'ı (DROP ... CASCADE) view'ları da düşürür; swap_staging_table onları
+# aynı transaction içinde create_materialized_views ile yeniden kurar, okuyucular
+# view'suz bir ara durum görmez.
+LEADERBOARD_SIZE = 10
+# Sayfa 6'daki "Total_Gen > 5" filtresi: çok küçük üreticiler liderlik tablosuna girmez.
+# Emisyonu olmayanlar da girmez; sayfanın kadran grafiği ve dışa aktarımıyla aynı ülke kümesi
+LEADERBOARD_MIN_TOTAL_GEN = 5
+
+def _leaderboard_sql(share_column):
+    return (
+        f'SELECT "Year", "Entity", "{share_column}", "Total_Gen", "Rank" FROM ('
+        f'SELECT "Year", "Entity", "{share_column}", "Total_Gen", '
+        f'row_number() OVER (PARTITION BY "Year" ORDER BY "{share_column}" DESC, "Entity") AS "Rank" '
+        f'FROM public.{MASTER_TABLE} WHERE "Total_Gen" > {LEADERBOARD_MIN_TOTAL_GEN} '
+        f'AND "Per_capita_emissions" IS NOT NULL) ranked '
+        f'WHERE "Rank" <= {LEADERBOARD_SIZE}'
+    )
+
+# view adı -> (SELECT, benzersiz indeks kolonları)
+MATERIALIZED_VIEWS = {
+    "mv_top_green_by_year": (_leaderboard_sql("Share_Renewables"), ["Year", "Rank"]),
+    "mv_top_fossil_by_year": (_leaderboard_sql("Share_Fossil"), ["Year", "Rank"]),
+    "mv_entity_latest": (
+        f'SELECT DISTINCT ON ("Entity") * FROM public.{MASTER_TABLE} ORDER BY "Entity", "Year" DESC',
+        ["Entity"]
+    ),
+    "mv_entity_record_counts": (
+        f'SELECT "Entity", count(*) AS "Records", min("Year") AS "First_Year", max("Year") AS "Last_Year" '
+        f'FROM public.{MASTER_TABLE} GROUP BY "Entity"',
+        ["Entity"]
+    )
+}
+
+def view_signature(name):
+    # View'ın SELECT'i değişince (yeni sürüm) mevcut view tazelenmez, yeniden kurulur
+    return hashlib.sha1(MATERIALIZED_VIEWS[name][0].encode()).hexdigest()[:16]
+
+def _create_view(conn, name):
+    select_sql, unique_columns = MATERIALIZED_VIEWS[name]
+    conn.execute(text(f"CREATE MATERIALIZED VIEW public.{name} AS {select_sql}"))
+    conn.execute(text(
+        f"CREATE UNIQUE INDEX {name}_key ON public.{name} "
+        f"({', '.join(quote_ident(c) for c in unique_columns)})"
+    ))
+    conn.execute(text(f"COMMENT ON MATERIALIZED VIEW public.{name} IS '{view_signature(name)}'"))
+
+def create_materialized_views(conn):
+    """Tüm view'ları ve benzersiz indekslerini verilen bağlantının transaction'ı içinde kurar."""
+    for name in MATERIALIZED_VIEWS:
+        _create_view(conn, name)
+
+def refresh_materialized_views(engine=None):
+    """View'ları yoksa (ya da tanımı değiştiyse) kurar, varsa eşzamanlı (okuyucuları bloklamadan) tazeler."""
+    engine = engine or get_batch_engine()
+    if not gold_table_exists(MASTER_TABLE):
+        logger.warning(f" {MASTER_TABLE} yok, materialized view'lar atlandı.")
+        return
+    for name in MATERIALIZED_VIEWS:
+        with engine.begin() as conn:
+            current = conn.execute(text(
+                "SELECT obj_description(c.oid, 'pg_class') FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = 'public' AND c.relname = :n AND c.relkind = 'm'"
+            ), {"n": name}).first()
+            if current is not None and current[0] == view_signature(name):
+                conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY public.{name}"))
+            else:
+                if current is not None:
+                    logger.info(f" {name} tanımı değişmiş, yeniden kuruluyor.")
+                    conn.execute(text(f"DROP MATERIALIZED VIEW public.{name}"))
+                _create_view(conn, name)
+    logger.info(f" Materialized view'lar tazelendi: {', '.join(MATERIALIZED_VIEWS)}")
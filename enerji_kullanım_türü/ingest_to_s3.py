@@ -1,25 +1,103 @@
 import os
-from minio import Minio
-from config import MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_ENDPOINT, logger
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import (INGEST_MAX_WORKERS, INGEST_PART_SIZE_MB, INGEST_MAX_RETRIES,
+                    INGEST_RETRY_BACKOFF, INGEST_COMPRESSION, logger)
+from lake_utils import (RAW_BUCKET, BRONZE_PREFIX, COMPRESSION_EXTENSIONS, CompressingReader, check_compression,
+                        get_minio_client, build_local_manifest, diff_manifest, load_manifest, save_manifest)
+from run_ledger import RunLedger, timed_call
 
-def run_ingestion():
+CONTENT_TYPES = {"none": "text/csv", "gzip": "application/gzip"}
+
+def upload_with_retry(client, local_file_path, minio_path, part_size, compression="none"):
+    """Tek bir dosyayı multipart olarak yükler, hata olursa üstel bekleme ile tekrar dener.
+
+    (ham bayt, MinIO'ya yazılan bayt) ikilisini döner.
+    """
+    raw_size = os.path.getsize(local_file_path)
+    for attempt in range(1, INGEST_MAX_RETRIES + 1):
+        try:
+            if compression == "none":
+                client.fput_object(RAW_BUCKET, minio_path, local_file_path, part_size=part_size)
+                return raw_size, raw_size
+
+            # Dosya yüklenirken parça parça sıkıştırılır (uzunluk bilinmediği için length=-1)
+            with open(local_file_path, "rb") as f:
+                reader = CompressingReader(f, compression)
+                client.put_object(RAW_BUCKET, minio_path, reader, length=-1, part_size=part_size,
+                                  content_type=CONTENT_TYPES[compression])
+            return raw_size, reader.bytes_out
+        except Exception as e:
+            if attempt == INGEST_MAX_RETRIES:
+                raise
+            wait = INGEST_RETRY_BACKOFF * (2 ** (attempt - 1))
+            logger.warning(f" Yükleme denemesi {attempt}/{INGEST_MAX_RETRIES} başarısız ({minio_path}): {e}. {wait:.1f} sn sonra tekrar denenecek.")
+            time.sleep(wait)
+
+def upload_files(client, data_folder, file_names, max_workers=INGEST_MAX_WORKERS, compression="none", ledger=None):
+    """Dosyaları sınırlı bir thread havuzu ile paralel yükler ve throughput özetini loglar.
+
+    ledger verilirse her dosyanın süresi ve hacmi çalışma kaydına yazılır.
+    """
+    part_size = INGEST_PART_SIZE_MB * 1024 * 1024
+    uploaded, total_bytes, stored_bytes = [], 0, 0
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for file_name in file_names:
+            # Bilgisayardaki tam yol (Örn: Veri_Setleri/dosya.csv)
+            local_file_path = os.path.join(data_folder, file_name)
+            # MinIO'daki dümdüz yol (Örn: bronze/dosya.csv veya bronze/dosya.csv.gz)
+            minio_path = f"{BRONZE_PREFIX}{file_name}{COMPRESSION_EXTENSIONS[compression]}"
+            futures[executor.submit(timed_call, upload_with_retry, client, local_file_path, minio_path, part_size,
+                                    compression)] = (file_name, minio_path)
+
+        for future in as_completed(futures):
+            file_name, minio_path = futures[future]
+            try:
+                (raw_size, stored_size), wall, cpu = future.result()
+                total_bytes += raw_size
+                stored_bytes += stored_size
+                uploaded.append(file_name)
+                logger.info(f" Başarılı: {file_name} -> {minio_path}")
+                if ledger:
+                    ledger.record("ingest", file_name, bytes_read=raw_size, bytes_written=stored_size,
+                                  wall_seconds=wall, cpu_seconds=cpu)
+            except Exception as e:
+                logger.error(f" Hata ({file_name}): {e}")
+                if ledger:
+                    ledger.record("ingest", file_name, status="HATA")
+
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    logger.info(f" Throughput: {len(uploaded)} dosya, {total_bytes / 1024 / 1024:.1f} MB, {elapsed:.2f} sn "
+                f"-> {len(uploaded) / elapsed:.1f} dosya/sn, {total_bytes / 1024 / 1024 / elapsed:.1f} MB/sn "
+                f"({max_workers} thread, {INGEST_PART_SIZE_MB} MB parça)")
+    if compression != "none" and stored_bytes:
+        logger.info(f" Sıkıştırma ({compression}): {total_bytes / 1024 / 1024:.1f} MB -> "
+                    f"{stored_bytes / 1024 / 1024:.1f} MB (oran {total_bytes / stored_bytes:.1f}x)")
+    return uploaded
+
+def run_ingestion(full_refresh=False, compression=INGEST_COMPRESSION):
     logger.info("📥Veri Çekme (Ingest) İşlemi Başladı...")
-    
-    # MinIO'ya bağlan
-    client = Minio(
-        MINIO_ENDPOINT.replace("http://", ""),
-        access_key=MINIO_ACCESS_KEY,
-        secret_key=MINIO_SECRET_KEY,
-        secure=False
-    )
+
+    try:
+        check_compression(compression)
+    except ValueError as e:
+        logger.error(f" {e}")
+        return
+
+    # MinIO'ya bağlan (her yükleme thread'ine bir bağlantı)
+    client = get_minio_client(max_connections=INGEST_MAX_WORKERS)
 
     # Bucket yoksa oluştur
-    if not client.bucket_exists("raw-data"):
-        client.make_bucket("raw-data")
+    if not client.bucket_exists(RAW_BUCKET):
+        client.make_bucket(RAW_BUCKET)
 
     # HEDEF KLASÖR: verilerin olduğu klasör
     data_folder = "Veri_Setleri"
-    
+
     # Klasör gerçekten orada mı kontrol et
     if not os.path.exists(data_folder):
         logger.error(f" '{data_folder}' klasörü konteyner içinde bulunamadı! Docker ayarlarını kontrol et.")
@@ -27,30 +105,47 @@ def run_ingestion():
 
     # Veri_Setleri klasörünün içindeki TÜM CSV dosyalarını bul
     csv_files = [f for f in os.listdir(data_folder) if f.endswith('.csv')]
-    
+
     if not csv_files:
         logger.error(f"'{data_folder}' klasörünün içinde hiç .csv dosyası bulunamadı!")
         return
 
-    logger.info(f"Toplam {len(csv_files)} adet CSV dosyası bulundu. MinIO'ya aktarılıyor...")
+    # Manifest karşılaştırması: sadece yeni veya içeriği değişen dosyalar yüklenir
+    remote_entries = load_manifest(client)
+    baseline = {} if full_refresh else remote_entries
+    local_entries = build_local_manifest(data_folder, csv_files, previous=baseline, compression=compression)
+    changed_files = diff_manifest(local_entries, baseline)
 
-    # Her bir dosyayı MinIO'ya yükle
-    for file_name in csv_files:
-        # Bilgisayardaki tam yol (Örn: Veri_Setleri/dosya.csv)
-        local_file_path = os.path.join(data_folder, file_name)
-        
-        # MinIO'daki dümdüz yol (Örn: bronze/dosya.csv)
-        minio_path = f"bronze/{file_name}"
-        
-        try:
-            # fput_object yerel dosyayı MinIO'ya yükler
-            client.fput_object("raw-data", minio_path, local_file_path)
-            logger.info(f" Başarılı: {file_name} -> {minio_path}")
-        except Exception as e:
-            logger.error(f" Hata ({file_name}): {e}")
+    skipped = len(csv_files) - len(changed_files)
+    logger.info(f"Toplam {len(csv_files)} adet CSV dosyası bulundu. "
+                f"{len(changed_files)} yeni/değişmiş dosya MinIO'ya aktarılıyor, {skipped} dosya atlandı.")
 
-    logger.info("Tüm veriler Bronze katmanına başarıyla yüklendi!")
+    # Değişen dosyaları MinIO'ya paralel yükle
+    ledger = RunLedger("ingest")
+    uploaded = upload_files(client, data_folder, changed_files, compression=compression,
+                            ledger=ledger) if changed_files else []
 
-if __name__ == "__main__":
+    # Sıkıştırma formatı değiştiyse eski uzantılı nesneyi sil ki Spark aynı veriyi iki kez okumasın
+    for file_name in uploaded:
+        old = remote_entries.get(file_name)
+        if old and old["object_name"] != local_entries[file_name]["object_name"]:
+            try:
+                client.remove_object(RAW_BUCKET, old["object_name"])
+                logger.info(f" Eski bronze nesnesi silindi: {old['object_name']}")
+            except Exception as e:
+                logger.warning(f" Eski bronze nesnesi silinemedi ({old['object_name']}): {e}")
+
+    # Yüklenemeyen dosyalar manifest'e yazılmaz ki bir sonraki çalıştırmada tekrar denensin
+    failed = set(changed_files) - set(uploaded)
+    manifest_entries = {name: entry for name, entry in local_entries.items() if name not in failed}
+    for name in failed:
+        if name in remote_entries:
+            manifest_entries[name] = remote_entries[name]
+    save_manifest(client, manifest_entries, uploaded)
 
-    run_ingestion()
+    logger.info(f"Bronze katmanı güncel: {len(uploaded)} dosya yüklendi, {skipped} dosya zaten günceldi.")
+    ledger.finish()
+
+if __name__ == "__main__":
+    # --full: manifest'i yok sayıp tüm dosyaları yeniden yükler
+    run_ingestion(full_refresh="--full" in sys.argv)
@@ -0,0 +1,263 @@
+import os
+import io
+import json
+import zlib
+import hashlib
+from datetime import datetime, timezone
+import urllib3
+from minio import Minio
+from minio.error import S3Error
+from config import (MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_ENDPOINT, SILVER_PARTITION_BY_YEAR,
+                    SILVER_ENTITY_BUCKETS, logger)
+
+# ---------------------------------------------------------
+# 1. DATA LAKE SABİTLERİ
+# ---------------------------------------------------------
+RAW_BUCKET = "raw-data"
+BRONZE_PREFIX = "bronze/"
+# Ingest'in en son gördüğü dosya durumları (sha256, boyut, mtime)
+MANIFEST_OBJECT = "bronze/_manifest.json"
+# ETL'in en son işlediği bronze nesnelerinin sha256 kayıtları
+ETL_STATE_OBJECT = "silver/_etl_state.json"
+
+# Sıkıştırma formatı -> bronze nesne uzantısı. Spark (Hadoop codec'leri) dosyayı
+# uzantısından tanıyıp şeffaf olarak açar. Sadece gzip: Hadoop onu saf Java ile
+# açar; zstd codec'i native libhadoop ister ve imajdaki Spark'ta yoktur.
+COMPRESSION_EXTENSIONS = {"none": "", "gzip": ".gz"}
+BRONZE_EXTENSIONS = tuple(f".csv{ext}" for ext in COMPRESSION_EXTENSIONS.values())
+
+def get_minio_client(max_connections=None):
+    # Paralel yüklemelerde her thread'e bir HTTP bağlantısı düşsün diye havuzu büyütüyoruz
+    http_client = None
+    if max_connections:
+        http_client = urllib3.PoolManager(
+            timeout=urllib3.Timeout(connect=10, read=300),
+            maxsize=max_connections,
+            retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+        )
+    return Minio(
+        MINIO_ENDPOINT.replace("http://", ""),
+        access_key=MINIO_ACCESS_KEY,
+        secret_key=MINIO_SECRET_KEY,
+        secure=False,
+        http_client=http_client
+    )
+
+def get_arrow_s3_filesystem():
+    """pandas/Arrow motoru için MinIO'ya bağlı pyarrow S3 dosya sistemi."""
+    from pyarrow import fs
+    scheme = "https" if MINIO_ENDPOINT.startswith("https://") else "http"
+    endpoint = MINIO_ENDPOINT.replace("http://", "").replace("https://", "").strip()
+    return fs.S3FileSystem(access_key=MINIO_ACCESS_KEY, secret_key=MINIO_SECRET_KEY,
+                           endpoint_override=endpoint, scheme=scheme)
+
+def clean_column_name(name):
+    # Kolon isimlerindeki boşluk ve parantezleri temizle (Parquet ve Postgres kuralları)
+    return name.replace(" ", "_").replace("(", "").replace(")", "").replace("-", "_").replace("%", "pct")
+
+def table_name_for(dataset):
+    """'co2-per-capita' -> 'co2_per_capita'"""
+    return dataset.replace('-', '_').replace(' ', '_').lower()
+
+def is_bronze_object(object_name):
+    return object_name.endswith(BRONZE_EXTENSIONS)
+
+def dataset_name(object_name):
+    """'bronze/veri.csv.gz' -> 'veri'"""
+    base_name = object_name.split('/')[-1]
+    for ext in sorted(BRONZE_EXTENSIONS, key=len, reverse=True):
+        if base_name.endswith(ext):
+            return base_name[:-len(ext)]
+    return base_name
+
+def bronze_glob(prefix, name):
+    """Veri setinin sıkıştırılmış/sıkıştırılmamış her halini yakalayan Hadoop glob yolu."""
+    extensions = ",".join(ext.lstrip(".") for ext in BRONZE_EXTENSIONS)
+    return f"s3a://{RAW_BUCKET}/{prefix}{name}.{{{extensions}}}"
+
+# ---------------------------------------------------------
+# 2. AKAN (STREAMING) SIKIŞTIRMA
+# ---------------------------------------------------------
+def decompress_bytes(object_name, data):
+    """Bronze nesnesini uzantısına göre açar (Spark'ın codec seçimiyle aynı kural)."""
+    if object_name.endswith(".gz"):
+        return zlib.decompress(data, 47)
+    return data
+
+def check_compression(compression):
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError(f"Desteklenmeyen sıkıştırma formatı: {compression} (seçenekler: {', '.join(COMPRESSION_EXTENSIONS)})")
+
+class CompressingReader:
+    """Dosyayı okundukça sıkıştıran file-like nesne.
+
+    MinIO put_object(length=-1) ile kullanılır; dosyanın tamamı ne diske
+    ne de belleğe sıkıştırılmış olarak yazılmaz.
+    """
+
+    def __init__(self, raw, compression, chunk_size=1024 * 1024):
+        check_compression(compression)
+        self._raw = raw
+        self._chunk_size = chunk_size
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        self._buffer = bytearray()
+        self._eof = False
+        self.bytes_out = 0
+
+    def read(self, size=-1):
+        while not self._eof and (size is None or size < 0 or len(self._buffer) < size):
+            chunk = self._raw.read(self._chunk_size)
+            if chunk:
+                self._buffer += self._compressor.compress(chunk)
+            else:
+                self._buffer += self._compressor.flush()
+                self._eof = True
+        if size is None or size < 0:
+            size = len(self._buffer)
+        out = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.bytes_out += len(out)
+        return out
+
+# ---------------------------------------------------------
+# 3. JSON NESNE OKUMA / YAZMA
+# ---------------------------------------------------------
+def read_json_object(client, object_name, default=None):
+    """MinIO'daki JSON nesnesini okur, yoksa default döner."""
+    try:
+        response = client.get_object(RAW_BUCKET, object_name)
+        try:
+            return json.loads(response.read().decode("utf-8"))
+        finally:
+            response.close()
+            response.release_conn()
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchBucket"):
+            return default
+        raise
+
+def write_json_object(client, object_name, payload):
+    data = json.dumps(payload, indent=2, sort_keys=True).encode("utf-8")
+    client.put_object(RAW_BUCKET, object_name, io.BytesIO(data), length=len(data),
+                      content_type="application/json")
+
+# ---------------------------------------------------------
+# 4. INGEST MANIFEST'İ (Content-Hash ile artımlı yükleme)
+# ---------------------------------------------------------
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_local_manifest(data_folder, file_names, previous=None, compression="none"):
+    """Yerel dosyaların manifest kayıtlarını üretir.
+
+    Boyutu ve mtime'ı önceki manifest ile aynı olan dosyalar tekrar
+    hash'lenmez, önceki sha256 değeri kullanılır.
+    """
+    previous = previous or {}
+    entries = {}
+    for file_name in file_names:
+        path = os.path.join(data_folder, file_name)
+        stat = os.stat(path)
+        old = previous.get(file_name)
+        if old and old.get("size") == stat.st_size and old.get("mtime") == stat.st_mtime:
+            sha = old["sha256"]
+        else:
+            sha = file_sha256(path)
+        entries[file_name] = {
+            "object_name": f"{BRONZE_PREFIX}{file_name}{COMPRESSION_EXTENSIONS[compression]}",
+            "sha256": sha,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime
+        }
+    return entries
+
+def diff_manifest(local_entries, remote_entries):
+    """Yeni veya içeriği değişmiş dosyaların adlarını döner."""
+    changed = []
+    for file_name, entry in local_entries.items():
+        old = remote_entries.get(file_name)
+        if old is None or old.get("sha256") != entry["sha256"] or old.get("object_name") != entry["object_name"]:
+            changed.append(file_name)
+    return sorted(changed)
+
+def load_manifest(client):
+    manifest = read_json_object(client, MANIFEST_OBJECT, default={})
+    return manifest.get("files", {})
+
+def save_manifest(client, entries, changed):
+    write_json_object(client, MANIFEST_OBJECT, {
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "files": entries,
+        "last_changed": changed
+    })
+
+# ---------------------------------------------------------
+# 5. ETL DURUMU (Downstream sadece değişenleri işlesin)
+# ---------------------------------------------------------
+def load_etl_state(client):
+    return read_json_object(client, ETL_STATE_OBJECT, default={}).get("processed", {})
+
+def save_etl_state(client, processed):
+    write_json_object(client, ETL_STATE_OBJECT, {
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "processed": processed
+    })
+
+def select_pending_objects(object_names, manifest_entries, etl_state):
+    """Manifest'e göre ETL'in henüz işlemediği bronze nesnelerini seçer.
+
+    Manifest'te kaydı olmayan nesneler (elle yüklenmiş vb.) her zaman işlenir.
+    """
+    sha_by_object = {e["object_name"]: e["sha256"] for e in manifest_entries.values()}
+    pending = []
+    for object_name in object_names:
+        sha = sha_by_object.get(object_name)
+        if sha is None or etl_state.get(object_name) != sha:
+            pending.append(object_name)
+    return pending, sha_by_object
+
+
+# ---------------------------------------------------------
+# 6. SILVER YERLEŞİMİ VE ARTIMLI EKLEME ŞARTLARI (iki motor için ortak)
+# ---------------------------------------------------------
+# Artımlı modda satırların kimliği; silver delta'ları ve gold ON CONFLICT bu anahtarla çalışır
+SILVER_KEY_COLUMNS = ["Entity", "Year"]
+# Silver'da Entity'nin hash kovası (SILVER_ENTITY_BUCKETS > 0 ise partition kolonu)
+ENTITY_BUCKET_COLUMN = "entity_bucket"
+
+def silver_exists(minio_client, table_name):
+    objects = minio_client.list_objects(RAW_BUCKET, prefix=f"silver/{table_name}.parquet/")
+    return next(iter(objects), None) is not None
+
+def silver_layout_matches(minio_client, table_name):
+    """Mevcut silver'ın partition yerleşimi şu anki ayarlarla aynı mı? (Artımlı ekleme için şart)"""
+    prefix = f"silver/{table_name}.parquet/"
+    top_level = [o.object_name[len(prefix):] for o in minio_client.list_objects(RAW_BUCKET, prefix=prefix)]
+    if SILVER_PARTITION_BY_YEAR:
+        expected = "Year="
+    elif SILVER_ENTITY_BUCKETS > 0:
+        expected = f"{ENTITY_BUCKET_COLUMN}="
+    else:
+        expected = None
+    partitioned = [name for name in top_level if "=" in name]
+    if expected is None:
+        return not partitioned
+    return bool(partitioned) and all(name.startswith(expected) for name in partitioned)
+
+def can_run_incremental(minio_client, table_name, columns, silver_columns):
+    """Gelen tablo silver'a delta olarak eklenebilir mi? Değilse motor tam yenileme yapar.
+
+    silver_columns: mevcut silver'ın kolonlarını dönen fonksiyon (sadece diğer şartlar tutarsa çağrılır).
+    """
+    from gold_loader import gold_table_exists
+    if not all(k in columns for k in SILVER_KEY_COLUMNS):
+        return False
+    if not silver_exists(minio_client, table_name) or not gold_table_exists(table_name):
+        return False
+    if not silver_layout_matches(minio_client, table_name):
+        return False
+    return set(columns) <= set(silver_columns())
@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import requests
+from config import (NASA_POWER_URL, NASA_PARAMETERS, NASA_CACHE_DIR, NASA_CACHE_TTL_SECONDS, NASA_OFFLINE,
+                    NASA_TIMEOUT, NASA_COORDINATES_FILE, logger)
+
+# ---------------------------------------------------------
+# NASA POWER İÇİN KALICI ÖNBELLEK
+# ---------------------------------------------------------
+# Yanıtlar (lat, lon, start, end, parametreler) anahtarıyla diske JSON olarak
+# yazılır. TTL içindeki girdi doğrudan döner. Süresi geçmiş girdi de beklemeden
+# döner ve arka planda yenilenir (stale-while-revalidate). Aynı nokta için
+# eşzamanlı istekler tek bir uçuştaki isteği paylaşır. Offline modda ağa hiç
+# çıkılmaz, sadece diskteki veri döner.
+_session = requests.Session()
+_inflight = {}
+_inflight_lock = threading.Lock()
+_revalidator = ThreadPoolExecutor(max_workers=2, thread_name_prefix="nasa-revalidate")
+
+# nasa_prefetch.py'nin tüm ülkeler için doldurduğu gold tablosu
+CLIMATE_TABLE = "nasa_climate"
+# NASA POWER'ın eksik değer işareti
+NASA_MISSING = -999.0
+
+def cache_key(lat, lon, start, end, parameters=NASA_PARAMETERS):
+    raw = f"{round(float(lat), 4)}|{round(float(lon), 4)}|{int(start)}|{int(end)}|{','.join(sorted(parameters.split(',')))}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _entry_path(directory, key):
+    return os.path.join(directory, f"{key}.json")
+
+def read_entry(key, directory=NASA_CACHE_DIR):
+    try:
+        with open(_entry_path(directory, key), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def write_entry(key, payload, directory=NASA_CACHE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = _entry_path(directory, key)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"fetched_at": time.time(), "payload": payload}, f)
+    os.replace(tmp, path)
+
+def fetch_power(lat, lon, start, end, parameters=NASA_PARAMETERS, url=NASA_POWER_URL, timeout=NASA_TIMEOUT,
+                session=None):
+    """NASA POWER annual/point çağrısı; properties.parameter sözlüğünü döner."""
+    res = (session or _session).get(url, timeout=timeout, params={
+        "parameters": parameters, "community": "RE", "longitude": lon, "latitude": lat,
+        "start": start, "end": end, "format": "JSON"
+    })
+    if res.status_code != 200:
+        raise requests.HTTPError(f"NASA API Hata Kodu: {res.status_code}", response=res)
+    return res.json()["properties"]["parameter"]
+
+def _fetch_and_store(key, lat, lon, start, end, parameters, url, directory):
+    payload = fetch_power(lat, lon, start, end, parameters, url)
+    write_entry(key, payload, directory)
+    return payload
+
+def _coalesced(key, fn, *args):
+    """Aynı anahtar için uçuşta bir istek varsa onun Future'ını, yoksa yenisini döner (ilk çağıran çalıştırır)."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight[key] = Future()
+
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with _inflight_lock:
+                _inflight.pop(key, None)
+    return future, run
+
+def get_power_parameters(lat, lon, start, end, parameters=NASA_PARAMETERS, ttl=NASA_CACHE_TTL_SECONDS,
+                         offline=NASA_OFFLINE, directory=NASA_CACHE_DIR, url=NASA_POWER_URL):
+    """(parametre sözlüğü ya da None, durum) döner. durum: fresh | stale | fetched | offline | error"""
+    key = cache_key(lat, lon, start, end, parameters)
+    entry = read_entry(key, directory)
+    args = (key, lat, lon, start, end, parameters, url, directory)
+
+    if entry is not None:
+        if time.time() - entry["fetched_at"] < ttl:
+            return entry["payload"], "fresh"
+        if not offline:
+            future, run = _coalesced(key, _fetch_and_store, *args)
+            if run:
+                _revalidator.submit(run)
+                future.add_done_callback(lambda f: f.exception() and logger.warning(
+                    f" NASA önbelleği arka planda yenilenemedi ({lat}, {lon}): {f.exception()}"))
+        return entry["payload"], "stale"
+
+    if offline:
+        return None, "offline"
+    future, run = _coalesced(key, _fetch_and_store, *args)
+    if run:
+        run()
+    try:
+        return future.result(), "fetched"
+    except Exception as e:
+        logger.warning(f" NASA POWER isteği başarısız ({lat}, {lon}): {e}")
+        return None, "error"
+
+# ---------------------------------------------------------
+# YANIT -> FRAME VE ÜLKE KOORDİNATLARI (dashboard ve nasa_prefetch ortak)
+# ---------------------------------------------------------
+def nasa_params_to_frame(params):
+    """Parametre sözlüğünden Year, NASA_Solar, NASA_Wind frame'i. -999 (eksik) değerler NaN olur."""
+    years = [int(y) for y in params['ALLSKY_SFC_SW_DWN'].keys() if y != 'ANN']
+    df = pd.DataFrame({
+        'Year': years,
+        'NASA_Solar': [params['ALLSKY_SFC_SW_DWN'][str(y)] for y in years],
+        'NASA_Wind': [params['WS2M'][str(y)] for y in years]
+    })
+    df[['NASA_Solar', 'NASA_Wind']] = df[['NASA_Solar', 'NASA_Wind']].astype('float64').replace(NASA_MISSING, np.nan)
+    return df
+
+@lru_cache(maxsize=4)
+def load_coordinate_table(path=NASA_COORDINATES_FILE):
+    """ISO3 kodu -> ülkenin temsili noktası (yaklaşık coğrafi merkez). ETL'in veri seti sanmaması için Veri_Setleri dışında durur.
+    Süreç başına bir kez okunur; dönen frame paylaşılır, değiştirilmemelidir.
+    """
+    return pd.read_csv(path, keep_default_na=False).set_index("Code")
@@ -0,0 +1,198 @@
+import sys
+import time
+import random
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from config import (NASA_POWER_URL, NASA_CACHE_DIR, NASA_CACHE_TTL_SECONDS, NASA_OFFLINE, NASA_PREFETCH_CONCURRENCY,
+                    NASA_PREFETCH_RATE_PER_SEC, NASA_PREFETCH_MAX_RETRIES, NASA_PREFETCH_BACKOFF_SECONDS,
+                    NASA_START_YEAR, NASA_END_YEAR, logger)
+from db_manager import get_db_engine, query_table
+from nasa_cache import (CLIMATE_TABLE, cache_key, read_entry, write_entry, fetch_power, nasa_params_to_frame,
+                        load_coordinate_table)
+from run_ledger import RunLedger
+
+# ---------------------------------------------------------
+# NASA POWER TOPLU ÖN YÜKLEME
+# ---------------------------------------------------------
+# Gold katmanındaki her ülkenin yıllık güneş/rüzgar serisi koordinat tablosundaki
+# temsili noktadan çekilir ve tek bir gold tablosuna (nasa_climate) yazılır.
+# Sayfa 3 böylece API'ye gitmeden (Entity, Year) indeksli tek sorguyla okur.
+# İstekler sınırlı bir thread havuzundan, bağlantıları yeniden kullanan tek bir
+# Session üzerinden gider; hız sınırı tüm thread'ler arasında paylaşılır.
+# Streamlit'siz çalışır: dashboard modülü (utils) import edilmez.
+
+class RateLimiter:
+    """Ardışık iki istek arasına en az 1/rate saniye koyar (thread'ler arası paylaşılır). rate <= 0: sınırsız."""
+
+    def __init__(self, rate_per_sec):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def pooled_session(concurrency):
+    # Her thread'e bir keep-alive bağlantı; varsayılan havuz (10) eşzamanlılıktan küçükse bağlantı atılıp yeniden açılır
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _is_permanent(error):
+    # 4xx (429 hariç) tekrar denemekle düzelmez: geçersiz koordinat ya da parametre
+    response = getattr(error, "response", None)
+    return response is not None and 400 <= response.status_code < 500 and response.status_code != 429
+
+def fetch_with_backoff(session, limiter, lat, lon, start, end, url=NASA_POWER_URL,
+                       retries=NASA_PREFETCH_MAX_RETRIES, backoff=NASA_PREFETCH_BACKOFF_SECONDS):
+    """fetch_power'ı hız sınırına uyarak çağırır; geçici hatalarda üstel (jitter'lı) bekleyip tekrar dener."""
+    for attempt in range(1, retries + 1):
+        limiter.wait()
+        try:
+            return fetch_power(lat, lon, start, end, url=url, session=session)
+        except Exception as e:
+            if _is_permanent(e) or attempt == retries:
+                raise
+            wait = backoff * (2 ** (attempt - 1)) * random.uniform(1.0, 1.5)
+            logger.warning(f" NASA denemesi {attempt}/{retries} başarısız ({lat}, {lon}): {e}. "
+                           f"{wait:.1f} sn sonra tekrar denenecek.")
+            time.sleep(wait)
+
+def prefetch_point(session, limiter, lat, lon, start, end, url=NASA_POWER_URL, ttl=NASA_CACHE_TTL_SECONDS,
+                   offline=NASA_OFFLINE, directory=NASA_CACHE_DIR, retries=NASA_PREFETCH_MAX_RETRIES,
+                   backoff=NASA_PREFETCH_BACKOFF_SECONDS):
+    """Noktanın parametre sözlüğünü ve kaynağını (cache | fetched | stale) döner.
+    Yanıt nasa_cache'in disk önbelleğine de yazılır; sayfa 3'ün canlı yolu aynı kaydı kullanır.
+    Çekim başarısız olursa süresi geçmiş kayıt kullanılır; API kesintisi veri kaybettirmez.
+    """
+    key = cache_key(lat, lon, start, end)
+    entry = read_entry(key, directory)
+    if entry is not None and (offline or time.time() - entry["fetched_at"] < ttl):
+        return entry["payload"], "cache"
+    if offline:
+        raise RuntimeError("offline mod ve önbellekte kayıt yok")
+    try:
+        payload = fetch_with_backoff(session, limiter, lat, lon, start, end, url=url, retries=retries, backoff=backoff)
+    except Exception as e:
+        if entry is None:
+            raise
+        logger.warning(f" NASA çekimi başarısız ({lat}, {lon}), önbellekteki eski kayıt kullanılıyor: {e}")
+        return entry["payload"], "stale"
+    write_entry(key, payload, directory)
+    return payload, "fetched"
+
+def entity_coordinates(engine):
+    """Gold'daki her ülke için Entity, Code, Latitude, Longitude.
+    Koordinatlar ISO3 koduyla eşlenir; OWID_ toplulukları (Dünya, kıtalar, gelir grupları) tek noktaya inmediği için dışarıda kalır.
+    """
+    entities = query_table("mv_entity_latest", engine=engine, columns=["Entity", "Code"])
+    coordinates = entities.merge(load_coordinate_table().reset_index(), on="Code", how="inner")
+    skipped = len(entities) - len(coordinates)
+    logger.info(f" Koordinat tablosu: {len(coordinates)} ülke eşlendi, {skipped} bölge/kodsuz kayıt atlandı.")
+    return coordinates.sort_values("Entity").reset_index(drop=True)
+
+def climate_frame(entity, code, lat, lon, params):
+    df = nasa_params_to_frame(params)
+    df.insert(0, "Entity", entity)
+    df.insert(1, "Code", code)
+    df["Latitude"], df["Longitude"] = lat, lon
+    return df
+
+def prefetch_all(coordinates, start=NASA_START_YEAR, end=NASA_END_YEAR, concurrency=NASA_PREFETCH_CONCURRENCY,
+                 rate_per_sec=NASA_PREFETCH_RATE_PER_SEC, url=NASA_POWER_URL, ledger=None, **point_options):
+    """Tüm koordinatları sınırlı thread havuzu ile çeker; (uzun tablo, başarısız ülkeler) döner."""
+    session = pooled_session(concurrency)
+    limiter = RateLimiter(rate_per_sec)
+    frames, failed, sources = [], [], Counter()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="nasa-prefetch") as executor:
+        futures = {
+            executor.submit(prefetch_point, session, limiter, row.Latitude, row.Longitude, start, end,
+                            url=url, **point_options): row
+            for row in coordinates.itertuples(index=False)
+        }
+        for future in as_completed(futures):
+            row = futures[future]
+            try:
+                params, source = future.result()
+                frames.append(climate_frame(row.Entity, row.Code, row.Latitude, row.Longitude, params))
+                sources[source] += 1
+            except Exception as e:
+                failed.append(row.Entity)
+                logger.error(f" NASA verisi alınamadı ({row.Entity}): {e}")
+                if ledger:
+                    ledger.record("fetch", row.Entity, status="HATA")
+    session.close()
+
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    logger.info(f" NASA ön yükleme: {len(frames)}/{len(coordinates)} ülke ({sources['fetched']} API, "
+                f"{sources['cache']} önbellek, {sources['stale']} eski önbellek), {elapsed:.1f} sn -> {sources['fetched'] / elapsed:.1f} istek/sn "
+                f"({concurrency} thread, en fazla {rate_per_sec:g} istek/sn)")
+    if ledger:
+        ledger.record("fetch", None, rows_in=len(coordinates), rows_out=len(frames), wall_seconds=elapsed)
+    climate = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return climate, failed
+
+def to_arrow(climate):
+    import pyarrow as pa
+    schema = pa.schema([
+        ("Entity", pa.string()), ("Code", pa.string()), ("Year", pa.int32()),
+        ("NASA_Solar", pa.float64()), ("NASA_Wind", pa.float64()),
+        ("Latitude", pa.float64()), ("Longitude", pa.float64())
+    ])
+    ordered = climate.sort_values(["Entity", "Year"])[schema.names]
+    return pa.Table.from_pandas(ordered, schema=schema, preserve_index=False)
+
+def publish_climate(climate, failed):
+    """Tüm ülkeler geldiyse tablo atomik olarak değiştirilir. Eksik ülke varsa (Entity, Year) üzerinden upsert
+    edilir; böylece bu çalıştırmada alınamayan ülkelerin gold'daki önceki satırları silinmez.
+    """
+    from gold_loader import load_gold_arrow, upsert_gold_arrow, gold_table_exists
+    if failed and gold_table_exists(CLIMATE_TABLE):
+        upsert_gold_arrow(to_arrow(climate), CLIMATE_TABLE, ["Entity", "Year"])
+    else:
+        load_gold_arrow(to_arrow(climate), CLIMATE_TABLE)
+
+def run_prefetch(start=NASA_START_YEAR, end=NASA_END_YEAR):
+    logger.info(f"🛰️ NASA POWER toplu ön yükleme başladı ({start}-{end})...")
+    ledger = RunLedger("nasa_prefetch")
+    engine = get_db_engine()
+    try:
+        with ledger.stage("coordinates", "mv_entity_latest") as m:
+            coordinates = entity_coordinates(engine)
+            m["rows_out"] = len(coordinates)
+        climate, failed = prefetch_all(coordinates, start, end, ledger=ledger)
+        if climate.empty:
+            logger.error(" Hiçbir ülke için NASA verisi alınamadı; nasa_climate güncellenmedi.")
+            ledger.finish("HATA")
+            return
+        with ledger.stage("gold_load", CLIMATE_TABLE) as m:
+            publish_climate(climate, failed)
+            m["rows_out"] = len(climate)
+    except Exception as e:
+        logger.error(f" NASA ön yükleme başarısız: {e}")
+        ledger.finish("HATA")
+        return
+    if failed:
+        logger.warning(f" {len(failed)} ülke bu çalıştırmada alınamadı (gold'daki önceki satırları korundu), "
+                       f"bir sonraki çalıştırmada tekrar denenecek: {', '.join(failed)}")
+    logger.info(f" {CLIMATE_TABLE} hazır: {climate['Entity'].nunique()} ülke, {len(climate)} satır.")
+    ledger.finish()
+
+if __name__ == "__main__":
+    # Opsiyonel yıl aralığı: python nasa_prefetch.py 2000 2025
+    if len(sys.argv) == 3:
+        run_prefetch(int(sys.argv[1]), int(sys.argv[2]))
+    else:
+        run_prefetch()
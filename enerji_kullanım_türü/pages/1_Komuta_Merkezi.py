@@ -3,7 +3,7 @@ import plotly.graph_objects as go
 import plotly.express as px
 import numpy as np
 import pandas as pd
-from utils import load_all_datasets, fetch_hybrid_data, setup_sidebar
+from utils import get_role_frame, fetch_hybrid_data, setup_sidebar, query_gold, get_entity_location
 
 # 1. SAYFA AYARI
 st.set_page_config(page_title="Komuta Merkezi", page_icon="🌐", layout="wide")
@@ -31,14 +31,16 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # 2. VERİ HAZIRLIĞI
-df_co2, df_fossil, df_share, df_supp = load_all_datasets()
+df_share = get_role_frame('share')
 selected_country = st.session_state.get("selected_country", "Turkey")
 
-# Ülke Verileri
-share_data = df_share[df_share['Entity'] == selected_country]
-share_val = share_data.iloc[-1]['Renewables'] if not share_data.empty else 0.0
-loc_map = {"Turkey": [39.9, 32.8], "United States": [37.1, -95.7], "China": [35.9, 104.2], "Germany": [51.1, 10.4]}
-lat_lon = loc_map.get(selected_country, [30.0, 31.0])
+# Ülke Verileri: ülkenin son yıl özeti materialized view'dan tek satır olarak gelir
+latest_row = query_gold('mv_entity_latest', columns=['Year', 'Fossil fuels'], entities=selected_country)
+# Pay verisi son yılda eksik olabilir: ülkenin payı bilinen en son yılı okunur, boşluk 0 sayılmaz
+latest_share = query_gold('energy_master', columns=['Year', 'Renewables_Share'], entities=selected_country,
+                          not_null=['Renewables_Share'], order_by=[('Year', 'desc')], limit=1)
+share_val = latest_share.iloc[0]['Renewables_Share'] if not latest_share.empty else None
+lat_lon = get_entity_location(selected_country) or (30.0, 31.0)
 
 # API Verisi
 api_energy = fetch_hybrid_data(lat_lon[0], lat_lon[1])
@@ -52,10 +54,10 @@ c1, c2, c3, c4 = st.columns(4)
 with c1:
     st.markdown(f"""<div class="metric-container"><span class="badge-api">NASA UYDU</span><h3>Güneş Potansiyeli</h3><h2>{api_energy['nasa_solar']:.2f} <span style="font-size:16px">kW/m²</span></h2></div>""", unsafe_allow_html=True)
 with c2:
-    fossil_gen = df_fossil[df_fossil["Entity"] == selected_country].iloc[-1]["Fossil fuels"]
+    fossil_gen = latest_row.iloc[0]["Fossil fuels"]
     st.markdown(f"""<div class="metric-container"><span class="badge-fossil">ŞEBEKE YÜKÜ</span><h3>Fosil Üretim</h3><h2>{fossil_gen:.0f} <span style="font-size:16px">TWh</span></h2></div>""", unsafe_allow_html=True)
 with c3:
-    st.markdown(f"""<div class="metric-container"><span class="badge-green">YEŞİL HEDEF</span><h3>Yenilenebilir Payı</h3><h2>%{share_val:.1f}</h2></div>""", unsafe_allow_html=True)
+    st.markdown(f"""<div class="metric-container"><span class="badge-green">YEŞİL HEDEF</span><h3>Yenilenebilir Payı</h3><h2>{f"%{share_val:.1f}" if share_val is not None else "Veri yok"}</h2></div>""", unsafe_allow_html=True)
 with c4:
     st.markdown(f"""<div class="metric-container" style="border-left-color: #eb6e4b;"><span class="badge-api">CANLI SAHA</span><h3>Anlık Sıcaklık</h3><h2>{api_energy['live_temp']:.1f}°C</h2></div>""", unsafe_allow_html=True)
 
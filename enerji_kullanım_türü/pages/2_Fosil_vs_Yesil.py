@@ -2,7 +2,7 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from sklearn.linear_model import LinearRegression
-from utils import load_all_datasets
+from utils import get_entity_list, get_country_slice
 
 # 1. SAYFA KONFİGÜRASYONU
 st.set_page_config(page_title="Fosil vs Yeşil", page_icon="🔥", layout="wide")
@@ -34,7 +34,6 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # 2. VERİ YÜKLEME VE FİLTRELEME
-df_co2, df_fossil, df_share, df_supp = load_all_datasets()
 
 # Hafızadan (Session State) seçili ülkeyi al
 if "selected_country" in st.session_state:
@@ -42,15 +41,15 @@ if "selected_country" in st.session_state:
 else:
     selected_country = "Turkey"
 
-entities = sorted(df_fossil['Entity'].unique())
+entities = get_entity_list()
 selected_country = st.sidebar.selectbox("📍 Bölge Değiştir", entities, index=entities.index(selected_country))
 st.session_state["selected_country"] = selected_country
 
 st.markdown(f"## 🔥 {selected_country}: Enerji Geçiş Savaşı (The Transition Battlefield)")
 st.markdown('<div class="explanation-box">Bu bölümde, fosil yakıtların hakimiyetini kaybetme sürecini ve yeşil enerjinin yükseliş ivmesini "Makas Analizi" ve "Momentum İndeksi" ile inceliyoruz.</div>', unsafe_allow_html=True)
 
-# Veri Hazırlığı
-df_target = df_fossil[df_fossil['Entity'] == selected_country].sort_values('Year')
+# Veri Hazırlığı: ülke dilimi bellekteki indeksten gelir (Year sıralı); aşağıda kolon eklendiği için kopyalanır
+df_target = get_country_slice('energy_master', selected_country)[['Entity', 'Year', 'Fossil fuels', 'Renewables']].copy()
 
 # KPI Hesaplamaları
 if not df_target.empty:
@@ -3,7 +3,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 import pandas as pd
-from utils import load_all_datasets, setup_sidebar, fetch_nasa_historical_trends
+from utils import setup_sidebar, get_nasa_climate
 
 # 1. SAYFA KONFİGÜRASYONU
 st.set_page_config(page_title="Hava ve Enerji Analitiği", page_icon="📡", layout="wide")
@@ -25,7 +25,6 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # 2. VERİ YÜKLEME
-df_co2, df_fossil, df_share, df_supp = load_all_datasets()
 selected_country = st.session_state.get("selected_country", "Turkey")
 
 # 3. SAYFA İÇERİĞİ
@@ -36,24 +35,28 @@ st.markdown('<div class="explanation-box">Bu bölümde, NASA ve OpenWeather veri
 st.divider()
 st.subheader(f" {selected_country}: 25 Yıllık Atmosferik Trendler (2000-2025)")
 
-loc_map = {"Turkey": [39.9, 32.8], "United States": [37.1, -95.7], "China": [35.9, 104.2], "Germany": [51.1, 10.4]}
-lat_lon = loc_map.get(selected_country, [39.9, 32.8])
-
-# NASA'dan 25 yıllık veriyi çek
-df_nasa = fetch_nasa_historical_trends(lat_lon[0], lat_lon[1])
-
-col_h1, col_h2 = st.columns(2)
-with col_h1:
-    fig_solar_line = px.line(df_nasa, x="Year", y="NASA_Solar", title="Yıllık Güneş Radyasyonu Trendi (kW/m²)", markers=True)
-    fig_solar_line.update_traces(line_color="#f59e0b")
-    st.plotly_chart(fig_solar_line, use_container_width=True)
-    st.markdown('<div class="explanation-box"><b>Güneş Trendi:</b> Son 25 yılda bölgeye düşen yıllık ortalama radyasyon miktarındaki değişimi gösterir.</div>', unsafe_allow_html=True)
-
-with col_h2:
-    fig_wind_line = px.area(df_nasa, x="Year", y="NASA_Wind", title="Yıllık Ortalama Rüzgar Hızı (m/s)")
-    fig_wind_line.update_traces(line_color="#3b82f6")
-    st.plotly_chart(fig_wind_line, use_container_width=True)
-    st.markdown('<div class="explanation-box"><b>Rüzgar Trendi:</b> Bölgedeki rüzgar potansiyelinin yıllara göre kararlılığını analiz eder.</div>', unsafe_allow_html=True)
+# 25 yıllık seri: nasa_prefetch'in doldurduğu gold tablosundan, yoksa ülkenin koordinatından canlı
+df_nasa = get_nasa_climate(selected_country)
+if df_nasa is None:
+    st.info("ℹ️ Bu kayıt bir bölge/ülke grubu; tek bir koordinata indirgenemediği için NASA serisi gösterilmiyor.")
+elif df_nasa.attrs.get('source') == 'fallback':
+    st.warning("⚠️ NASA POWER verisine ulaşılamadı ve önbellekte kayıt yok; aşağıdaki trendler temsili (sahte) değerlerdir.")
+elif df_nasa.attrs.get('source') == 'stale':
+    st.caption("ℹ️ NASA verisi önbellekten gösteriliyor; arka planda güncelleniyor.")
+
+if df_nasa is not None:
+    col_h1, col_h2 = st.columns(2)
+    with col_h1:
+        fig_solar_line = px.line(df_nasa, x="Year", y="NASA_Solar", title="Yıllık Güneş Radyasyonu Trendi (kW/m²)", markers=True)
+        fig_solar_line.update_traces(line_color="#f59e0b")
+        st.plotly_chart(fig_solar_line, use_container_width=True)
+        st.markdown('<div class="explanation-box"><b>Güneş Trendi:</b> Son 25 yılda bölgeye düşen yıllık ortalama radyasyon miktarındaki değişimi gösterir.</div>', unsafe_allow_html=True)
+
+    with col_h2:
+        fig_wind_line = px.area(df_nasa, x="Year", y="NASA_Wind", title="Yıllık Ortalama Rüzgar Hızı (m/s)")
+        fig_wind_line.update_traces(line_color="#3b82f6")
+        st.plotly_chart(fig_wind_line, use_container_width=True)
+        st.markdown('<div class="explanation-box"><b>Rüzgar Trendi:</b> Bölgedeki rüzgar potansiyelinin yıllara göre kararlılığını analiz eder.</div>', unsafe_allow_html=True)
 
 #2. GÜNEŞ ENERJİSİ ISI HARİTASI (GOLDEN HOURS)
 st.divider()
@@ -101,5 +104,6 @@ with col_w2:
 
 # VERİ İNDİRME
 st.divider()
-csv_nasa = df_nasa.to_csv(index=False).encode('utf-8')
-st.download_button(" NASA 2000-2025 Tarihsel Verilerini İndir", data=csv_nasa, file_name=f"{selected_country}_nasa_trends.csv")
\ No newline at end of file
+if df_nasa is not None:
+    csv_nasa = df_nasa.to_csv(index=False).encode('utf-8')
+    st.download_button(" NASA 2000-2025 Tarihsel Verilerini İndir", data=csv_nasa, file_name=f"{selected_country}_nasa_trends.csv")
\ No newline at end of file
@@ -4,7 +4,7 @@ import numpy as np
 import plotly.express as px
 import joblib
 import os
-from utils import load_all_datasets, setup_sidebar
+from utils import setup_sidebar, get_country_slice
 
 st.set_page_config(page_title="AI Projeksiyonu", page_icon="🔮", layout="wide")
 setup_sidebar()
@@ -18,11 +18,10 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # Veriyi çekiyoruz
-df_co2, df_fossil, df_share, df_master = load_all_datasets()
 selected_country = st.session_state.get("selected_country", "Turkey")
 
 # JUNIOR-FIX: Renewables_TWh yerine artık sadece 'Renewables' kullanıyoruz (utils.py uyumu)
-df_target = df_master[(df_master['Entity'] == selected_country)].dropna(
+df_target = get_country_slice('energy_master', selected_country).dropna(
     subset=['Renewables', 'Year', 'Fossil fuels', 'Nuclear', 'Per capita emissions']
 )
 
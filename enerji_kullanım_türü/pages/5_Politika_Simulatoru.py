@@ -4,7 +4,7 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import joblib
 import os
-from utils import load_all_datasets, setup_sidebar
+from utils import setup_sidebar, query_gold
 
 # 1. SAYFA AYARI VE SIDEBAR
 st.set_page_config(page_title="Politika Simülatörü", page_icon="🎛️", layout="wide")
@@ -18,15 +18,8 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # 2. VERİ YÜKLEME VE HESAPLAMA
-df_co2, df_fossil, df_share, df_master = load_all_datasets()
 selected_country = st.session_state.get("selected_country", "Turkey")
-
-# JUNIOR-FIX: Postgres'ten gelen ham verilerle oranları (Share) burada hesaplıyoruz
-# utils.py'den gelen df_master zaten 'Fossil fuels', 'Nuclear' ve 'Renewables' sütunlarına sahip
-df_master['Total_Gen'] = df_master['Fossil fuels'] + df_master['Nuclear'] + df_master['Renewables']
-df_master['Share_Renewables'] = (df_master['Renewables'] / df_master['Total_Gen']) * 100
-df_master['Share_Nuclear'] = (df_master['Nuclear'] / df_master['Total_Gen']) * 100
-df_master['Share_Fossil'] = (df_master['Fossil fuels'] / df_master['Total_Gen']) * 100
+# Total_Gen ve Share_* kolonları ETL'de (energy_master) hesaplanıp hazır geliyor
 
 # 3. MODEL YÜKLEME
 MODEL_PATH = "models/policy_simulator_rf.pkl"
@@ -36,14 +29,14 @@ if not os.path.exists(MODEL_PATH):
 
 rf_sim_model = joblib.load(MODEL_PATH)
 
-# Mevcut Ülke Durumu (Yeni hesapladığımız sütunlarla çekiyoruz)
-country_data = df_master[df_master['Entity'] == selected_country].dropna(subset=['Share_Renewables'])
+# Mevcut Ülke Durumu: ülkenin son yılı materialized view'dan (mv_entity_latest) gelir
+country_data = query_gold('mv_entity_latest', entities=selected_country).fillna(0.0)
 
 if country_data.empty:
     st.warning(f"⚠️ {selected_country} için yeterli analiz verisi bulunamadı.")
     st.stop()
 
-current_state = country_data.iloc[-1]
+current_state = country_data.iloc[0]
 curr_ren = float(current_state['Share_Renewables'])
 curr_nuc = float(current_state['Share_Nuclear'])
 curr_fos = float(current_state['Share_Fossil'])
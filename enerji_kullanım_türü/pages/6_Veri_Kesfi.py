@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from utils import load_all_datasets
+from utils import get_master_frame, query_gold
 
 # 1. SAYFA AYARI
 st.set_page_config(page_title="Veri Keşfi", page_icon="📂", layout="wide")
@@ -19,14 +19,11 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # 2. VERİ YÜKLEME VE HAZIRLIK
-df_co2, df_fossil, df_share, df_supp = load_all_datasets()
+df_supp = get_master_frame()
 
-df_master = pd.merge(df_fossil, df_co2[['Entity', 'Year', 'Per capita emissions']], on=['Entity', 'Year'], how='inner')
-df_master['Total_Gen'] = df_master['Fossil fuels'] + df_master['Nuclear'] + df_master['Renewables']
-df_master = df_master[df_master['Total_Gen'] > 5] 
-df_master['Share_Fossil'] = (df_master['Fossil fuels'] / df_master['Total_Gen']) * 100
-df_master['Share_Nuclear'] = (df_master['Nuclear'] / df_master['Total_Gen']) * 100
-df_master['Share_Renewables'] = (df_master['Renewables'] / df_master['Total_Gen']) * 100
+# energy_master birleştirilmiş ve payları hesaplanmış olarak geliyor; sadece filtre uygulanır.
+# Emisyonu olmayan satırlar (CO2 verisiyle eşleşmeyenler) korelasyona ve dışa aktarıma girmez
+df_master = df_supp[df_supp['Total_Gen'] > 5].dropna(subset=['Per capita emissions'])
 
 # 3. ARAYÜZ
 st.markdown("##  Global Veri Keşfi ve Liderlik Tabloları")
@@ -37,11 +34,11 @@ df_year = df_master[df_master['Year'] == year_select]
 col_top1, col_top2 = st.columns(2)
 with col_top1:
     st.markdown("###  En Yeşil 10 Ülke")
-    top_green = df_year.sort_values("Share_Renewables", ascending=False).head(10)
+    top_green = query_gold("mv_top_green_by_year", year_range=(year_select, year_select), order_by=["Rank"])
     st.plotly_chart(px.bar(top_green, x="Share_Renewables", y="Entity", orientation='h', color="Share_Renewables", color_continuous_scale="Greens"), use_container_width=True)
 with col_top2:
     st.markdown("###  En Fosil Bağımlı 10 Ülke")
-    top_fossil = df_year.sort_values("Share_Fossil", ascending=False).head(10)
+    top_fossil = query_gold("mv_top_fossil_by_year", year_range=(year_select, year_select), order_by=["Rank"])
     st.plotly_chart(px.bar(top_fossil, x="Share_Fossil", y="Entity", orientation='h', color="Share_Fossil", color_continuous_scale="Reds"), use_container_width=True)
 
 st.divider()
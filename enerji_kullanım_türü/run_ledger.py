@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+import pandas as pd
+from sqlalchemy import text
+from config import RUN_LEDGER_BACKEND, RUN_LEDGER_FILE, logger
+
+# ---------------------------------------------------------
+# 1. ÇALIŞMA KAYDI (RUN LEDGER)
+# ---------------------------------------------------------
+# Ingest, ETL ve model eğitimi her çalıştırmada aşama/veri seti bazında süre,
+# CPU, satır ve bayt hacmini buraya yazar. Postgres'te dashboard'un public
+# tablo listesine karışmasın diye ayrı "ops" şemasında tutulur; testlerde
+# RUN_LEDGER_BACKEND=file ile JSON lines dosyasına yazılır.
+OPS_SCHEMA = "ops"
+
+RUN_COLUMNS = ["run_id", "pipeline", "status", "started_at", "finished_at", "wall_seconds", "cpu_seconds"]
+STAGE_COLUMNS = ["run_id", "pipeline", "stage", "dataset", "status", "rows_in", "rows_out",
+                 "bytes_read", "bytes_written", "wall_seconds", "cpu_seconds", "recorded_at"]
+
+DDL = [
+    f"CREATE SCHEMA IF NOT EXISTS {OPS_SCHEMA}",
+    f"""CREATE TABLE IF NOT EXISTS {OPS_SCHEMA}.pipeline_runs (
+        run_id TEXT PRIMARY KEY, pipeline TEXT NOT NULL, status TEXT,
+        started_at TIMESTAMP NOT NULL, finished_at TIMESTAMP,
+        wall_seconds DOUBLE PRECISION, cpu_seconds DOUBLE PRECISION)""",
+    f"""CREATE TABLE IF NOT EXISTS {OPS_SCHEMA}.pipeline_stage_metrics (
+        run_id TEXT NOT NULL, pipeline TEXT NOT NULL, stage TEXT NOT NULL, dataset TEXT, status TEXT,
+        rows_in BIGINT, rows_out BIGINT, bytes_read BIGINT, bytes_written BIGINT,
+        wall_seconds DOUBLE PRECISION, cpu_seconds DOUBLE PRECISION, recorded_at TIMESTAMP NOT NULL)""",
+    f"CREATE INDEX IF NOT EXISTS pipeline_stage_metrics_run ON {OPS_SCHEMA}.pipeline_stage_metrics (run_id)"
+]
+
+_ddl_lock = threading.Lock()
+_ddl_done = False
+
+def _ledger_engine():
+    """Yazma yolu: süre sınırı olmayan batch engine. DDL süreç başına bir kez çalışır."""
+    global _ddl_done
+    from db_manager import get_batch_engine
+    engine = get_batch_engine()
+    with _ddl_lock:
+        if not _ddl_done:
+            with engine.begin() as conn:
+                for statement in DDL:
+                    conn.execute(text(statement))
+            _ddl_done = True
+    return engine
+
+def _read_ledger(table, sql, columns, params):
+    # Okuma yolu (dashboard): DDL çalıştırmaz; henüz hiç kayıt yazılmadıysa tablo yoktur, boş döner
+    from db_manager import get_db_engine
+    with get_db_engine().connect() as conn:
+        if conn.execute(text("SELECT to_regclass(:t)"), {"t": f"{OPS_SCHEMA}.{table}"}).scalar() is None:
+            return pd.DataFrame(columns=columns)
+        return pd.read_sql(text(sql), conn, params=params)
+
+def timed_call(fn, *args, **kwargs):
+    """fn'i çalıştırır; (sonuç, duvar saati sn, thread CPU sn) döner."""
+    wall, cpu = time.perf_counter(), time.thread_time()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - wall, time.thread_time() - cpu
+
+class RunLedger:
+    """Bir boru hattı çalıştırmasının kaydı. Kayıt hataları boru hattını asla durdurmaz."""
+
+    def __init__(self, pipeline, backend=RUN_LEDGER_BACKEND, path=RUN_LEDGER_FILE):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.pipeline = pipeline
+        self.backend = backend
+        self.path = path
+        self.started_at = datetime.now()
+        self._wall, self._cpu = time.perf_counter(), time.process_time()
+        self._lock = threading.Lock()
+        self._engine = None
+        self.failed_stages = 0
+
+    def _write(self, table, row):
+        try:
+            if self.backend == "file":
+                with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"kind": table, **row}, default=str) + "\n")
+                return
+            with self._lock:
+                if self._engine is None:
+                    self._engine = _ledger_engine()
+            columns = ", ".join(row)
+            values = ", ".join(f":{c}" for c in row)
+            with self._engine.begin() as conn:
+                conn.execute(text(f"INSERT INTO {OPS_SCHEMA}.{table} ({columns}) VALUES ({values})"), row)
+        except Exception as e:
+            logger.warning(f" Çalışma kaydı yazılamadı ({table}): {e}")
+
+    def record(self, stage, dataset=None, status="OK", rows_in=None, rows_out=None, bytes_read=None,
+               bytes_written=None, wall_seconds=None, cpu_seconds=None):
+        if status != "OK":
+            self.failed_stages += 1
+        self._write("pipeline_stage_metrics", {
+            "run_id": self.run_id, "pipeline": self.pipeline, "stage": stage, "dataset": dataset,
+            "status": status, "rows_in": rows_in, "rows_out": rows_out, "bytes_read": bytes_read,
+            "bytes_written": bytes_written,
+            "wall_seconds": None if wall_seconds is None else round(wall_seconds, 3),
+            "cpu_seconds": None if cpu_seconds is None else round(cpu_seconds, 3),
+            "recorded_at": datetime.now()
+        })
+
+    @contextmanager
+    def stage(self, stage, dataset=None):
+        """Bloğun süresini ve thread CPU'sunu ölçer; blok satır/bayt sayılarını sözlüğe yazar."""
+        metrics = {}
+        wall, cpu = time.perf_counter(), time.thread_time()
+        status = "OK"
+        try:
+            yield metrics
+        except Exception:
+            status = "HATA"
+            raise
+        finally:
+            self.record(stage, dataset, status, wall_seconds=time.perf_counter() - wall,
+                        cpu_seconds=time.thread_time() - cpu, **metrics)
+
+    def finish(self, status=None):
+        status = status or ("OK" if self.failed_stages == 0 else "KISMİ")
+        self._write("pipeline_runs", {
+            "run_id": self.run_id, "pipeline": self.pipeline, "status": status,
+            "started_at": self.started_at, "finished_at": datetime.now(),
+            "wall_seconds": round(time.perf_counter() - self._wall, 3),
+            "cpu_seconds": round(time.process_time() - self._cpu, 3)
+        })
+        logger.info(f" Çalışma kaydı: {self.pipeline} #{self.run_id} -> {status}")
+        from db_manager import pool_metrics
+        for purpose in ("batch", "dashboard"):
+            pool = pool_metrics(purpose=purpose)
+            if pool["checkouts"]:
+                logger.info(f" Bağlantı havuzu ({purpose}): {pool['checkouts']} alım, ort. bekleme {pool['wait_seconds_avg']:.3f} sn, "
+                            f"en uzun {pool['wait_seconds_max']:.3f} sn, zaman aşımı {pool['timeouts']}")
+
+# ---------------------------------------------------------
+# 2. OKUMA (Home.py'deki çalışma geçmişi paneli)
+# ---------------------------------------------------------
+def _read_file(path, kind, columns):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return pd.DataFrame([r for r in rows if r.pop("kind", None) == kind], columns=columns)
+
+def load_recent_runs(limit=20, backend=RUN_LEDGER_BACKEND, path=RUN_LEDGER_FILE):
+    if backend == "file":
+        df = _read_file(path, "pipeline_runs", RUN_COLUMNS)
+        return df.sort_values("started_at", ascending=False).head(limit).reset_index(drop=True)
+    return _read_ledger("pipeline_runs", f"SELECT * FROM {OPS_SCHEMA}.pipeline_runs ORDER BY started_at DESC LIMIT :n",
+                        RUN_COLUMNS, {"n": limit})
+
+def load_stage_metrics(run_ids, backend=RUN_LEDGER_BACKEND, path=RUN_LEDGER_FILE):
+    run_ids = list(run_ids)
+    if backend == "file":
+        df = _read_file(path, "pipeline_stage_metrics", STAGE_COLUMNS)
+        return df[df["run_id"].isin(run_ids)].reset_index(drop=True)
+    if not run_ids:
+        return pd.DataFrame(columns=STAGE_COLUMNS)
+    return _read_ledger("pipeline_stage_metrics",
+                        f"SELECT * FROM {OPS_SCHEMA}.pipeline_stage_metrics WHERE run_id = ANY(:ids)",
+                        STAGE_COLUMNS, {"ids": run_ids})
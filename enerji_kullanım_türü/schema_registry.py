@@ -0,0 +1,127 @@
+import pyarrow as pa
+from pyspark.sql.types import (StructType, StructField, StringType, IntegerType, LongType, DoubleType,
+                               FloatType, BooleanType)
+from config import SCHEMA_SAMPLING_RATIO, logger
+from lake_utils import get_minio_client, read_json_object, write_json_object
+
+# ---------------------------------------------------------
+# 1. BİLİNEN VERİ SETLERİNİN ŞEMALARI (inferSchema yerine)
+# ---------------------------------------------------------
+# Her OWID tablosunun anahtar kolonları aynı tiplerle okunur ki Parquet ve
+# Postgres tipleri dosyadan dosyaya değişmesin (örn. bir dosyada int Year,
+# diğerinde double Year).
+KEY_FIELDS = [
+    StructField("Entity", StringType(), True),
+    StructField("Code", StringType(), True),
+    StructField("Year", IntegerType(), True)
+]
+KEY_TYPES = {f.name: f.dataType for f in KEY_FIELDS}
+
+def _owid_schema(*measures):
+    fields = list(KEY_FIELDS)
+    for name, data_type in measures:
+        fields.append(StructField(name, data_type, True))
+    return StructType(fields)
+
+SCHEMA_REGISTRY = {
+    "co2-per-capita-vs-renewable-electricity": _owid_schema(
+        ("Per capita emissions", DoubleType()),
+        ("Share of electricity from renewables", DoubleType()),
+        ("World region according to OWID", StringType())
+    ),
+    "electricity-fossil-renewables-nuclear-line": _owid_schema(
+        ("Nuclear", DoubleType()),
+        ("Fossil fuels", DoubleType()),
+        ("Renewables", DoubleType())
+    ),
+    "share-electricity-renewables": _owid_schema(
+        ("Renewables", DoubleType())
+    ),
+    "share-of-electricity-production-from-renewable-sources": _owid_schema(
+        ("Renewables", DoubleType())
+    )
+}
+
+# Bilinmeyen dosyalar için örneklemeyle çıkarılan şemaların saklandığı yer
+SCHEMA_PREFIX = "_schemas/"
+
+# ---------------------------------------------------------
+# 2. ŞEMA ÇÖZÜMLEME (Spark)
+# ---------------------------------------------------------
+def _load_persisted_schema(client, dataset):
+    payload = read_json_object(client, f"{SCHEMA_PREFIX}{dataset}.json")
+    return StructType.fromJson(payload) if payload else None
+
+def _infer_schema(spark, path):
+    """Sadece örneklenen satırlarla şema çıkarır, anahtar kolon tiplerini sabitler."""
+    inferred = spark.read.option("header", "true").option("inferSchema", "true") \
+        .option("samplingRatio", SCHEMA_SAMPLING_RATIO).csv(path).schema
+    return StructType([
+        StructField(f.name, KEY_TYPES.get(f.name, f.dataType), True) for f in inferred.fields
+    ])
+
+def resolve_schema(spark, dataset, path, client=None):
+    """Veri seti için şemayı döner: kayıt defteri -> saklanmış şema -> örneklemeli çıkarım.
+
+    Şema dosyanın başlık satırıyla uyuşmuyorsa (kolon eklenmiş/silinmiş)
+    yeniden çıkarılır ve saklanır.
+    """
+    # Başlığı okumak sadece ilk satırı okur, tam tarama yapmaz
+    header = spark.read.option("header", "true").csv(path).columns
+
+    schema = SCHEMA_REGISTRY.get(dataset)
+    if schema is not None and schema.fieldNames() == header:
+        return schema
+    if schema is not None:
+        logger.warning(f" Şema kaydı ile dosya başlığı uyuşmuyor ({dataset}), saklanmış/çıkarılmış şemaya düşülüyor.")
+
+    client = client or get_minio_client()
+    schema = _load_persisted_schema(client, dataset)
+    if schema is not None and schema.fieldNames() == header:
+        return schema
+
+    logger.info(f" {dataset} için kayıtlı şema yok, örneklemeyle çıkarılıyor (samplingRatio={SCHEMA_SAMPLING_RATIO}).")
+    schema = _infer_schema(spark, path)
+    write_json_object(client, f"{SCHEMA_PREFIX}{dataset}.json", schema.jsonValue())
+    return schema
+
+def read_bronze_csv(spark, path, dataset, client=None):
+    schema = resolve_schema(spark, dataset, path, client)
+    return spark.read.option("header", "true").schema(schema).csv(path)
+
+# ---------------------------------------------------------
+# 3. pandas/ARROW MOTORU İÇİN AYNI ŞEMALAR
+# ---------------------------------------------------------
+# İki motor da aynı kayıt defterini kullanır ki silver Parquet tipleri birebir aynı olsun
+SPARK_TO_ARROW = {
+    "string": pa.string(), "int": pa.int32(), "bigint": pa.int64(), "double": pa.float64(),
+    "float": pa.float32(), "boolean": pa.bool_()
+}
+ARROW_TO_SPARK = {
+    pa.string(): StringType(), pa.int32(): IntegerType(), pa.int64(): LongType(),
+    pa.float64(): DoubleType(), pa.float32(): FloatType(), pa.bool_(): BooleanType()
+}
+
+def arrow_column_types(schema):
+    return {f.name: SPARK_TO_ARROW.get(f.dataType.simpleString(), pa.string()) for f in schema.fields}
+
+def resolve_arrow_column_types(dataset, header, client=None):
+    """Kayıtlı ya da saklanmış şemayı Arrow tiplerine çevirir; yoksa None (çıkarım gerekir)."""
+    schema = SCHEMA_REGISTRY.get(dataset)
+    if schema is not None and schema.fieldNames() == header:
+        return arrow_column_types(schema)
+    client = client or get_minio_client()
+    schema = _load_persisted_schema(client, dataset)
+    if schema is not None and schema.fieldNames() == header:
+        return arrow_column_types(schema)
+    return None
+
+def pin_and_persist_arrow_schema(dataset, table, client=None):
+    """Arrow'un çıkardığı tipleri Spark şeması olarak saklar (anahtar kolonlar sabitlenir)."""
+    fields = [
+        StructField(f.name, KEY_TYPES.get(f.name, ARROW_TO_SPARK.get(f.type, StringType())), True)
+        for f in table.schema
+    ]
+    schema = StructType(fields)
+    write_json_object(client or get_minio_client(), f"{SCHEMA_PREFIX}{dataset}.json", schema.jsonValue())
+    return table.cast(pa.schema([pa.field(f.name, SPARK_TO_ARROW[f.dataType.simpleString()]) for f in fields]))
@@ -0,0 +1,94 @@
+import os
+import json
+import pyarrow as pa
+from config import SNAPSHOT_DIR, logger
+
+# ---------------------------------------------------------
+# DASHBOARD İÇİN YEREL KOLONLU SNAPSHOT (Arrow IPC)
+# ---------------------------------------------------------
+# load_all_datasets'in ürettiği düzeltilmiş tablolar, gold'daki tablo
+# sürümleriyle etiketlenip yerel diske sıkıştırmasız Arrow IPC dosyaları olarak
+# yazılır. Uygulama yeniden başladığında sürümü aynı kalan tablolar için
+# Postgres'e gidilmez. Dosyalar memory-map ile açılır (ayrı bir okuma tamponu
+# yok), ama DataFrame'e çevrilen kolonlar yine heap'e kopyalanır; kazanç
+# Postgres sorgusu ve dönüşümlerden gelir, bellekten değil.
+# Dosya adı sürümü taşır ve manifest tüm tablolardan sonra bir kez değiştirilir:
+# yazım yarıda kesilirse manifest eski sürümün hâlâ duran dosyalarını gösterir,
+# yeni veri eski sürüm etiketiyle okunmaz. Eski dosyalar manifest'ten sonra silinir.
+MANIFEST_FILE = "manifest.json"
+
+def _table_file(directory, name, version):
+    return os.path.join(directory, f"{name}.v{version}.arrow")
+
+def _replace_atomic(path, write):
+    tmp = f"{path}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+def read_manifest(directory=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"tables": {}}
+
+def _write_manifest(directory, manifest):
+    def write(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    _replace_atomic(os.path.join(directory, MANIFEST_FILE), write)
+
+def _read_table(directory, name, version):
+    with pa.memory_map(_table_file(directory, name, version), "r") as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+def read_snapshot(table_versions, directory=SNAPSHOT_DIR):
+    """{tablo: sürüm} için snapshot'ta aynı sürümle duran tabloları {tablo: DataFrame} olarak döner."""
+    entries = read_manifest(directory)["tables"]
+    frames = {}
+    for name, version in table_versions.items():
+        entry = entries.get(name)
+        if version is None or entry is None or entry.get("version") != version:
+            continue
+        try:
+            frames[name] = _read_table(directory, name, version)
+        except Exception as e:
+            logger.warning(f" Snapshot okunamadı ({name}), Postgres'e düşülüyor: {e}")
+    return frames
+
+def _write_table(directory, name, version, df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    def write(path):
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    _replace_atomic(_table_file(directory, name, version), write)
+
+def _remove_stale_files(directory, manifest):
+    keep = {os.path.basename(_table_file(directory, name, entry["version"])) for name, entry in manifest["tables"].items()}
+    for file_name in os.listdir(directory):
+        if file_name.endswith((".arrow", ".arrow.tmp")) and file_name not in keep:
+            try:
+                os.remove(os.path.join(directory, file_name))
+            except OSError:
+                # Başka bir süreç dosyayı hâlâ açık tutuyor olabilir; bir sonraki yazımda tekrar denenir
+                pass
+
+def write_snapshot(frames, table_versions, directory=SNAPSHOT_DIR):
+    """Sürümü bilinen tabloları snapshot'a yazar/günceller; hata dashboard'u durdurmaz."""
+    versioned = {name: df for name, df in frames.items() if table_versions.get(name) is not None}
+    if not versioned:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        manifest = read_manifest(directory)
+        for name, df in versioned.items():
+            _write_table(directory, name, table_versions[name], df)
+            manifest["tables"][name] = {"version": table_versions[name], "rows": len(df)}
+        _write_manifest(directory, manifest)
+        _remove_stale_files(directory, manifest)
+        logger.info(f" Snapshot güncellendi: {', '.join(versioned)} -> {directory}")
+    except Exception as e:
+        logger.warning(f" Snapshot yazılamadı: {e}")
@@ -1,7 +1,25 @@
+import os
+import tempfile
 import unittest
+import numpy as np
 import pandas as pd
 from sqlalchemy import text
-from utils import load_all_datasets, fetch_hybrid_data, get_db_engine, logger
+from utils import (load_all_datasets, fetch_hybrid_data, get_db_engine, logger, compact_frame, assemble_datasets,
+                   build_entity_index, slice_entity, GoldRegistry)
+from lake_utils import (silver_layout_matches, can_run_incremental, build_local_manifest, diff_manifest, select_pending_objects, CompressingReader,
+                        decompress_bytes, check_compression, dataset_name, bronze_glob, is_bronze_object)
+from ingest_to_s3 import upload_files
+from run_ledger import RunLedger, load_recent_runs, load_stage_metrics
+from snapshot_cache import read_snapshot, write_snapshot
+from db_manager import query_table, create_pooled_engine, pool_metrics, parse_copy_csv
+from dataset_cache import ByteLRUCache, frame_nbytes
+import nasa_cache
+from nasa_cache import get_power_parameters
+from nasa_prefetch import prefetch_all
+from train_models import train_countries
+from gold_master import build_energy_master_frame, MASTER_COLUMNS
+from etl_spark_to_db import choose_engine
+from etl_pandas import clean_table, write_silver_arrow, silver_delta_arrow
 
 class TestEnergyHub(unittest.TestCase):
 
@@ -50,5 +68,718 @@ class TestEnergyHub(unittest.TestCase):
             self.assertIn(key, data, f"API Hatası: {key} alanı eksik!")
         logger.info("QA: API Protokol Testi Geçti.")
 
+class TestPipelineLogic(unittest.TestCase):
+    """Veritabanı ve MinIO gerektirmeyen boru hattı mantık testleri."""
+
+    def test_manifest_diff_only_changed_files(self):
+        """Artımlı ingest sadece yeni veya içeriği değişen dosyaları yüklemeli."""
+        with tempfile.TemporaryDirectory() as folder:
+            for name, body in [("a.csv", "Entity,Year\nTurkey,2020\n"), ("b.csv", "Entity,Year\nChina,2020\n")]:
+                with open(os.path.join(folder, name), "w") as f:
+                    f.write(body)
+
+            first = build_local_manifest(folder, ["a.csv", "b.csv"])
+            self.assertEqual(diff_manifest(first, {}), ["a.csv", "b.csv"])
+
+            with open(os.path.join(folder, "b.csv"), "a") as f:
+                f.write("Germany,2021\n")
+            second = build_local_manifest(folder, ["a.csv", "b.csv"], previous=first)
+            self.assertEqual(diff_manifest(second, first), ["b.csv"])
+
+            # ETL sadece ingest'in değiştirdiği nesneyi işlemeli
+            etl_state = {e["object_name"]: e["sha256"] for e in first.values()}
+            pending, _ = select_pending_objects(["bronze/a.csv", "bronze/b.csv", "bronze/manual.csv"], second, etl_state)
+            self.assertEqual(pending, ["bronze/b.csv", "bronze/manual.csv"])
+
+    def test_parallel_upload_retries_failed_part(self):
+        """Paralel yükleyici geçici hatalarda dosyayı tekrar denemeli ve diğerlerini etkilememeli."""
+        class FlakyClient:
+            def __init__(self):
+                self.calls = {}
+
+            def fput_object(self, bucket, object_name, file_path, part_size=0):
+                self.calls[object_name] = self.calls.get(object_name, 0) + 1
+                if object_name.endswith("flaky.csv") and self.calls[object_name] == 1:
+                    raise ConnectionError("bağlantı koptu")
+
+        with tempfile.TemporaryDirectory() as folder:
+            for name in ["ok.csv", "flaky.csv"]:
+                with open(os.path.join(folder, name), "w") as f:
+                    f.write("Entity,Year\nTurkey,2020\n")
+
+            client = FlakyClient()
+            uploaded = upload_files(client, folder, ["ok.csv", "flaky.csv"], max_workers=2)
+
+        self.assertEqual(sorted(uploaded), ["flaky.csv", "ok.csv"])
+        self.assertEqual(client.calls["bronze/flaky.csv"], 2)
+
+    def test_run_ledger_records_stages_and_failures(self):
+        """Çalışma kaydı aşama metriklerini yazmalı, hatalı aşamayı HATA olarak işaretlemeli."""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "runs.jsonl")
+            ledger = RunLedger("etl:pandas", backend="file", path=path)
+            with ledger.stage("silver", "energy_co2") as m:
+                m.update(rows_in=10, rows_out=8, bytes_written=1024)
+            with self.assertRaises(ValueError):
+                with ledger.stage("gold", "energy_co2"):
+                    raise ValueError("COPY başarısız")
+            ledger.finish()
+
+            runs = load_recent_runs(backend="file", path=path)
+            stages = load_stage_metrics(runs["run_id"], backend="file", path=path)
+
+        self.assertEqual(runs.loc[0, "status"], "KISMİ")
+        self.assertEqual(stages.set_index("stage").loc["silver", "rows_out"], 8)
+        self.assertEqual(stages.set_index("stage").loc["gold", "status"], "HATA")
+        self.assertTrue((stages["wall_seconds"] >= 0).all())
+
+    def test_run_ledger_ddl_runs_once_on_batch_engine(self):
+        """Şema DDL'i süreç başına bir kez ve sadece yazma yolunda (batch engine) çalışmalı; okuma DDL çalıştırmamalı."""
+        from unittest import mock
+        import run_ledger
+        batch, dashboard = mock.MagicMock(), mock.MagicMock()
+        # Dashboard okuması: tablo henüz yok (to_regclass NULL)
+        dashboard.connect.return_value.__enter__.return_value.execute.return_value.scalar.return_value = None
+        with mock.patch.object(run_ledger, "_ddl_done", False), \
+                mock.patch("db_manager.get_batch_engine", return_value=batch), \
+                mock.patch("db_manager.get_db_engine", return_value=dashboard):
+            self.assertTrue(load_recent_runs(backend="postgres").empty)
+            self.assertEqual(list(load_stage_metrics(["abc"], backend="postgres").columns), run_ledger.STAGE_COLUMNS)
+            self.assertIs(run_ledger._ledger_engine(), batch)
+            run_ledger._ledger_engine()
+
+        ddl = [str(c.args[0]) for c in batch.begin.return_value.__enter__.return_value.execute.call_args_list]
+        self.assertEqual(ddl, run_ledger.DDL)
+        self.assertFalse(dashboard.begin.called)
+
+    def test_snapshot_is_tied_to_table_versions(self):
+        """Snapshot'tan sadece sürümü değişmemiş tablolar okunmalı."""
+        master = pd.DataFrame({"Entity": ["Turkey", "China"], "Year": [2020, 2021], "Total_Gen": [330.5, None]})
+        co2 = pd.DataFrame({"Entity": ["Turkey"], "Year": [2020], "Per capita emissions": [5.1]})
+        with tempfile.TemporaryDirectory() as folder:
+            write_snapshot({"energy_master": master, "co2": co2, "nasa": co2}, {"energy_master": 7, "co2": 3},
+                           directory=folder)
+            restored = read_snapshot({"energy_master": 7, "co2": 4, "nasa": None}, directory=folder)
+
+        self.assertEqual(list(restored), ["energy_master"])
+        pd.testing.assert_frame_equal(restored["energy_master"], master)
+
+    def test_snapshot_crash_before_manifest_keeps_old_version(self):
+        """Tablo dosyası yazılıp manifest değişmeden kesilen yazım, yeni veriyi eski sürüm etiketiyle sunmamalı."""
+        from unittest import mock
+        old = pd.DataFrame({"Entity": ["Turkey"], "Year": [2020], "Total_Gen": [1.0]})
+        new = old.assign(Total_Gen=[2.0])
+        with tempfile.TemporaryDirectory() as folder:
+            write_snapshot({"energy_master": old}, {"energy_master": 7}, directory=folder)
+            with mock.patch("snapshot_cache._write_manifest", side_effect=OSError("disk dolu")):
+                write_snapshot({"energy_master": new}, {"energy_master": 8}, directory=folder)
+            after_crash = read_snapshot({"energy_master": 7}, directory=folder)
+            self.assertEqual(read_snapshot({"energy_master": 8}, directory=folder), {})
+
+            write_snapshot({"energy_master": new}, {"energy_master": 8}, directory=folder)
+            restored = read_snapshot({"energy_master": 8}, directory=folder)
+            files = sorted(os.listdir(folder))
+
+        pd.testing.assert_frame_equal(after_crash["energy_master"], old)
+        pd.testing.assert_frame_equal(restored["energy_master"], new)
+        # Eski sürümün dosyası manifest güncellendikten sonra silinir
+        self.assertEqual(files, ["energy_master.v8.arrow", "manifest.json"])
+
+    def test_query_pushdown_filters_and_aggregates(self):
+        """Sorgu API'si filtre, sıralama, limit ve GROUP BY'ı SQL'e taşımalı; değerler bind parametresi olmalı."""
+        from sqlalchemy import create_engine
+        engine = create_engine("sqlite://")
+        pd.DataFrame({
+            "Entity": ["Turkey", "Turkey", "Turkey", "China", "Robert'); DROP TABLE energy_master;--"],
+            "Year": [2000, 2010, 2020, 2020, 2020],
+            "Share_Renewables": [25.0, 26.0, 42.0, 30.0, 1.0]
+        }).to_sql("energy_master", engine, index=False)
+
+        top = query_table("energy_master", engine=engine, columns=["Entity", "Share_Renewables"],
+                          year_range=(2020, 2020), order_by=[("Share_Renewables", "desc")], limit=2)
+        self.assertEqual(top["Entity"].tolist(), ["Turkey", "China"])
+
+        turkey = query_table("energy_master", engine=engine, entities=["Turkey"], year_range=(2005, None),
+                             order_by=["Year"])
+        self.assertEqual(turkey["Year"].tolist(), [2010, 2020])
+
+        counts = query_table("energy_master", engine=engine, group_by=["Entity"],
+                             aggregates={"n": ("count", "*"), "avg_share": ("avg", "Share_Renewables")},
+                             entities=["Turkey", "China", "Robert'); DROP TABLE energy_master;--"],
+                             order_by=[("n", "desc")])
+        self.assertEqual(counts.iloc[0].tolist(), ["Turkey", 3, 31.0])
+        self.assertEqual(len(counts), 3)
+
+        with self.assertRaises(ValueError):
+            query_table("energy_master", engine=engine, order_by=[("Year", "desc; DROP TABLE x")])
+
+        # Son yılın değeri boşsa, değeri bilinen en son yıl döner
+        with engine.begin() as conn:
+            conn.exec_driver_sql('UPDATE energy_master SET "Share_Renewables" = NULL '
+                                 "WHERE \"Entity\" = 'Turkey' AND \"Year\" = 2020")
+        latest = query_table("energy_master", engine=engine, entities="Turkey", not_null=["Share_Renewables"],
+                             order_by=[("Year", "desc")], limit=1)
+        self.assertEqual(latest.iloc[0].tolist(), ["Turkey", 2010, 26.0])
+
+    def test_copy_csv_parses_postgres_types_like_read_sql(self):
+        """COPY CSV'deki t/f, tarih ve zaman damgaları read_sql'in döndürdüğü dtype'larla okunmalı."""
+        columns = [("b", 16), ("d", 1082), ("ts", 1114), ("tz", 1184), ("s", 25)]
+        data = (b"t,2024-01-02,2024-01-02 03:04:05.123456,2024-01-02 03:04:05+03,x\n"
+                b'f,,,,""\n')
+        df = parse_copy_csv(data, columns).to_pandas(coerce_temporal_nanoseconds=True)
+
+        self.assertEqual(df["b"].tolist(), [True, False])
+        self.assertEqual(str(df["d"].iloc[0]), "2024-01-02")
+        self.assertTrue(pd.isna(df["d"].iloc[1]))
+        self.assertEqual(str(df["ts"].dtype), "datetime64[ns]")
+        self.assertEqual(df["tz"].iloc[0], pd.Timestamp("2024-01-02 00:04:05", tz="UTC"))
+        # Tırnaklı boş alan boş metindir, NULL değildir
+        self.assertEqual(df["s"].tolist(), ["x", ""])
+        self.assertEqual(parse_copy_csv(b"", columns).column_names, ["b", "d", "ts", "tz", "s"])
+
+    def test_engine_is_shared_and_pool_is_metered(self):
+        """get_db_engine süreç başına tek engine dönmeli; dolu havuzda bekleme ve zaman aşımı sayılmalı."""
+        from unittest import mock
+        from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+        import db_manager
+        self.assertIs(get_db_engine(), get_db_engine())
+        # Dashboard ve batch ayrı havuzlar: statement_timeout sadece dashboard'a uygulanır
+        with mock.patch.dict(db_manager._engines, clear=True), \
+                mock.patch("db_manager.create_pooled_engine", side_effect=lambda url, statement_timeout_ms: mock.Mock()) as factory:
+            self.assertIsNot(db_manager.get_batch_engine(), get_db_engine())
+            self.assertIs(db_manager.get_batch_engine(), db_manager.get_batch_engine())
+        self.assertEqual(sorted(c.kwargs["statement_timeout_ms"] for c in factory.call_args_list),
+                         [0, db_manager.DB_STATEMENT_TIMEOUT_MS])
+        # URL'de verilen options (benchmark'ın search_path'i) statement_timeout eklenirken kaybolmamalı
+        with mock.patch("db_manager.create_engine") as factory:
+            create_pooled_engine("postgresql://u:p@h/db?options=-c%20search_path%3Dbench", statement_timeout_ms=60000)
+        self.assertEqual(factory.call_args.kwargs["connect_args"],
+                         {"options": "-c search_path=bench -c statement_timeout=60000"})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_pooled_engine(f"sqlite:///{tmp}/pool.db", pool_size=1, max_overflow=0, pool_timeout=0.2)
+            other = create_pooled_engine(f"sqlite:///{tmp}/other.db", pool_size=1, max_overflow=0, pool_timeout=0.2)
+            with engine.connect():
+                self.assertEqual(pool_metrics(engine)["checked_out"], 1)
+                with self.assertRaises(PoolTimeoutError):
+                    engine.connect()
+            after = pool_metrics(engine)
+            # Sayaçlar havuza ait: diğer engine'in havuzu etkilenmez
+            self.assertEqual(pool_metrics(other)["checkouts"], 0)
+            engine.dispose()
+            other.dispose()
+
+        self.assertEqual(after["checked_out"], 0)
+        self.assertEqual((after["checkouts"], after["timeouts"]), (2, 1))
+        self.assertGreaterEqual(after["wait_seconds_max"], 0.2)
+
+        # Yavaş bağlantı açmak (connect) bekleme sayılmaz; sadece kuyrukta geçen süre ölçülür
+        import sqlite3
+        import time
+        slow = db_manager.MeteredQueuePool(lambda: time.sleep(0.3) or sqlite3.connect(":memory:"),
+                                           pool_size=1, max_overflow=0, timeout=1)
+        slow.connect().close()
+        self.assertEqual(slow.stats["checkouts"], 1)
+        self.assertLess(slow.stats["wait_seconds_max"], 0.1)
+        slow.dispose()
+
+    def test_compact_frame_dtypes_and_master_fill(self):
+        """Tekrarlı metinler categorical, Year int16, ölçümler float32 olmalı; NaN doldurma categorical'da patlamamalı."""
+        df = pd.DataFrame({
+            "Entity": ["Turkey", "Turkey", "China", "China"], "Code": ["TUR", "TUR", None, None],
+            "Year": [2000, 2001, 2000, 2001], "Renewables": [25.5, None, 1e-3, 1e40]
+        })
+        compact = compact_frame(df)
+        self.assertEqual(str(compact["Entity"].dtype), "category")
+        self.assertEqual(str(compact["Code"].dtype), "category")
+        self.assertEqual(compact["Year"].dtype, "int16")
+        # 1e40 float32'ye sığmaz: kolon float64 kalmalı
+        self.assertEqual(compact["Renewables"].dtype, "float64")
+        self.assertEqual(compact_frame(df.iloc[:3])["Renewables"].dtype, "float32")
+
+        master = compact_frame(df.assign(Renewables=[25.5, None, 1.0, 2.0], **{"Per capita emissions": [4.0, None, None, 7.0]})
+                               .rename(columns={"Renewables": "Total_Gen"}))
+        _, _, _, supp, _ = assemble_datasets({"energy_master": master})
+        self.assertEqual(supp["Total_Gen"].isna().sum(), 0)
+        # Bilinmeyen emisyon 0.0'a çevrilmemeli (korelasyon ve modeller sahte sıfır görür)
+        self.assertEqual(supp["Per capita emissions"].isna().sum(), 2)
+        self.assertEqual(str(supp["Entity"].dtype), "category")
+        self.assertEqual(len(supp[supp["Entity"] == "Turkey"]), 2)
+
+    def test_energy_master_frame_shares_and_missing_emissions(self):
+        """Üretim NaN'ları 0 sayılmalı, paylar toplamdan hesaplanmalı; CO2'si olmayan satır silinmeden NaN emisyonla kalmalı."""
+        fossil = pd.DataFrame({
+            "Entity": ["Turkey", "Turkey", "Atlantis"], "Code": ["TUR", "TUR", None], "Year": [2001, 2000, 2000],
+            "Fossil_fuels": [60.0, 75.0, 0.0], "Nuclear": [None, 0.0, 0.0], "Renewables": [40.0, 25.0, 0.0]
+        })
+        co2 = pd.DataFrame({"Entity": ["Turkey"], "Year": [2000], "Per_capita_emissions": [4.2]})
+        share = pd.DataFrame({"Entity": ["Turkey", "Turkey"], "Year": [2000, 2001], "Renewables": [24.0, 39.0]})
+
+        master = build_energy_master_frame(fossil, co2, share)
+
+        self.assertEqual(master.columns.tolist(), MASTER_COLUMNS)
+        self.assertEqual(list(zip(master["Entity"], master["Year"])), [("Atlantis", 2000), ("Turkey", 2000), ("Turkey", 2001)])
+        turkey_2001 = master.iloc[2]
+        self.assertEqual(turkey_2001["Nuclear"], 0.0)
+        self.assertEqual(turkey_2001["Total_Gen"], 100.0)
+        self.assertAlmostEqual(turkey_2001["Share_Fossil"] + turkey_2001["Share_Renewables"] + turkey_2001["Share_Nuclear"], 100.0)
+        self.assertEqual(turkey_2001["Renewables_Share"], 39.0)
+        self.assertTrue(pd.isna(turkey_2001["Per_capita_emissions"]))
+        self.assertEqual(master.iloc[1]["Per_capita_emissions"], 4.2)
+        # Üretimi sıfır olan ülkede sıfıra bölme yok: Total_Gen 1.0, paylar 0
+        self.assertEqual(master.iloc[0]["Total_Gen"], 1.0)
+        self.assertEqual(master.iloc[0]["Share_Fossil"], 0.0)
+
+    def test_entity_index_slices_without_scanning(self):
+        """Ülke dilimi Year sıralı gelmeli; zaten sıralı frame kopyalanmamalı, dilim görünüm olmalı."""
+        df = compact_frame(pd.DataFrame({
+            "Entity": ["Turkey", "China", "Turkey", "China", "Brazil"], "Year": [2001, 2000, 2000, 2001, 2000],
+            "Renewables": [2.0, 3.0, 1.0, 4.0, 5.0]
+        }))
+        indeks = build_entity_index(df)
+        self.assertEqual(slice_entity(indeks, "Turkey")["Year"].tolist(), [2000, 2001])
+        self.assertEqual(slice_entity(indeks, "China")["Renewables"].tolist(), [3.0, 4.0])
+        self.assertTrue(slice_entity(indeks, "Atlantis").empty)
+
+        sirali = indeks[0]
+        self.assertIs(build_entity_index(sirali)[0], sirali)
+        dilim = slice_entity(indeks, "Turkey")
+        self.assertTrue(np.shares_memory(dilim["Renewables"].to_numpy(), sirali["Renewables"].to_numpy()))
+
+    def test_registry_loads_lazily_and_invalidates_per_table(self):
+        """Kayıt sadece istenen tabloyu okumalı; sürümü değişen tablo tek başına yeniden okunmalı."""
+        from unittest import mock
+        versions = {"energy_master": 1, "share_electricity_renewables": 1}
+        loads = []
+
+        def fake_load(engine, tablolar, surumler):
+            loads.append(list(tablolar))
+            return {t: pd.DataFrame({"Entity": ["Turkey"], "Year": [2020], "Total_Gen": [1.0]}) for t in tablolar}
+
+        with mock.patch("utils.list_gold_tables", return_value=list(versions)), \
+                mock.patch("utils.fetch_table_versions", side_effect=lambda engine: dict(versions)), \
+                mock.patch("utils.load_gold_tables", side_effect=fake_load):
+            registry = GoldRegistry(engine_factory=lambda: object(), check_seconds=0)
+            self.assertEqual(len(registry.master()), 1)
+            registry.master()
+            self.assertEqual(loads, [["energy_master"]])
+
+            registry.role("share")
+            versions["share_electricity_renewables"] = 2
+            registry.master()
+            registry.role("share")
+            self.assertEqual(loads, [["energy_master"], ["share_electricity_renewables"], ["share_electricity_renewables"]])
+
+    def test_registry_reuses_master_and_evicts_only_dependents(self):
+        """Doldurulmuş energy_master ikinci kez kopyalanmamalı; atılan girdi sadece kendisinden kurulanları düşürmeli."""
+        from unittest import mock
+        share = "share_electricity_renewables"
+        master = pd.DataFrame({"Entity": ["Turkey", "China"], "Year": [2020, 2020], "Total_Gen": [1.0, 2.0],
+                               "Per capita emissions": [4.0, None], "Share_Fossil": [50.0, 60.0],
+                               "Share_Nuclear": [0.0, 5.0], "Share_Renewables": [50.0, 35.0]})
+        frames = {"energy_master": master, share: pd.DataFrame({"Entity": ["Turkey"], "Year": [2020], "Renewables": [42.0]})}
+
+        with mock.patch("utils.list_gold_tables", return_value=list(frames)), \
+                mock.patch("utils.fetch_table_versions", return_value={t: 1 for t in frames}), \
+                mock.patch("utils.load_gold_tables", side_effect=lambda engine, tablolar, surumler: {t: frames[t] for t in tablolar}), \
+                mock.patch("utils.query_table", return_value=pd.DataFrame({"Entity": ["Turkey"]})):
+            registry = GoldRegistry(engine_factory=lambda: object(), check_seconds=3600)
+            self.assertIs(registry.master(), registry.get("energy_master"))
+            registry.entity_index("energy_master")
+            registry.entity_index(share)
+            registry.entities()
+
+            def evict(key):
+                registry._cache.pop(key)
+                registry._evicted(key)
+
+            evict(("table", share))
+            evict(("derived", ("entities", 1)))
+            self.assertIn(("derived", ("index", "energy_master")), registry._cache)
+            self.assertNotIn(("derived", ("index", share)), registry._cache)
+            evict(("table", "energy_master"))
+            self.assertNotIn(("derived", ("index", "energy_master")), registry._cache)
+
+    def test_registry_entity_list_follows_master_version(self):
+        """energy_master hiç yüklenmemişken de yeni master sürümü sidebar'ın ülke listesini yenilemeli."""
+        from unittest import mock
+        versions = {"energy_master": 1}
+        entities = [pd.DataFrame({"Entity": ["Turkey"]}), pd.DataFrame({"Entity": ["Turkey", "Chile"]})]
+
+        with mock.patch("utils.list_gold_tables", return_value=["energy_master"]), \
+                mock.patch("utils.fetch_table_versions", side_effect=lambda engine: dict(versions)), \
+                mock.patch("utils.load_gold_tables") as load, \
+                mock.patch("utils.query_table", side_effect=entities) as query:
+            registry = GoldRegistry(engine_factory=lambda: object(), check_seconds=0)
+            self.assertEqual(registry.entities(), ["Turkey"])
+            self.assertEqual(registry.entities(), ["Turkey"])
+            versions["energy_master"] = 2
+            self.assertEqual(registry.entities(), ["Chile", "Turkey"])
+
+        self.assertEqual(query.call_count, 2)
+        self.assertFalse(load.called)
+        self.assertEqual([k for k in registry._cache.keys() if k[0] == "derived"], [("derived", ("entities", 2))])
+
+    def test_byte_lru_cache_evicts_by_size(self):
+        """Bütçe aşılınca en uzun süredir kullanılmayan girdi atılmalı; sayaçlar tutulmalı, değer kopyalanmamalı."""
+        frame = pd.DataFrame({"x": np.zeros(1000)})
+        size = frame_nbytes(frame)
+        evicted = []
+        cache = ByteLRUCache(max_bytes=size * 2, on_evict=evicted.append)
+        cache.put("a", frame)
+        cache.put("b", frame.copy())
+        self.assertIs(cache.get("a"), frame)
+        cache.put("c", frame.copy())
+
+        self.assertEqual(evicted, ["b"])
+        self.assertIsNone(cache.get("b"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"], stats["entries"]), (1, 1, 1, 2))
+        self.assertLessEqual(stats["bytes"], size * 2)
+
+    def test_compressing_reader_round_trip_and_bronze_names(self):
+        """Akan gzip sıkıştırması parça parça okunduğunda da açılabilir olmalı; uzantılar tablo adına karışmamalı."""
+        import io
+        raw = ("Entity,Code,Year,Value\n" + "".join(f"Ülke{i},C{i},{2000 + i % 25},{i * 0.5}\n" for i in range(20000))).encode()
+        reader = CompressingReader(io.BytesIO(raw), "gzip", chunk_size=4096)
+        parts = []
+        while True:
+            part = reader.read(1000)
+            if not part: break
+            parts.append(part)
+        compressed = b"".join(parts)
+        self.assertEqual(reader.bytes_out, len(compressed))
+        self.assertLess(len(compressed), len(raw))
+        self.assertEqual(decompress_bytes("bronze/veri.csv.gz", compressed), raw)
+        self.assertEqual(decompress_bytes("bronze/veri.csv", raw), raw)
+        self.assertEqual(decompress_bytes("bos.csv.gz", CompressingReader(io.BytesIO(b""), "gzip").read()), b"")
+        with self.assertRaises(ValueError):
+            check_compression("zstd")
+
+        self.assertEqual(dataset_name("bronze/share-electricity.csv.gz"), "share-electricity")
+        self.assertEqual(dataset_name("bronze/share-electricity.csv"), "share-electricity")
+        self.assertFalse(is_bronze_object("bronze/_manifest.json"))
+        self.assertEqual(bronze_glob("bronze/", "veri"), "s3a://raw-data/bronze/veri.{csv,csv.gz}")
+
+    def test_engine_choice_threshold_and_bucket_override(self):
+        """Eşik altı pandas, üstü Spark olmalı; açık seçim korunmalı, Entity kovaları açıksa her zaman Spark."""
+        from unittest import mock
+        import etl_spark_to_db
+        threshold = 256 * 1024 * 1024
+        with mock.patch.multiple(etl_spark_to_db, ETL_ENGINE_THRESHOLD_MB=256, SILVER_ENTITY_BUCKETS=0):
+            self.assertEqual(choose_engine(threshold, "auto"), "pandas")
+            self.assertEqual(choose_engine(threshold + 1, "auto"), "spark")
+            self.assertEqual(choose_engine(threshold + 1, "pandas"), "pandas")
+            self.assertEqual(choose_engine(0, "spark"), "spark")
+        with mock.patch.multiple(etl_spark_to_db, ETL_ENGINE_THRESHOLD_MB=256, SILVER_ENTITY_BUCKETS=16):
+            self.assertEqual(choose_engine(0, "auto"), "spark")
+            self.assertEqual(choose_engine(0, "pandas"), "spark")
+
+    def test_silver_delta_keeps_only_changed_rows(self):
+        """Artımlı yüklemede sadece silver'daki son halinden farklı (Entity, Year) satırları delta'ya girmeli."""
+        import pyarrow as pa
+        from pyarrow import fs
+        local_fs = fs.LocalFileSystem()
+
+        def table(rows):
+            return clean_table(pa.table({
+                "Entity": [r[0] for r in rows], "Code": [r[1] for r in rows], "Year": pa.array([r[2] for r in rows], pa.int32()),
+                "Per capita emissions (t)": [r[3] for r in rows]
+            }))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            silver_path = os.path.join(tmp, "co2.parquet")
+            write_silver_arrow(table([("Turkey", "TUR", 2000, 3.0), ("Turkey", "TUR", 2001, 3.5),
+                                      ("World", None, 2000, 4.0)]), silver_path, local_fs)
+            # Önceki artımlı çalıştırma 2001'i düzeltmiş: en son batch geçerli
+            fix = table([("Turkey", "TUR", 2001, 3.6)])
+            write_silver_arrow(fix.append_column("_batch_id", pa.array([1], pa.int64())), silver_path, local_fs,
+                               basename="part-{i}-1.parquet", overwrite=False)
+
+            # 2000 değişti, 2001 son batch'le aynı, World (boş Code) aynı, 2002 ve China yeni
+            incoming = table([("Turkey", "TUR", 2000, 3.1), ("Turkey", "TUR", 2001, 3.6), ("World", None, 2000, 4.0),
+                              ("Turkey", "TUR", 2002, 3.8), ("China", "CHN", 2000, 2.9)])
+            delta = silver_delta_arrow(incoming, silver_path, local_fs)
+
+        self.assertEqual(incoming.column_names, ["Entity", "Code", "Year", "Per_capita_emissions_t"])
+        self.assertEqual(delta.schema, incoming.schema)
+        self.assertEqual(sorted(zip(delta["Entity"].to_pylist(), delta["Year"].to_pylist())),
+                         [("China", 2000), ("Turkey", 2000), ("Turkey", 2002)])
+
+    def test_silver_layout_matches_current_partitioning(self):
+        """Artımlı ekleme sadece mevcut silver şu anki Year / Entity kovası ayarlarıyla yazılmışsa yapılmalı."""
+        from unittest import mock
+        import lake_utils
+
+        def client(*names):
+            minio = mock.Mock()
+            minio.list_objects.return_value = [mock.Mock(object_name=f"silver/t.parquet/{n}") for n in names]
+            return minio
+
+        flat = client("_SUCCESS", "part-00000.parquet")
+        by_year = client("_SUCCESS", "Year=2000/", "Year=2001/")
+        by_bucket = client("entity_bucket=0/", "entity_bucket=1/")
+        with mock.patch.multiple(lake_utils, SILVER_PARTITION_BY_YEAR=False, SILVER_ENTITY_BUCKETS=0):
+            self.assertTrue(silver_layout_matches(flat, "t"))
+            self.assertFalse(silver_layout_matches(by_year, "t"))
+        with mock.patch.multiple(lake_utils, SILVER_PARTITION_BY_YEAR=True, SILVER_ENTITY_BUCKETS=8):
+            # Year üstte, kova onun altında: üst seviyede Year= beklenir
+            self.assertTrue(silver_layout_matches(by_year, "t"))
+            self.assertFalse(silver_layout_matches(flat, "t"))
+            self.assertFalse(silver_layout_matches(by_bucket, "t"))
+        with mock.patch.multiple(lake_utils, SILVER_PARTITION_BY_YEAR=False, SILVER_ENTITY_BUCKETS=8):
+            self.assertTrue(silver_layout_matches(by_bucket, "t"))
+            self.assertFalse(silver_layout_matches(by_year, "t"))
+        self.assertEqual(flat.list_objects.call_args.kwargs["prefix"], "silver/t.parquet/")
+
+    def test_incremental_requires_matching_layout_and_columns(self):
+        """İki motorun ortak şartı: yerleşim değiştiyse ya da yeni kolon geldiyse delta değil tam yenileme yapılmalı."""
+        from unittest import mock
+        import lake_utils
+        by_year = mock.Mock()
+        by_year.list_objects.side_effect = lambda bucket, prefix: [mock.Mock(object_name=f"{prefix}Year=2000/")]
+        columns = ["Entity", "Code", "Year", "Value"]
+        silver_columns = mock.Mock(return_value=["Entity", "Code", "Year", "Value", "_batch_id"])
+
+        with mock.patch("gold_loader.gold_table_exists", return_value=True):
+            with mock.patch.multiple(lake_utils, SILVER_PARTITION_BY_YEAR=True, SILVER_ENTITY_BUCKETS=0):
+                self.assertTrue(can_run_incremental(by_year, "t", columns, silver_columns))
+                self.assertFalse(can_run_incremental(by_year, "t", columns + ["New_Column"], silver_columns))
+                self.assertFalse(can_run_incremental(by_year, "t", ["Entity", "Value"], silver_columns))
+            calls = silver_columns.call_count
+            # Year partition'ı kapatıldı: mevcut silver'a düz dosya eklenmez, kolonlara bakmaya gerek kalmaz
+            with mock.patch.multiple(lake_utils, SILVER_PARTITION_BY_YEAR=False, SILVER_ENTITY_BUCKETS=0):
+                self.assertFalse(can_run_incremental(by_year, "t", columns, silver_columns))
+            self.assertEqual(silver_columns.call_count, calls)
+        with mock.patch("gold_loader.gold_table_exists", return_value=False), \
+                mock.patch.multiple(lake_utils, SILVER_PARTITION_BY_YEAR=True, SILVER_ENTITY_BUCKETS=0):
+            self.assertFalse(can_run_incremental(by_year, "t", columns, silver_columns))
+
+    def test_partition_copy_is_idempotent_on_task_retry(self):
+        """Tekrar denenen partition görevi kendi tablosunu yeniden yaratmalı; driver partition'ları tek transaction'da toplamalı."""
+        from contextlib import contextmanager
+        from unittest import mock
+        import gold_loader
+        sessions, merged = [], []
+
+        def fake_connect(**kwargs):
+            statements = []
+            sessions.append(statements)
+            cursor = mock.MagicMock()
+            cursor.__enter__.return_value.execute.side_effect = statements.append
+            cursor.__enter__.return_value.copy_expert.side_effect = lambda sql, buffer: statements.append((sql, buffer.read()))
+            return mock.Mock(cursor=lambda: cursor, commit=lambda: statements.append("COMMIT"))
+
+        class RecordingEngine:
+            @contextmanager
+            def begin(self):
+                yield mock.Mock(execute=lambda stmt, *args: merged.append(str(stmt)))
+
+        with mock.patch("psycopg2.connect", side_effect=fake_connect):
+            for _ in range(2):
+                gold_loader._copy_rows(iter([("Turkey", 2000), ("Türkiye, Rep.", None)]), ["Entity", "Year"], "t", 3)
+            gold_loader._copy_rows(iter([]), ["Entity", "Year"], "t", 4)
+        gold_loader.merge_partition_tables(RecordingEngine(), "t", 2)
+
+        first, retry, empty = sessions
+        self.assertEqual(first, retry)
+        self.assertEqual(first[:2], ['DROP TABLE IF EXISTS staging."t__part_3"',
+                                     'CREATE TABLE staging."t__part_3" (LIKE staging."t")'])
+        self.assertEqual(first[2], ('COPY staging."t__part_3" ("Entity", "Year") FROM STDIN WITH (FORMAT csv)',
+                                    'Turkey,2000\r\n"Türkiye, Rep.",\r\n'))
+        self.assertEqual(first[-1], "COMMIT")
+        # Boş partition da tablosunu yaratır ama COPY yapmaz
+        self.assertEqual(len(empty), 3)
+        self.assertEqual(merged, ['INSERT INTO staging."t" SELECT * FROM staging."t__part_0"', 'DROP TABLE staging."t__part_0"',
+                                  'INSERT INTO staging."t" SELECT * FROM staging."t__part_1"', 'DROP TABLE staging."t__part_1"'])
+
+    def test_master_swap_recreates_views_in_same_transaction(self):
+        """energy_master swap'ı CASCADE ile düşen view'ları aynı transaction içinde, indeksleriyle yeniden kurmalı."""
+        from contextlib import contextmanager
+        from unittest import mock
+        import gold_loader
+        from gold_master import MATERIALIZED_VIEWS, view_signature
+        transactions = []
+
+        class RecordingEngine:
+            @contextmanager
+            def begin(self):
+                statements = []
+                transactions.append(statements)
+                yield mock.Mock(execute=lambda stmt, *args: statements.append(str(stmt)))
+
+        with mock.patch("gold_loader.ensure_version_table"), mock.patch("gold_loader.bump_table_version", return_value=1):
+            gold_loader.swap_staging_table(RecordingEngine(), "energy_master")
+            gold_loader.swap_staging_table(RecordingEngine(), "nasa_climate")
+
+        master_tx, other_tx = transactions
+        self.assertEqual(master_tx[:2], ['DROP TABLE IF EXISTS public."energy_master" CASCADE',
+                                         'ALTER TABLE staging."energy_master" SET SCHEMA public'])
+        for name, (select_sql, unique_columns) in MATERIALIZED_VIEWS.items():
+            self.assertIn(f"CREATE MATERIALIZED VIEW public.{name} AS {select_sql}", master_tx)
+            keys = ", ".join(f'"{c}"' for c in unique_columns)
+            self.assertIn(f"CREATE UNIQUE INDEX {name}_key ON public.{name} ({keys})", master_tx)
+            self.assertIn(f"COMMENT ON MATERIALIZED VIEW public.{name} IS '{view_signature(name)}'", master_tx)
+        # Liderlik tabloları sayfa 6 ile aynı kümeyi sıralar: küçük üreticiler ve emisyonsuz satırlar dışarıda
+        self.assertIn('WHERE "Total_Gen" > 5 AND "Per_capita_emissions" IS NOT NULL) ranked WHERE "Rank" <= 10',
+                      MATERIALIZED_VIEWS["mv_top_green_by_year"][0])
+        self.assertFalse(any("MATERIALIZED VIEW" in s for s in other_tx))
+
+    def test_nasa_cache_ttl_coalescing_and_offline(self):
+        """Yerel sahte NASA sunucusuyla: eşzamanlı istekler tek çağrıya inmeli, TTL dolunca eski veri beklemeden dönmeli."""
+        import json
+        import threading
+        import time
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        calls = []
+
+        class FakePower(BaseHTTPRequestHandler):
+            def do_GET(self):
+                calls.append(self.path)
+                time.sleep(0.2)
+                body = json.dumps({"properties": {"parameter": {
+                    "ALLSKY_SFC_SW_DWN": {"2000": 4.5, "ANN": 4.5}, "WS2M": {"2000": 3.1, "ANN": 3.1}
+                }}}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakePower)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/api/temporal/annual/point"
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                options = dict(directory=tmp, url=url, offline=False)
+                results = []
+                workers = [threading.Thread(target=lambda: results.append(get_power_parameters(39.9, 32.8, 2000, 2000, ttl=60, **options)))
+                           for _ in range(5)]
+                for w in workers: w.start()
+                for w in workers: w.join()
+                self.assertEqual(len(calls), 1)
+                self.assertEqual({status for _, status in results}, {"fetched"})
+                self.assertEqual(get_power_parameters(39.9, 32.8, 2000, 2000, ttl=60, **options)[1], "fresh")
+
+                started = time.perf_counter()
+                payload, status = get_power_parameters(39.9, 32.8, 2000, 2000, ttl=0, **options)
+                self.assertEqual(status, "stale")
+                self.assertLess(time.perf_counter() - started, 0.15)
+                self.assertEqual(payload["WS2M"]["2000"], 3.1)
+                # Arka plandaki yenileme bitene (diske yazana) kadar bekle
+                for _ in range(50):
+                    if len(calls) == 2 and not nasa_cache._inflight: break
+                    time.sleep(0.05)
+                self.assertEqual(len(calls), 2)
+
+                self.assertEqual(get_power_parameters(39.9, 32.8, 2000, 2000, ttl=0, directory=tmp, url=url, offline=True)[1], "stale")
+                self.assertEqual(get_power_parameters(10.0, 10.0, 2000, 2000, directory=tmp, url=url, offline=True), (None, "offline"))
+                self.assertEqual(len(calls), 2)
+        finally:
+            server.shutdown()
+
+    def test_nasa_prefetch_retries_transient_errors_only(self):
+        """503 üstel bekleme ile tekrar denenmeli, 422 denenmemeli; başarısız ülke diğerlerini durdurmamalı."""
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import urlparse, parse_qs
+        calls = []
+
+        class FlakyPower(BaseHTTPRequestHandler):
+            def do_GET(self):
+                lat = parse_qs(urlparse(self.path).query)["latitude"][0]
+                calls.append(lat)
+                status = {"20.0": 422, "10.0": 503 if calls.count("10.0") == 1 else 200}.get(lat, 200)
+                body = json.dumps({"properties": {"parameter": {
+                    "ALLSKY_SFC_SW_DWN": {"2000": 4.5, "2001": -999.0, "ANN": 4.5}, "WS2M": {"2000": 3.1, "2001": 3.3, "ANN": 3.2}
+                }}}).encode()
+                self.send_response(status)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyPower)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/api/temporal/annual/point"
+        coordinates = pd.DataFrame({"Entity": ["Turkey", "Flaky", "Invalid"], "Code": ["TUR", "FLK", "INV"],
+                                    "Latitude": [39.9, 10.0, 20.0], "Longitude": [32.8, 10.0, 20.0]})
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                climate, failed = prefetch_all(coordinates, 2000, 2001, concurrency=3, rate_per_sec=0, url=url,
+                                               directory=tmp, offline=False, backoff=0.01)
+                self.assertEqual(failed, ["Invalid"])
+                self.assertEqual((calls.count("10.0"), calls.count("20.0")), (2, 1))
+                self.assertEqual(sorted(climate["Entity"].unique()), ["Flaky", "Turkey"])
+                self.assertTrue(climate.loc[climate["Year"] == 2001, "NASA_Solar"].isna().all())
+
+                # İkinci çalıştırma disk önbelleğinden gelir, sadece başarısız nokta tekrar denenir
+                prefetch_all(coordinates, 2000, 2001, concurrency=3, rate_per_sec=0, url=url, directory=tmp,
+                             offline=False, backoff=0.01)
+                self.assertEqual(len(calls), 5)
+
+                # API tamamen kapalı ve önbellek süresi dolmuş: eski kayıtlar kullanılmalı, veri kaybolmamalı
+                stale, failed = prefetch_all(coordinates, 2000, 2001, concurrency=3, rate_per_sec=0,
+                                             url="http://127.0.0.1:9/kapali", directory=tmp, offline=False,
+                                             ttl=0, retries=2, backoff=0.01)
+                self.assertEqual(failed, ["Invalid"])
+                self.assertEqual(sorted(stale["Entity"].unique()), ["Flaky", "Turkey"])
+
+            # Eksik ülke varken tablo değiştirilmez, upsert edilir
+            from unittest import mock
+            import nasa_prefetch
+            with mock.patch("gold_loader.gold_table_exists", return_value=True), \
+                    mock.patch("gold_loader.upsert_gold_arrow") as upsert, mock.patch("gold_loader.load_gold_arrow") as swap:
+                nasa_prefetch.publish_climate(climate, ["Invalid"])
+                nasa_prefetch.publish_climate(climate, [])
+            self.assertEqual(upsert.call_args.args[1:], ("nasa_climate", ["Entity", "Year"]))
+            self.assertEqual(swap.call_count, 1)
+        finally:
+            server.shutdown()
+
+    def test_nasa_missing_values_and_streamlit_free_prefetch(self):
+        """Dashboard'un canlı/önbellek yolu da -999'u NaN yapmalı; nasa_prefetch streamlit'i yüklememeli."""
+        import subprocess
+        import sys
+        from unittest import mock
+        from utils import fetch_nasa_historical_trends
+        params = {"ALLSKY_SFC_SW_DWN": {"2000": 4.5, "2001": -999.0, "ANN": 4.5},
+                  "WS2M": {"2000": -999, "2001": 3.3, "ANN": 3.2}}
+        for source in ("fresh", "fetched"):
+            with mock.patch("utils.get_power_parameters", return_value=(params, source)):
+                df = fetch_nasa_historical_trends(39.9, 32.8, 2000, 2001)
+            self.assertEqual(df.attrs["source"], source)
+            self.assertEqual(df["NASA_Solar"].isna().tolist(), [False, True])
+            self.assertEqual(df["NASA_Wind"].isna().tolist(), [True, False])
+
+        loaded = subprocess.run([sys.executable, "-c", "import sys, nasa_prefetch; print('streamlit' in sys.modules)"],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(loaded.stdout.strip(), "False", loaded.stderr)
+
+    def test_parallel_training_isolates_failures(self):
+        """Süreç havuzunda eğitim: bozuk bir ülke diğer modelleri ve çalışma kaydını engellememeli."""
+        rng = np.random.default_rng(0)
+        def country_frame(n):
+            return pd.DataFrame({"Year": np.arange(2000, 2000 + n), "Fossil fuels": rng.uniform(10, 50, n),
+                                 "Nuclear": rng.uniform(0, 5, n), "Per capita emissions": rng.uniform(1, 8, n),
+                                 "Renewables": rng.uniform(5, 30, n)})
+        slices = {"A": country_frame(20), "B": country_frame(15), "Bozuk": country_frame(12).drop(columns=["Nuclear"])}
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                os.chdir(tmp)
+                os.makedirs("models")
+                ledger = RunLedger("train", backend="file", path=os.path.join(tmp, "ledger.jsonl"))
+                self.assertEqual(train_countries(ledger, slices, workers=2), 2)
+                self.assertEqual(sorted(os.listdir("models")), ["ai_vision_A.pkl", "ai_vision_B.pkl"])
+                stages = load_stage_metrics([ledger.run_id], backend="file", path=ledger.path)
+                self.assertEqual(dict(zip(stages["dataset"], stages["status"])), {"A": "OK", "B": "OK", "Bozuk": "HATA"})
+            finally:
+                os.chdir(cwd)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,6 +1,9 @@
 import os
 import sys  # Komut satırı argümanları için eklendi
+import time
 import joblib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
 from xgboost import XGBRegressor
@@ -9,18 +12,118 @@ from sklearn.linear_model import Ridge
 from sklearn.preprocessing import PolynomialFeatures
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
-from config import logger
-from utils import load_all_datasets
+from config import TRAIN_WORKERS, TRAIN_XGB_NTHREAD, logger
+from run_ledger import RunLedger
 
-def train_and_save_models(target_country=None):
+MIN_ROWS = 10
+
+def xgb_threads(workers, nthread=TRAIN_XGB_NTHREAD):
+    """Süreç başına XGBoost thread sayısı: toplamda çekirdek sayısını aşmayacak şekilde paylaştırılır."""
+    if nthread > 0:
+        return nthread
+    return max(1, (os.cpu_count() or 1) // workers)
+
+def train_country(country, df_target, nthread=1):
+    """Tek ülkenin XGBoost + 2040 projeksiyon paketini eğitip models/ altına yazar.
+    Süreç havuzunda çalışabilsin diye sadece ülkenin dilimini alır ve
+    (satır sayısı, model baytı, duvar saati sn, CPU sn) döner.
+    """
+    country_started, cpu_started = time.perf_counter(), time.process_time()
+    X = df_target[["Year", "Fossil fuels", "Nuclear", "Per capita emissions"]]
+    y = df_target["Renewables"]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Şampiyon Model: XGBoost
+    best_model = XGBRegressor(n_estimators=100, learning_rate=0.1, max_depth=5, random_state=42, n_jobs=nthread)
+    best_model.fit(X_train, y_train)
+
+    preds = best_model.predict(X_test)
+    metrics = {
+        "name": "XGBoost Regressor",
+        "r2": r2_score(y_test, preds),
+        "mse": mean_squared_error(y_test, preds),
+        "rmse": np.sqrt(mean_squared_error(y_test, preds)),
+        "mae": mean_absolute_error(y_test, preds),
+        "importance": best_model.feature_importances_.tolist()
+    }
+
+    # 2040 Projeksiyon Modeli
+    poly = PolynomialFeatures(degree=2)
+    X_poly = poly.fit_transform(df_target[['Year']])
+    poly_model = Ridge().fit(X_poly, df_target['Renewables'])
+
+    model_package = {
+        "champion_model": best_model,
+        "metrics": metrics,
+        "poly_model": poly_model,
+        "poly_transformer": poly
+    }
+    model_path = f"models/ai_vision_{country}.pkl"
+    joblib.dump(model_package, model_path)
+    return (len(df_target), os.path.getsize(model_path),
+            time.perf_counter() - country_started, time.process_time() - cpu_started)
+
+def _train_sequential(slices, nthread):
+    for country, df_target in slices.items():
+        try:
+            yield country, train_country(country, df_target, nthread), None
+        except Exception as e:
+            yield country, None, e
+
+def _train_parallel(slices, nthread, workers):
+    # spawn: XGBoost'un OpenMP thread havuzu fork sonrası güvenli değil; çocuk süreçler veritabanına hiç bağlanmaz
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {executor.submit(train_country, country, df_target, nthread): country
+                   for country, df_target in slices.items()}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+def train_countries(ledger, slices, workers=TRAIN_WORKERS):
+    """{ülke: dilim} sözlüğünü eğitir, başarılı model sayısını döner. Bir ülkenin hatası diğerlerini durdurmaz."""
+    total = len(slices)
+    workers = max(1, min(workers, total))
+    nthread = xgb_threads(workers)
+    logger.info(f" {total} ülke modeli eğitilecek ({workers} süreç x {nthread} XGBoost thread).")
+    results = _train_sequential(slices, nthread) if workers == 1 else _train_parallel(slices, nthread, workers)
+
+    started = time.perf_counter()
+    success_count = 0
+    for done, (country, result, error) in enumerate(results, start=1):
+        # İlerleme: Home'daki log panelinde ve info.log'da [tamamlanan/toplam] ve kalan süre tahmini görünür
+        eta = (time.perf_counter() - started) / done * (total - done)
+        if error is not None:
+            ledger.record("train", country, status="HATA")
+            logger.error(f"[{done}/{total}] {country} modeli eğitilemedi: {error}")
+            continue
+        rows, size, wall, cpu = result
+        ledger.record("train", country, rows_in=rows, rows_out=1, bytes_written=size,
+                      wall_seconds=wall, cpu_seconds=cpu)
+        success_count += 1
+        logger.info(f"[{done}/{total}] {country} modeli hazır. (%{done / total * 100:.0f}, kalan ~{eta:.0f} sn)")
+
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    logger.info(f" Ülke modelleri: {success_count}/{total} başarılı, {elapsed:.1f} sn ({total / elapsed:.1f} model/sn)")
+    return success_count
+
+def train_and_save_models(target_country=None, workers=TRAIN_WORKERS):
+    # utils (streamlit) sadece ana süreçte gerekir; spawn ile açılan eğitim süreçleri onu import etmez
+    from utils import get_master_frame, build_entity_index, slice_entity
     logger.info("ML Pipeline Başlatıldı (Gold Schema Sync)...")
     os.makedirs("models", exist_ok=True)
+    ledger = RunLedger("train")
     
     # Gold Katmanından veriyi çekiyoruz
-    df_co2, df_fossil, df_share, df_master = load_all_datasets()
+    with ledger.stage("load", "energy_master") as m:
+        df_master = get_master_frame()
+        m["rows_out"] = 0 if df_master is None else len(df_master)
     
     if df_master is None or df_master.empty:
         logger.error("HATA: Veritabanı boş.")
+        ledger.finish("HATA")
         return
 
     # 1. POLİTİKA SİMÜLATÖRÜ MODELİ
@@ -31,9 +134,11 @@ def train_and_save_models(target_country=None):
     df_sim = df_sim.dropna(subset=['Per capita emissions', 'Share_Renewables', 'Share_Nuclear', 'Share_Fossil'])
     
     if not df_sim.empty:
-        rf_sim_model = RandomForestRegressor(n_estimators=100, random_state=42)
-        rf_sim_model.fit(df_sim[['Share_Renewables', 'Share_Nuclear', 'Share_Fossil']], df_sim['Per capita emissions'])
-        joblib.dump(rf_sim_model, "models/policy_simulator_rf.pkl")
+        with ledger.stage("train", "policy_simulator") as m:
+            rf_sim_model = RandomForestRegressor(n_estimators=100, random_state=42)
+            rf_sim_model.fit(df_sim[['Share_Renewables', 'Share_Nuclear', 'Share_Fossil']], df_sim['Per capita emissions'])
+            joblib.dump(rf_sim_model, "models/policy_simulator_rf.pkl")
+            m.update(rows_in=len(df_sim), rows_out=1, bytes_written=os.path.getsize("models/policy_simulator_rf.pkl"))
         logger.info(" Global Simülatör Modeli güncellendi.")
 
     # 2. ÜLKE BAZLI MODELLER (PARAMETREYE GÖRE FİLTRELEME)
@@ -47,44 +152,18 @@ def train_and_save_models(target_country=None):
         entities = df_ai['Entity'].unique()
         logger.info(" Toplu eğitim başlatılıyor (Tüm Ülkeler).")
 
-    success_count = 0
+    # Ülke döngüsünde her seferinde tüm tabloyu maskelemek yerine bir kez indekslenip dilimlenir
+    ulke_indeksi = build_entity_index(df_ai)
+
+    slices = {}
     for country in entities:
-        df_target = df_ai[df_ai['Entity'] == country]
-        if len(df_target) > 10: 
-            X = df_target[["Year", "Fossil fuels", "Nuclear", "Per capita emissions"]]
-            y = df_target["Renewables"]
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            
-            # Şampiyon Model: XGBoost
-            best_model = XGBRegressor(n_estimators=100, learning_rate=0.1, max_depth=5, random_state=42)
-            best_model.fit(X_train, y_train)
-            
-            preds = best_model.predict(X_test)
-            metrics = {
-                "name": "XGBoost Regressor",
-                "r2": r2_score(y_test, preds),
-                "mse": mean_squared_error(y_test, preds),
-                "rmse": np.sqrt(mean_squared_error(y_test, preds)),
-                "mae": mean_absolute_error(y_test, preds),
-                "importance": best_model.feature_importances_.tolist()
-            }
-            
-            # 2040 Projeksiyon Modeli
-            poly = PolynomialFeatures(degree=2)
-            X_poly = poly.fit_transform(df_target[['Year']])
-            poly_model = Ridge().fit(X_poly, df_target['Renewables'])
-            
-            model_package = {
-                "champion_model": best_model,
-                "metrics": metrics,
-                "poly_model": poly_model,
-                "poly_transformer": poly
-            }
-            joblib.dump(model_package, f"models/ai_vision_{country}.pkl")
-            success_count += 1
-            logger.info(f"{country} modeli hazır.")
-            
+        df_target = slice_entity(ulke_indeksi, country)
+        if len(df_target) > MIN_ROWS:
+            slices[country] = df_target
+
+    success_count = train_countries(ledger, slices, workers)
     logger.info(f" İşlem Tamam: {success_count} model dosyası güncellendi.")
+    ledger.finish()
 
 if __name__ == "__main__":
     # Dışarıdan argüman gelip gelmediğini kontrol et (sys.argv)
@@ -1,20 +1,18 @@
 import pandas as pd
-import requests
 import streamlit as st
 import numpy as np
 import os
-from sqlalchemy import create_engine
-from config import logger, DB_USER, DB_PASS, DB_HOST, DB_NAME
-
-# 1. Veritabanı Bağlantı Motoru
-@st.cache_resource
-def get_db_engine():
-    try:
-        engine = create_engine(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:5432/{DB_NAME}")
-        return engine
-    except Exception as e:
-        logger.error(f"Veritabanına bağlanamadım abi, hata şu: {e}")
-        return None
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import (logger, SNAPSHOT_ENABLED, DATA_VERSION_CHECK_SECONDS, GOLD_READ_METHOD, GOLD_READ_WORKERS,
+                    DATASET_CACHE_MAX_MB)
+from data_version import fetch_table_versions
+from snapshot_cache import read_snapshot, write_snapshot
+from dataset_cache import ByteLRUCache, frame_nbytes
+from nasa_cache import get_power_parameters, nasa_params_to_frame, load_coordinate_table, CLIMATE_TABLE
+# 1. Veritabanı Bağlantı Motoru: süreç genelinde tek havuz (db_manager), tüm oturumlar paylaşır
+from db_manager import query_table, get_db_engine, read_table_copy, quote_ident
 
 # Sayfalar ve ML Modeli patlamasın diye kolonları hazırlayan fonksiyon
 def fix_columns(df):
@@ -57,79 +55,365 @@ def fix_columns(df):
 
     return df
 
+# Bellekte kompakt şema: tekrar eden metinler (Entity, Code) categorical, tam sayılar (Year) en küçük
+# int tipi, ölçümler float32'ye sığıyorsa float32. Her Streamlit süreci bu tabloların birkaçını tutar.
+KATEGORI_ORANI = 0.5
+
+def compact_frame(df):
+    if df is None or df.empty: return df
+    df = df.copy()
+    for kolon in df.columns:
+        seri = df[kolon]
+        if pd.api.types.is_object_dtype(seri) or pd.api.types.is_string_dtype(seri):
+            if seri.nunique(dropna=True) <= len(seri) * KATEGORI_ORANI:
+                df[kolon] = seri.astype('category')
+        elif pd.api.types.is_integer_dtype(seri):
+            df[kolon] = pd.to_numeric(seri, downcast='integer')
+        elif pd.api.types.is_float_dtype(seri) and seri.dtype != np.float32:
+            degerler = seri.to_numpy()
+            # float32'ye inince değer bozuluyorsa (taşma, çok küçük/hassas sayılar) float64 kalır
+            with np.errstate(over='ignore'):
+                kucuk = degerler.astype(np.float32)
+            if np.allclose(degerler, kucuk, rtol=1e-6, atol=0, equal_nan=True):
+                df[kolon] = seri.astype(np.float32)
+    return df
+
+def frame_memory_mb(frames):
+    return sum(df.memory_usage(deep=True).sum() for df in frames.values() if df is not None) / 1024 / 1024
+
+# Gold energy_master kolonları (Postgres'e uygun adlar) -> sayfaların kullandığı adlar
+MASTER_COLUMN_MAP = {"Fossil_fuels": "Fossil fuels", "Per_capita_emissions": "Per capita emissions"}
+
 # 2. %100 DİNAMİK VERİ YÜKLEME VE BİRLEŞTİRME MOTORU
-@st.cache_data
-def load_all_datasets():
-    logger.info("Verileri veritabanından dinamik olarak çekmeye başlıyorum...")
-    engine = get_db_engine()
+# Eski statik ETL'den kalan, artık okunmayan tablolar
+eski_copler = ['energy_fossil', 'energy_co2', 'energy_share', 'energy_production']
+
+def list_gold_tables(engine):
+    sorgu = "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'"
+    tum_tablolar = pd.read_sql(sorgu, engine)['table_name'].tolist()
+    return [t for t in tum_tablolar if t not in eski_copler]
+
+def read_gold_table(engine, tablo, method=GOLD_READ_METHOD):
+    """Tek gold tablosu: dinamik tablolar fix_columns'tan geçer, energy_master sadece sayfa kolon adlarına çevrilir."""
+    if method == "copy":
+        df = read_table_copy(tablo, engine)
+    else:
+        df = pd.read_sql(f"SELECT * FROM {quote_ident(tablo)}", engine)
+    if tablo == 'energy_master':
+        # Sayfaların df_master'ı olarak burada bir kez doldurulur; kayıt ikinci bir kopya kurmaz
+        return fill_master(df.rename(columns=MASTER_COLUMN_MAP))
+    return fix_columns(df)
+
+def read_gold_frames(engine, tablolar, method=GOLD_READ_METHOD, workers=GOLD_READ_WORKERS):
+    """Tabloları küçük bir thread havuzunda, her biri havuzdan kendi bağlantısıyla eşzamanlı okur."""
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(tablolar)))) as pool:
+        okunan = pool.map(lambda tablo: read_gold_table(engine, tablo, method), tablolar)
+        return dict(zip(tablolar, okunan))
+
+def load_gold_tables(engine, tablolar, versions):
+    """Sürümü snapshot'takiyle aynı olan tablolar diskten, kalanlar Postgres'ten okunur."""
+    cached = read_snapshot({t: versions.get(t) for t in tablolar}) if SNAPSHOT_ENABLED else {}
+    missing = [t for t in tablolar if t not in cached]
+    fresh = read_gold_frames(engine, missing) if missing else {}
+    if fresh:
+        once = frame_memory_mb(fresh)
+        fresh = {t: compact_frame(df) for t, df in fresh.items()}
+        logger.info(f"Kompakt şema: {', '.join(fresh)} bellekte {once:.1f} MB -> {frame_memory_mb(fresh):.1f} MB")
+    # Eski (kompakt olmayan) snapshot dosyaları için; zaten kompaktsa tip değişmez
+    cached = {t: compact_frame(df) for t, df in cached.items()}
+    if SNAPSHOT_ENABLED:
+        write_snapshot(fresh, versions)
+    if cached:
+        logger.info(f"Snapshot'tan okunan tablolar: {', '.join(cached)} | Postgres'ten: {', '.join(missing) or '-'}")
+    return {t: cached[t] if t in cached else fresh[t] for t in tablolar}
+
+# Sayfaların (özellikle 6. sayfa) master'da aradığı kolonlar
+MASTER_ZORUNLU_KOLONLAR = ['Per capita emissions', 'Share_Fossil', 'Share_Nuclear', 'Share_Renewables']
+
+def _master_doldurulacak(df):
+    # Emisyon bilinmiyorsa NaN kalır: sahte 0.0 korelasyonu ve model eğitimini bozar
+    return df.select_dtypes('number').columns.drop('Per capita emissions', errors='ignore')
+
+def fill_master(df):
+    """Eksik zorunlu kolonları ekler, emisyon dışındaki sayısal NaN'ları 0 ile doldurur (yerinde)."""
+    for kol in MASTER_ZORUNLU_KOLONLAR:
+        if kol not in df.columns:
+            df[kol] = np.nan if kol == 'Per capita emissions' else 0.0
+    # (categorical Entity/Code'a 0.0 yazılamaz; sadece sayısal kolonlar doldurulur)
+    sayisal = _master_doldurulacak(df)
+    df[sayisal] = df[sayisal].fillna(0.0)
+    return df
+
+def master_is_filled(df):
+    """Frame fill_master'dan geçmiş gibiyse (kolonlar tam, boşluk yok) True."""
+    return (all(kol in df.columns for kol in MASTER_ZORUNLU_KOLONLAR)
+            and not df[_master_doldurulacak(df)].isna().any().any())
+
+def assemble_datasets(frames):
+    """Tablo sözlüğünden sayfaların beklediği (co2, fossil, share, master) dörtlüsünü kurar."""
+    df_co2, df_fossil, df_share, df_supp = None, None, None, None
+    tum_veriler_sozlugu = {tablo: df for tablo, df in frames.items() if tablo != 'energy_master'}
+
+    for tablo, df in tum_veriler_sozlugu.items():
+        if 'co2' in tablo and df_co2 is None:
+            df_co2 = df
+        elif 'fossil' in tablo and df_fossil is None:
+            df_fossil = df
+        elif 'share' in tablo and df_share is None:
+            df_share = df
+
+    #  GOLDEN RECORD: ETL'in ürettiği conformed energy_master hazır okunur (merge/pay hesabı yok)
+    if 'energy_master' in frames:
+        df_supp = frames['energy_master'].copy()
+    elif df_fossil is not None and not df_fossil.empty:
+        df_supp = df_fossil.copy()
+    else:
+        # Fosil bile yoksa sistemi ayakta tutacak boş bir tablo yaratıyoruz
+        df_supp = pd.DataFrame(columns=['Entity', 'Year'])
+
+    # CO2 verisini birleştiriyoruz (sadece energy_master henüz üretilmemişse)
+    if 'energy_master' not in frames and df_co2 is not None and not df_co2.empty and 'Per capita emissions' in df_co2.columns:
+        if 'Per capita emissions' in df_supp.columns:
+            df_supp = df_supp.drop(columns=['Per capita emissions'])
+        
+        co2_subset = df_co2[['Entity', 'Year', 'Per capita emissions']]
+        df_supp = pd.merge(df_supp, co2_subset, on=['Entity', 'Year'], how='left')
     
-    if engine is None:
-        st.error("Veritabanı bağlantısı koptu!")
-        st.stop()
+    # MUTLAK ZIRH (Gümrük Kontrolü): Ne olursa olsun 6. Sayfa'nın aradığı kolonlar df_supp içinde OLACAK!
+    # Merge sonrası oluşan 'NaN' boşluklarını sıfırla dolduruyoruz ki matematiksel işlemler çökmesin
+    df_supp = fill_master(df_supp)
 
-    try:
-        sorgu = "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'"
-        tum_tablolar = pd.read_sql(sorgu, engine)['table_name'].tolist()
+    return df_co2, df_fossil, df_share, compact_frame(df_supp), tum_veriler_sozlugu
 
-        eski_copler = ['energy_master', 'energy_fossil', 'energy_co2', 'energy_share', 'energy_production']
-        gecerli_tablolar = [t for t in tum_tablolar if t not in eski_copler]
+# 3. ÜLKE İNDEKSİ: her veri sürümünde tablo başına bir kez (Entity, Year) sıralı frame + ülke başına
+# [başlangıç, bitiş) satır aralığı kurulur. Ülke değiştirmek tüm tabloyu taramaz, iloc dilimi kopya üretmez.
+def build_entity_index(df):
+    """(Entity, Year) sıralı frame ve {ülke: (başlangıç, bitiş)} döner; frame zaten sıralıysa kopyalanmaz."""
+    if df is None or df.empty or 'Entity' not in df.columns:
+        return df, {}
+    kodlar, ulkeler = pd.factorize(df['Entity'], sort=True)
+    yillar = df['Year'].to_numpy() if 'Year' in df.columns else np.zeros(len(df))
+    sira = np.lexsort((yillar, kodlar))
+    if not np.array_equal(sira, np.arange(len(df))):
+        df = df.iloc[sira].reset_index(drop=True)
+        kodlar = kodlar[sira]
+    sinirlar = np.searchsorted(kodlar, np.arange(len(ulkeler) + 1))
+    return df, {ulke: (int(sinirlar[i]), int(sinirlar[i + 1])) for i, ulke in enumerate(ulkeler)}
 
-        df_co2, df_fossil, df_share, df_supp = None, None, None, None
-        tum_veriler_sozlugu = {}
+def slice_entity(indeks, entity):
+    df, araliklar = indeks
+    baslangic, bitis = araliklar.get(entity, (0, 0))
+    return df.iloc[baslangic:bitis]
 
-        for tablo in gecerli_tablolar:
-            df = pd.read_sql(f"SELECT * FROM {tablo}", engine)
-            df = fix_columns(df) 
-            tum_veriler_sozlugu[tablo] = df 
-            
-            if 'co2' in tablo and df_co2 is None:
-                df_co2 = df
-            elif 'fossil' in tablo and df_fossil is None:
-                df_fossil = df
-            elif 'share' in tablo and df_share is None:
-                df_share = df
-
-        #  GOLDEN RECORD: Master Tablo Yaratımı (df_supp)
-        if df_fossil is not None and not df_fossil.empty:
-            df_supp = df_fossil.copy()
+def get_country_slice(table, entity):
+    """Ülkenin satırları (Year sıralı). table: 'energy_master' (sayfaların df_master'ı) ya da dinamik gold tablosu."""
+    return _registry_call(lambda: slice_entity(gold_registry.entity_index(table), entity), pd.DataFrame())
+
+# Süreç genelinde paylaşılan tembel gold kaydı: tablo listesi bir kez okunur, her tablo ilk
+# istendiğinde okunup dönüştürülür ve sürümü değişince sadece o tablo düşürülür
+ROL_ANAHTARLARI = ("co2", "fossil", "share")
+BOS_KOLONLAR = {
+    "co2": ['Entity', 'Year', 'Per capita emissions'],
+    "fossil": ['Entity', 'Year', 'Fossil fuels', 'Nuclear', 'Total_Gen', 'Share_Fossil', 'Share_Renewables', 'Share_Nuclear'],
+    "share": ['Entity', 'Year', 'Renewables']
+}
+
+class GoldRegistry:
+    """Gold tablolarının tembel, tablo bazında önbellekli ve geçersiz kılınabilir kaydı.
+
+    Tablolar ve türetilmiş frame'ler (master, ülke indeksleri) süreç genelindeki bayt bütçeli
+    LRU önbellekte tek kopya tutulur; oturumlar aynı nesnelere referans alır. Türetilmiş girdiler
+    bir tablo geçersiz kılınınca (yeni sürüm) ya da kurulduğu kaynak önbellekten atılınca düşürülür.
+    """
+
+    def __init__(self, engine_factory=get_db_engine, check_seconds=DATA_VERSION_CHECK_SECONDS,
+                 max_bytes=DATASET_CACHE_MAX_MB * 1024 * 1024):
+        self._engine_factory = engine_factory
+        self._check_seconds = check_seconds
+        self._tables = None
+        self._cache = ByteLRUCache(max_bytes, on_evict=self._evicted)
+        self._frame_versions = {}
+        self._derived_sources = {}
+        self._versions = {}
+        self._generation = 0
+        self._checked_at = None
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def engine(self):
+        engine = self._engine_factory()
+        if engine is None:
+            raise ConnectionError("Veritabanı bağlantısı koptu!")
+        return engine
+
+    def _evicted(self, key):
+        with self._lock:
+            if key[0] == "table":
+                self._frame_versions.pop(key[1], None)
+            else:
+                self._derived_sources.pop(key[1], None)
+            # Türetilmiş girdiler kaynak frame'i referansla tutar; kaynak atıldıysa onu bellekte bırakmasın.
+            # Sadece atılan girdiden kurulanlar düşer (ve onlardan kurulanlar, zincirleme)
+            for derived, sources in list(self._derived_sources.items()):
+                if key in sources:
+                    self._cache.pop(("derived", derived))
+                    self._evicted(("derived", derived))
+
+    def _cached_tables(self):
+        return [key[1] for key in self._cache.keys() if key[0] == "table"]
+
+    def refresh(self, force=False):
+        """En fazla check_seconds'ta bir sürümlere bakar; sürümü değişen tabloları düşürür, düşenleri döner."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self._check_seconds:
+                return []
+            versions = fetch_table_versions(self.engine)
+            stale = [t for t in self._cached_tables() if versions.get(t) != self._frame_versions.get(t)]
+            for table in stale:
+                self.invalidate(table)
+            # ETL yeni bir tablo yayınladıysa liste bir sonraki erişimde yeniden okunur
+            if self._tables is not None and any(t not in self._tables and t not in eski_copler for t in versions):
+                self._tables = None
+            self._versions = versions
+            self._checked_at = now
+        if stale:
+            logger.info(f"Sürümü değişen gold tabloları düşürüldü: {', '.join(stale)}")
+        return stale
+
+    def tables(self):
+        with self._lock:
+            if self._tables is None:
+                self._tables = sorted(list_gold_tables(self.engine))
+            return list(self._tables)
+
+    def table_for_role(self, role):
+        """'co2' / 'fossil' / 'share' rolündeki ilk dinamik tablonun adı (yoksa None)."""
+        return next((t for t in self.tables() if role in t and t != 'energy_master'), None)
+
+    def get_many(self, tablolar):
+        """İstenen tablolardan önbellekte olmayanları tek seferde (paralel) okur."""
+        self.refresh()
+        found = {}
+        for table in tablolar:
+            df = self._cache.get(("table", table))
+            if df is not None:
+                found[table] = df
+        missing = [t for t in tablolar if t not in found]
+        if not missing:
+            return found
+        with self._load_lock:
+            # Başka bir oturum aynı tabloyu az önce yüklemiş olabilir
+            for table in missing:
+                if ("table", table) in self._cache:
+                    found[table] = self._cache.get(("table", table))
+            missing = [t for t in tablolar if t not in found]
+            if missing:
+                with self._lock:
+                    versions = dict(self._versions)
+                logger.info(f"Gold tabloları yükleniyor: {', '.join(missing)}")
+                loaded = load_gold_tables(self.engine, missing, versions)
+                with self._lock:
+                    for table, df in loaded.items():
+                        self._frame_versions[table] = versions.get(table)
+                        self._cache.put(("table", table), df)
+                found.update(loaded)
+        return {t: found[t] for t in tablolar}
+
+    def get(self, table):
+        return self.get_many([table])[table]
+
+    def role(self, role):
+        table = self.table_for_role(role)
+        return self.get(table) if table else pd.DataFrame(columns=BOS_KOLONLAR[role])
+
+    def _drop_derived(self):
+        for key in self._cache.keys():
+            if key[0] == "derived":
+                self._cache.pop(key)
+        self._derived_sources.clear()
+        self._generation += 1
+
+    def _derive(self, key, build, nbytes=None, sources=()):
+        # build kilit dışında çalışır (tablo yükleyebilir); arada bir tablo geçersiz kılındıysa sonuç saklanmaz
+        with self._lock:
+            value = self._cache.get(("derived", key))
+            if value is not None:
+                return value
+            generation = self._generation
+        value = build()
+        with self._lock:
+            if generation == self._generation:
+                self._derived_sources[key] = tuple(sources)
+                self._cache.put(("derived", key), value, nbytes(value) if nbytes else None)
+        return value
+
+    def _master_sources(self):
+        if 'energy_master' in self.tables():
+            return ['energy_master']
+        return [t for t in (self.table_for_role('fossil'), self.table_for_role('co2')) if t]
+
+    def master(self):
+        """Sayfaların df_master'ı: energy_master (yoksa fossil + co2'den) doldurulmuş ve kompakt."""
+        tablolar = self._master_sources()
+        frames = self.get_many(tablolar)
+        if tablolar == ['energy_master'] and master_is_filled(frames['energy_master']):
+            # Okunurken zaten dolduruldu: önbellekteki tablo aynen kullanılır, bütçede ikinci kopya tutulmaz
+            return frames['energy_master']
+        return self._derive("master", lambda: assemble_datasets(frames)[3],
+                            sources=[("table", t) for t in tablolar])
+
+    def entity_index(self, table):
+        if table == 'energy_master':
+            df = self.master()
+            sources = [("table", t) for t in self._master_sources()] + [("derived", "master")]
         else:
-            # Fosil bile yoksa sistemi ayakta tutacak boş bir tablo yaratıyoruz
-            df_supp = pd.DataFrame(columns=['Entity', 'Year'])
+            df, sources = self.get(table), [("table", table)]
+        # Frame zaten sıralıysa indeks aynı nesneyi tutar; o durumda sadece aralık sözlüğü sayılır
+        return self._derive(("index", table), lambda: build_entity_index(df), sources=sources,
+                            nbytes=lambda indeks: (0 if indeks[0] is df else frame_nbytes(indeks[0])) + frame_nbytes(indeks[1]))
 
-        # CO2 verisini birleştiriyoruz
-        if df_co2 is not None and not df_co2.empty and 'Per capita emissions' in df_co2.columns:
-            if 'Per capita emissions' in df_supp.columns:
-                df_supp = df_supp.drop(columns=['Per capita emissions'])
-            
-            co2_subset = df_co2[['Entity', 'Year', 'Per capita emissions']]
-            df_supp = pd.merge(df_supp, co2_subset, on=['Entity', 'Year'], how='left')
-        
-        # MUTLAK ZIRH (Gümrük Kontrolü): Ne olursa olsun bu kolonlar df_supp içinde OLACAK!
-        # 6. Sayfa (Veri Keşfi) bu 4 kolonu arıyor, yoksalar anında yaratıyoruz.
-        eksik_olmamasi_gerekenler = ['Per capita emissions', 'Share_Fossil', 'Share_Nuclear', 'Share_Renewables']
-        for kol in eksik_olmamasi_gerekenler:
-            if kol not in df_supp.columns:
-                df_supp[kol] = 0.0
-        
-        # Merge sonrası oluşan 'NaN' boşluklarını sıfırla dolduruyoruz ki matematiksel işlemler çökmesin
-        df_supp.fillna(0.0, inplace=True)
+    def entities(self):
+        """Sidebar için ülke listesi; frame yüklemeden küçük mv_entity_record_counts view'ından okunur."""
+        def build():
+            try:
+                return sorted(query_table('mv_entity_record_counts', engine=self.engine, columns=['Entity'])['Entity'].dropna())
+            except Exception:
+                return sorted(self.master()['Entity'].dropna().unique())
+        self.refresh()
+        # Liste master'ın sürümüne bağlanır: energy_master önbellekte olmasa (ya da atılmış olsa) da
+        # yeni sürüm listeyi yeniler; eski sürümün listesi düşürülür
+        with self._lock:
+            version = self._versions.get('energy_master')
+            for key in self._cache.keys():
+                if key[0] == "derived" and isinstance(key[1], tuple) and key[1][0] == "entities" and key[1][1] != version:
+                    self._cache.pop(key)
+        return self._derive(("entities", version), build)
 
-        try:
-            from streamlit import runtime
-            if runtime.exists():
-                st.session_state['all_dynamic_datasets'] = tum_veriler_sozlugu
-        except Exception:
-            pass
+    def loaded_frames(self):
+        return {key[1]: self._cache.get(key) for key in self._cache.keys() if key[0] == "table"}
 
-        logger.info("Abi Master tabloyu başarıyla birleştirdim ve gümrükten hatasız geçirdim.")
-        
-        return (
-            df_co2 if df_co2 is not None else pd.DataFrame(columns=['Entity', 'Year', 'Per capita emissions']),
-            df_fossil if df_fossil is not None else pd.DataFrame(columns=['Entity', 'Year', 'Fossil fuels', 'Nuclear', 'Total_Gen', 'Share_Fossil', 'Share_Renewables', 'Share_Nuclear']),
-            df_share if df_share is not None else pd.DataFrame(columns=['Entity', 'Year', 'Renewables']),
-            df_supp
-        )
+    def cache_stats(self):
+        return self._cache.stats()
+
+    def invalidate(self, table=None):
+        """Tek tabloyu (ya da None ile tüm kaydı) düşürür; türetilmiş master/indeksler yeniden kurulur."""
+        with self._lock:
+            if table is None:
+                self._cache.clear()
+                self._frame_versions, self._tables, self._checked_at = {}, None, None
+            else:
+                self._cache.pop(("table", table))
+                self._frame_versions.pop(table, None)
+            self._drop_derived()
+
+gold_registry = GoldRegistry()
 
+def _registry_call(fn, bos):
+    """Kayıt erişimindeki DB hatasını sayfada gösterip durdurur; Streamlit dışında boş sonuç döner."""
+    try:
+        return fn()
     except Exception as e:
         logger.error(f"HATA: Dinamik okuma sırasında patladı! {e}")
         try:
@@ -137,24 +421,62 @@ def load_all_datasets():
             st.stop()
         except:
             print(f"Veritabanından veri çekilemedi: {e}")
-            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        return bos
+
+def get_master_frame():
+    return _registry_call(gold_registry.master, pd.DataFrame())
+
+def get_role_frame(role):
+    return _registry_call(lambda: gold_registry.role(role), pd.DataFrame(columns=BOS_KOLONLAR[role]))
+
+def get_entity_list():
+    return _registry_call(gold_registry.entities, [])
+
+def load_all_datasets():
+    """Eski dörtlü API (co2, fossil, share, master): tabloları kayıttan ister; sadece dördünü yükler."""
+    def dortlu():
+        tablolar = [t for t in (gold_registry.table_for_role(r) for r in ROL_ANAHTARLARI) if t]
+        gold_registry.get_many(tablolar + (['energy_master'] if 'energy_master' in gold_registry.tables() else []))
+        return tuple(gold_registry.role(r) for r in ROL_ANAHTARLARI) + (gold_registry.master(),)
+
+    # Oturuma kopya/sözlük konmaz: tüm oturumlar gold_registry'deki aynı frame'lere referans alır
+    return _registry_call(dortlu, (pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()))
+
+# Sayfalar için pushdown: sadece çizilecek satırlar Postgres'ten istenir
+GOLD_MASTER_COLUMNS = {v: k for k, v in MASTER_COLUMN_MAP.items()}
+
+def _to_gold(column):
+    return GOLD_MASTER_COLUMNS.get(column, column)
+
+@st.cache_data(ttl=DATA_VERSION_CHECK_SECONDS, show_spinner=False)
+def query_gold(table, columns=None, entities=None, year_range=None, order_by=None, limit=None, group_by=None, aggregates=None,
+               not_null=None):
+    """energy_master ya da ondan türeyen view'lara filtre/projeksiyon/agregasyon sorgusu
+    (db_manager.query_table). Kolonlar sayfalardaki adlarla verilir ('Fossil fuels' gibi) ve aynı adlarla döner.
+    """
+    df = query_table(
+        table, engine=get_db_engine(),
+        columns=[_to_gold(c) for c in columns] if columns else None,
+        entities=entities, year_range=year_range, limit=limit,
+        order_by=[_to_gold(s) if isinstance(s, str) else (_to_gold(s[0]), s[1]) for s in order_by] if order_by else None,
+        group_by=[_to_gold(c) for c in group_by] if group_by else None,
+        aggregates={a: (f, _to_gold(c)) for a, (f, c) in aggregates.items()} if aggregates else None,
+        not_null=[_to_gold(c) for c in not_null] if not_null else None
+    )
+    return df.rename(columns=MASTER_COLUMN_MAP)
+
+def query_master(**options):
+    return query_gold("energy_master", **options)
 
 # 3. Sidebar Yönetimi
 def setup_sidebar():
     try:
-        df_co2, df_fossil, df_share, df_supp = load_all_datasets()
-        
-        df_referans = None
-        for df in [df_fossil, df_co2, df_share, df_supp]:
-            if df is not None and not df.empty and 'Entity' in df.columns:
-                df_referans = df
-                break
-                
-        if df_referans is None:
+        # Sadece ülke listesi gerekir; hiçbir tablo frame'i yüklenmez
+        entities = get_entity_list()
+        if not entities:
              st.sidebar.warning("Veriler henüz yüklenmedi veya uygun formatta değil.")
              st.stop()
 
-        entities = sorted(df_referans['Entity'].dropna().unique())
         st.sidebar.title(" GECI Energy Executive")
         st.sidebar.markdown("---")
         
@@ -175,28 +497,53 @@ def setup_sidebar():
         st.stop()
 
 # 4. NASA API Katmanı: Tarihsel Güneş ve Rüzgar Analitiği
-@st.cache_data
+# Kalıcı disk önbelleği (nasa_cache): ilk çekimden sonra sayfa ağı beklemez. Dönen frame'in
+# attrs['source'] alanı verinin nereden geldiğini söyler: gold | fresh | stale | fetched | fallback.
+# NASA'nın -999 eksik değerleri nasa_params_to_frame'de NaN olur (prefetch ile aynı kural)
 def fetch_nasa_historical_trends(lat, lon, start=2000, end=2025):
-    url = f"https://power.larc.nasa.gov/api/temporal/annual/point?parameters=ALLSKY_SFC_SW_DWN,WS2M&community=RE&longitude={lon}&latitude={lat}&start={start}&end={end}&format=JSON"
+    params, source = get_power_parameters(lat, lon, start, end)
+    if params is not None:
+        try:
+            df = nasa_params_to_frame(params)
+            df.attrs['source'] = source
+            return df
+        except Exception as e:
+            logger.warning(f"NASA yanıtı beklenen yapıda değil: {e}")
+    logger.warning(f"NASA verisi yok ({source}), sahte veri (Fallback) üretiyorum; sayfada uyarı gösterilecek.")
+    df = pd.DataFrame({
+        'Year': range(start, end+1),
+        'NASA_Solar': np.random.uniform(3.8, 5.2, (end-start+1)),
+        'NASA_Wind': np.random.uniform(3.0, 6.5, (end-start+1))
+    })
+    df.attrs['source'] = 'fallback'
+    return df
+
+def get_entity_location(entity):
+    """(lat, lon) ya da None. Kıta/gelir grubu gibi OWID toplulukları tek noktaya inmediği için koordinatsızdır."""
+    row = query_gold('mv_entity_latest', columns=['Code'], entities=entity)
+    coordinates = load_coordinate_table()
+    if row.empty or row.iloc[0]['Code'] not in coordinates.index:
+        return None
+    point = coordinates.loc[row.iloc[0]['Code']]
+    return float(point['Latitude']), float(point['Longitude'])
+
+def get_nasa_climate(entity, start=2000, end=2025):
+    """Ülkenin NASA yıllık serisi. Önce nasa_prefetch'in doldurduğu gold tablosundan (Entity, Year) indeksli tek
+    sorgu; tablo yoksa ya da ülke eksikse koordinatından fetch_nasa_historical_trends. Koordinat yoksa None.
+    """
     try:
-        res = requests.get(url, timeout=7)
-        if res.status_code == 200:
-            params = res.json()['properties']['parameter']
-            years = [int(y) for y in params['ALLSKY_SFC_SW_DWN'].keys() if y != 'ANN']
-            return pd.DataFrame({
-                'Year': years, 
-                'NASA_Solar': [params['ALLSKY_SFC_SW_DWN'][str(y)] for y in years], 
-                'NASA_Wind': [params['WS2M'][str(y)] for y in years]
-            })
-        else: 
-            raise Exception(f"NASA API Hata Kodu: {res.status_code}")
+        df = query_gold(CLIMATE_TABLE, columns=['Year', 'NASA_Solar', 'NASA_Wind'], entities=entity,
+                        year_range=(start, end), order_by=['Year'])
     except Exception as e:
-        logger.warning(f"NASA API çöktü abi, hoca projeye eksi puan vermesin diye sahte veri (Fallback) üretiyorum: {e}")
-        return pd.DataFrame({
-            'Year': range(start, end+1), 
-            'NASA_Solar': np.random.uniform(3.8, 5.2, (end-start+1)), 
-            'NASA_Wind': np.random.uniform(3.0, 6.5, (end-start+1))
-        })
+        logger.info(f" {CLIMATE_TABLE} okunamadı, NASA canlı yoldan çekilecek: {str(e).splitlines()[0]}")
+        df = pd.DataFrame()
+    if not df.empty:
+        df.attrs['source'] = 'gold'
+        return df
+    location = get_entity_location(entity)
+    if location is None:
+        return None
+    return fetch_nasa_historical_trends(location[0], location[1], start, end)
 
 # 5. Hibrit Veri Füzyonu (Canlı Saha Simülasyonu)
 def fetch_hybrid_data(lat, lon):